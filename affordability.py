@@ -0,0 +1,45 @@
+from collections import namedtuple
+
+from model import GOLD
+
+# per card of the assessed table, in the table order:
+#  affordable: whether the gems pay the card, gold included
+#  deficits:   gems still missing per gem once the gold covered the first missing gems
+#  distances:  number of gems still missing once the gold is spent
+Affordability = namedtuple('Affordability', ['affordable', 'deficits', 'distances'])
+
+_NO_DEFICIT = (0, 0, 0, 0, 0, 0)
+
+
+def assess(eff_gems, costs):
+    '''
+    Assesses every cost of a cost table against the effective gems (cards and
+    hand) of a player in one pass, see Board.card_costs for the visible table.
+    '''
+    gold = eff_gems[GOLD]
+    affordable = []
+    deficits = []
+    distances = []
+    for cost in costs:
+        deficit = [c - mine if c > mine else 0 for mine, c in zip(eff_gems, cost)]
+        missing = sum(deficit) - gold
+        if missing <= 0:
+            affordable.append(True)
+            deficits.append(_NO_DEFICIT)
+            distances.append(0)
+            continue
+
+        # spend the gold on the first gems we miss
+        left = gold
+        g = 0
+        while left:
+            c = deficit[g]
+            if c:
+                used = c if c < left else left
+                deficit[g] = c - used
+                left -= used
+            g += 1
+        affordable.append(False)
+        deficits.append(tuple(deficit))
+        distances.append(missing)
+    return Affordability(affordable, deficits, distances)
@@ -0,0 +1,335 @@
+'''
+Batched lockstep simulation: N games held as NumPy struct-of-arrays state and
+advanced one player turn at a time with vectorized rules.
+
+It follows the rules of player.py / board.py and the turn loop of game.Game,
+reserved cards and their buys included, and plays the games of a policy
+written against the arrays. naive_policy is the NaiveStrategy: with the same
+seeds, BatchEngine(p, seeds) ends every game like
+Game(p, seed, strategies=(NaiveStrategy,)).
+'''
+
+import random
+
+import numpy as np
+
+from board import (
+    LEVEL_WEIGHTS,
+    REPUTATION_TO_WIN,
+)
+from catalog import (
+    get_catalog,
+    LEVELS,
+)
+from game import (
+    Tally,
+    DEFAULT_MAX_TURNS,
+    WIN,
+    DRAW,
+    ABORT,
+)
+from model import (
+    GEM_INDEX,
+    GOLD,
+    N_GEMS,
+)
+
+SLOTS = 4
+TABLE = LEVELS * SLOTS
+MAX_RESERVED = 3
+
+# action kinds a policy returns
+PASS = 0
+PICK = 1
+BUY = 2
+RESERVE = 3
+# buys the reserved card in the slot of the player's reserved cards
+BUY_RESERVED = 4
+
+# game status codes
+RUNNING = 0
+WON = 1
+DRAWN = 2
+ABORTED = 3
+STATUSES = (None, WIN, DRAW, ABORT)
+
+
+class _Tables(object):
+    '''
+    The catalog as arrays. Every table has an extra all-zero row at the end,
+    so an empty slot (id -1) can be looked up and masked afterwards.
+    '''
+    def __init__(self, catalog):
+        self.card_cost = np.zeros((len(catalog.cards) + 1, N_GEMS), dtype=np.int64)
+        self.card_gem = np.zeros(len(catalog.cards) + 1, dtype=np.int64)
+        self.card_rep = np.zeros(len(catalog.cards) + 1, dtype=np.int64)
+        for card in catalog.cards:
+            self.card_cost[card.id] = card.cost_vector
+            self.card_gem[card.id] = GEM_INDEX[card.gem]
+            self.card_rep[card.id] = card.reputation
+
+        self.noble_cost = np.zeros((len(catalog.nobles) + 1, N_GEMS), dtype=np.int64)
+        self.noble_rep = np.zeros(len(catalog.nobles) + 1, dtype=np.int64)
+        for noble in catalog.nobles:
+            self.noble_cost[noble.id] = noble.cost_vector
+            self.noble_rep[noble.id] = noble.reputation
+
+        self.deck_len = np.array([len(ids) for ids in catalog.level_ids], dtype=np.int64)
+        self.level_weight = LEVEL_WEIGHTS
+
+
+_tables = None
+
+def get_tables():
+    global _tables
+    if _tables is None:
+        _tables = _Tables(get_catalog())
+    return _tables
+
+
+class BatchEngine(object):
+    def __init__(self, players_cnt, seeds, policy=None, points_to_win=REPUTATION_TO_WIN,
+                 max_turns=DEFAULT_MAX_TURNS):
+        assert players_cnt >= 2 and players_cnt <= 4
+        catalog = get_catalog()
+        self.tables = get_tables()
+        self.players_cnt = players_cnt
+        self.points_to_win = points_to_win
+        self.max_turns = max_turns
+        self.policy = policy if policy is not None else naive_policy
+
+        n = len(seeds)
+        P = players_cnt
+        self.n = n
+        # the board
+        self.gems = np.full((n, N_GEMS), 7 if P == 4 else 2 + P, dtype=np.int64)
+        self.gems[:, GOLD] = 5
+        self.decks = np.full((n, LEVELS, int(self.tables.deck_len.max())), -1, dtype=np.int64)
+        self.cursor = np.full((n, LEVELS), SLOTS, dtype=np.int64)
+        # visible card ids, level-major, -1 once a slot cannot be refilled
+        self.table = np.full((n, TABLE), -1, dtype=np.int64)
+        # noble ids in the board order, -1 once attracted
+        self.nobles = np.full((n, P + 1), -1, dtype=np.int64)
+        # gems the visible cards cost by level, like Board.demand
+        self.demand = np.zeros((n, LEVELS, N_GEMS), dtype=np.int64)
+
+        # the players
+        self.hand = np.zeros((n, P, N_GEMS), dtype=np.int64)
+        self.discount = np.zeros((n, P, N_GEMS), dtype=np.int64)
+        self.rep = np.zeros((n, P), dtype=np.int64)
+        self.cards = np.zeros((n, P), dtype=np.int64)
+        # reserved card ids, -1 for a free slot
+        self.reserved = np.full((n, P, MAX_RESERVED), -1, dtype=np.int64)
+
+        # the turn loop
+        self.player = 0
+        self.turns = np.zeros(n, dtype=np.int64)
+        self.idle = np.zeros(n, dtype=np.int64)
+        self.can_win = np.zeros(n, dtype=bool)
+        self.status = np.full(n, RUNNING, dtype=np.int8)
+
+        for i, seed in enumerate(seeds):
+            self._shuffle(i, seed, catalog)
+
+    def _shuffle(self, i, seed, catalog):
+        '''Deals game i exactly like Board(should_shuffle=True, seed=seed)'''
+        rng = random.Random(seed)
+        decks = [list(ids) for ids in catalog.level_ids]
+        for deck in decks:
+            rng.shuffle(deck)
+        noble_deck = list(range(len(catalog.nobles)))
+        rng.shuffle(noble_deck)
+
+        for level, deck in enumerate(decks):
+            self.decks[i, level, :len(deck)] = deck
+            self.table[i, level * SLOTS:(level + 1) * SLOTS] = deck[:SLOTS]
+            self.demand[i, level] = self.tables.card_cost[deck[:SLOTS]].sum(axis=0)
+        self.nobles[i] = noble_deck[:self.players_cnt + 1]
+
+    def run(self):
+        '''Plays every game to its end'''
+        while self.step():
+            pass
+        return self
+
+    def step(self):
+        '''Plays the turn of the current player in every running game, returns False once all ended'''
+        g = np.flatnonzero(self.status == RUNNING)
+        if len(g) == 0:
+            return False
+
+        p = self.player
+        kind, slot, picks = self.policy(self, g, p)
+        progress = self._apply(g, p, kind, slot, picks)
+        self._check_nobles(g, p)
+
+        self.turns[g] += 1
+        self.idle[g] = np.where(progress, 0, self.idle[g] + 1)
+        self.can_win[g] |= self.rep[g, p] >= self.points_to_win
+
+        self.player = (p + 1) % self.players_cnt
+        if self.player == 0:
+            self._end_round()
+        return True
+
+    def _apply(self, g, p, kind, slot, picks):
+        '''Applies the actions, returns which players made progress'''
+        tables = self.tables
+        progress = np.zeros(len(g), dtype=bool)
+
+        m = kind == PICK
+        if m.any():
+            gi = g[m]
+            ok = (self.gems[gi] >= picks[m]).all(axis=1)
+            gi = gi[ok]
+            self.gems[gi] -= picks[m][ok]
+            self.hand[gi, p] += picks[m][ok]
+            progress[np.flatnonzero(m)[ok]] = True
+
+        m = kind == BUY
+        if m.any():
+            gi, s = g[m], slot[m]
+            card = self.table[gi, s]
+            ok = self._buy(gi, p, card)
+            gi, s, card = gi[ok], s[ok], card[ok]
+            self.rep[gi, p] += tables.card_rep[card]
+            self._take_card(gi, s)
+            progress[np.flatnonzero(m)[ok]] = True
+
+        m = kind == BUY_RESERVED
+        if m.any():
+            gi, s = g[m], slot[m]
+            ok = self._buy(gi, p, self.reserved[gi, p, s])
+            gi, s = gi[ok], s[ok]
+            # like Player.buy_reserve_card the reputation of the card does not count
+            self.reserved[gi, p, s] = -1
+            progress[np.flatnonzero(m)[ok]] = True
+
+        m = kind == RESERVE
+        if m.any():
+            gi, s = g[m], slot[m]
+            free = self.reserved[gi, p] < 0
+            ok = (self.table[gi, s] >= 0) & free.any(axis=1) & (self.gems[gi, GOLD] > 0)
+            gi, s, free = gi[ok], s[ok], free[ok]
+            self.gems[gi, GOLD] -= 1
+            self.hand[gi, p, GOLD] += 1
+            self.reserved[gi, p, free.argmax(axis=1)] = self.table[gi, s]
+            self._take_card(gi, s)
+            progress[np.flatnonzero(m)[ok]] = True
+
+        return progress
+
+    def _buy(self, gi, p, card):
+        '''
+        Adds the cards the players can afford to their cards and pays for them,
+        returns which could. Slots without a card (id -1) cannot be bought.
+        '''
+        tables = self.tables
+        cost = tables.card_cost[card]
+        hand = self.hand[gi, p]
+        eff = self.discount[gi, p] + hand
+        ok = (card >= 0) & (np.maximum(cost - eff, 0).sum(axis=1) <= hand[:, GOLD])
+        gi, card, cost, hand = gi[ok], card[ok], cost[ok], hand[ok]
+
+        # like Player.buy_board_card the card gem counts before paying
+        self.discount[gi, p, tables.card_gem[card]] += 1
+        need = np.maximum(cost - self.discount[gi, p], 0)
+        pay = np.minimum(need, hand)
+        pay[:, GOLD] = (need - pay).sum(axis=1)
+        self.hand[gi, p] -= pay
+        self.gems[gi] += pay
+        self.cards[gi, p] += 1
+        return ok
+
+    def _take_card(self, gi, s):
+        '''Refills the slots from the decks, or empties them once a deck is used up'''
+        level = s // SLOTS
+        cursor = self.cursor[gi, level]
+        has_next = cursor < self.tables.deck_len[level]
+        next_card = self.decks[gi, level, np.minimum(cursor, self.decks.shape[2] - 1)]
+        card_cost = self.tables.card_cost
+        # a game takes one card per call, so the fancy-indexed update has no duplicates
+        self.demand[gi, level] -= card_cost[self.table[gi, s]]
+        self.table[gi, s] = np.where(has_next, next_card, -1)
+        self.demand[gi, level] += card_cost[self.table[gi, s]]
+        self.cursor[gi, level] += has_next
+
+    def _check_nobles(self, g, p):
+        '''Attracts the first noble the player can get, like Board._check_and_update_nobles'''
+        nobles = self.nobles[g]
+        cost = self.tables.noble_cost[nobles]
+        ok = (nobles >= 0) & (self.discount[g, p][:, None, :] >= cost).all(axis=2)
+        has = ok.any(axis=1)
+        if not has.any():
+            return
+        gi = g[has]
+        j = ok.argmax(axis=1)[has]
+        self.rep[gi, p] += self.tables.noble_rep[self.nobles[gi, j]]
+        self.nobles[gi, j] = -1
+
+    def _end_round(self):
+        running = self.status == RUNNING
+        won = running & self.can_win
+        drawn = running & ~won & (self.idle >= self.players_cnt)
+        self.status[won] = WON
+        self.status[drawn] = DRAWN
+        if self.max_turns is not None:
+            aborted = running & ~won & ~drawn & (self.turns >= self.max_turns)
+            self.status[aborted] = ABORTED
+
+    def winners(self):
+        '''Returns a (games, players) mask of the winners, like Board._get_winners'''
+        candidates = (self.rep >= self.points_to_win) & (self.status == WON)[:, None]
+        best_rep = np.where(candidates, self.rep, -1).max(axis=1)
+        best = candidates & (self.rep == best_rep[:, None])
+        fewest_cards = np.where(best, self.cards, np.iinfo(np.int64).max).min(axis=1)
+        return best & (self.cards == fewest_cards[:, None])
+
+    def to_tally(self):
+        tally = Tally(self.players_cnt)
+        winners = self.winners()
+        tally.games = self.n
+        tally.draws = int((self.status == DRAWN).sum())
+        tally.aborts = int((self.status == ABORTED).sum())
+        for turns, cnt in zip(*np.unique(self.turns, return_counts=True)):
+            tally.turns[int(turns)] = int(cnt)
+        single = winners.sum(axis=1) == 1
+        for i in range(self.players_cnt):
+            tally.win[i] = int((winners[:, i] & single).sum())
+            tally.even[i] = int((winners[:, i] & ~single).sum())
+        return tally
+
+
+def naive_policy(engine, g, p):
+    '''
+    NaiveStrategy over the arrays: buy the first affordable card, else pick
+    the three most demanded gems still on the board, else reserve the first card.
+    Returns the action kinds, the table slots and the gems to pick.
+    '''
+    tables = engine.tables
+    n = len(g)
+    rows = np.arange(n)
+    table = engine.table[g]
+    valid = table >= 0
+    cost = tables.card_cost[table]
+    hand = engine.hand[g, p]
+    eff = engine.discount[g, p] + hand
+
+    missing = np.maximum(cost - eff[:, None, :], 0).sum(axis=2)
+    affordable = valid & (missing <= hand[:, GOLD][:, None])
+    has_buy = affordable.any(axis=1)
+
+    # weighted like Board.gem_demand, level after level to round the same
+    demand = engine.demand[g]
+    w0, w1, w2 = tables.level_weight
+    scores = demand[:, 0] * w0 + demand[:, 1] * w1 + demand[:, 2] * w2
+    order = np.argsort(-scores, axis=1, kind='stable')
+    available = (engine.gems[g][rows[:, None], order] > 0) & (order != GOLD)
+    take = available & (np.cumsum(available, axis=1) <= 3)
+    picks = np.zeros((n, N_GEMS), dtype=np.int64)
+    picks[rows[:, None], order] = take
+    has_pick = take.any(axis=1)
+
+    kind = np.where(has_buy, BUY, np.where(has_pick, PICK, np.where(valid.any(axis=1), RESERVE, PASS)))
+    slot = np.where(has_buy, affordable.argmax(axis=1), valid.argmax(axis=1))
+    return kind, slot, picks
@@ -0,0 +1,180 @@
+#! /usr/local/bin/python3
+'''
+Per-game and per-decision memory: run from the repo root with
+    python3 -m benchmarks.memory_bench [games] [--before REV]
+The games are played by the same driver in this tree and, for the before
+column, in a temporary git worktree of REV (BASELINE_REV by default).
+The memory retained after the games is what the caches shared across games
+keep, the price of the memoization.
+'''
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from catalog import get_catalog
+from strategies.aggressive_strategy import CardValue
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# a game that is not over after that many player turns is cut short
+MAX_TURNS = 1000
+
+# the revision the before column is measured on
+BASELINE_REV = 'c2ef889'
+# the baseline tree hands out one strategy per seat and has three of them
+PLAYERS_CNT = 3
+
+# runs in the tree measured, so it only uses what the baseline tree already had
+_DRIVER = r'''
+import gc
+import json
+import random
+import sys
+import tracemalloc
+
+from board import Board
+from player import Player
+
+
+def play(seed, max_turns, decision_peaks):
+    # returns the peak bytes the game traced over the memory at its start
+    random.seed(seed)
+    base, _ = tracemalloc.get_traced_memory()
+    top = base
+    board = Board(players_cnt, should_shuffle=True)
+    turns = 0
+    while turns < max_turns and not any(p.can_win(board.points_to_win) for p in board.players):
+        for player in board.players:
+            # reset_peak forgets the peak of the game so far, keep it in top
+            current, peak = tracemalloc.get_traced_memory()
+            top = max(top, peak)
+            tracemalloc.reset_peak()
+            params = player.strategy.next_step()
+            _, peak = tracemalloc.get_traced_memory()
+            decision_peaks.append(peak - current)
+            turns += 1
+            try:
+                player.take_external_action(params, board)
+            except ValueError:
+                # the move is no longer legal, a pass
+                pass
+            board._check_and_update_nobles(player)
+    _, peak = tracemalloc.get_traced_memory()
+    return max(top, peak) - base
+
+
+players_cnt, games, max_turns = (int(arg) for arg in sys.argv[1:4])
+player = Player(0)
+player_size = sys.getsizeof(player) + (sys.getsizeof(player.__dict__) if hasattr(player, '__dict__') else 0)
+
+# loads the catalog and whatever the tree builds once per process
+play(games, max_turns, [])
+gc.collect()
+tracemalloc.start()
+start, _ = tracemalloc.get_traced_memory()
+game_peaks = []
+decision_peaks = []
+for seed in range(games):
+    game_peaks.append(play(seed, max_turns, decision_peaks))
+gc.collect()
+retained, _ = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+print(json.dumps([sum(game_peaks) / games, sum(decision_peaks) / len(decision_peaks), retained - start, player_size]))
+'''
+
+
+class _DictCard(object):
+    '''The dict-backed card the slotted Card replaced, kept for comparison'''
+    def __init__(self, id, level, gem, reputation, cost):
+        self.id = id
+        self.level = level
+        self.gem = gem
+        self.reputation = reputation
+        self.cost = cost
+
+
+class _DictCardValue(object):
+    def __init__(self, card_id, card_rep, can_afford, value, dist, req_gems):
+        self.card_id = card_id
+        self.card_reputation = card_rep
+        self.can_afford = can_afford
+        self.value = value
+        self.dist = dist
+        self.req_gems = req_gems
+
+
+def instance_size(obj):
+    '''Bytes of the instance itself plus its __dict__ if it has one'''
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def bench_instances(player_before, player_after):
+    card = get_catalog().cards[0]
+    dict_card = _DictCard(card.id, card.level, card.gem, card.reputation, card.cost)
+    value = CardValue(0, 1, False, 1.5, 2, None)
+    dict_value = _DictCardValue(0, 1, False, 1.5, 2, None)
+    return [
+        ('Card', instance_size(dict_card), instance_size(card)),
+        ('CardValue', instance_size(dict_value), instance_size(value)),
+        ('Player', player_before, player_after),
+    ]
+
+
+def bench_game(players_cnt, games, tree=ROOT):
+    '''
+    Plays the games in the tree and returns the average peak bytes of a game,
+    the average peak bytes of a decision, the bytes still allocated after the
+    games (the caches kept across games) and the size of a Player instance
+    '''
+    result = subprocess.run(
+        [sys.executable, '-c', _DRIVER, str(players_cnt), str(games), str(MAX_TURNS)],
+        cwd=tree, capture_output=True, text=True, check=True,
+    )
+    return tuple(json.loads(result.stdout))
+
+
+def bench_revision(players_cnt, games, rev):
+    '''bench_game in a temporary git worktree of the revision'''
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tree = os.path.join(tmp_dir, 'tree')
+        subprocess.run(['git', 'worktree', 'add', '--detach', '--quiet', tree, rev],
+                       cwd=ROOT, capture_output=True, check=True)
+        try:
+            return bench_game(players_cnt, games, tree)
+        finally:
+            subprocess.run(['git', 'worktree', 'remove', '--force', tree], cwd=ROOT, capture_output=True)
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Per-game and per-decision memory, before and after')
+    parser.add_argument('games', type=int, nargs='?', default=20, help='games per player count')
+    parser.add_argument('--before', default=BASELINE_REV, metavar='REV',
+                        help=f"git revision to compare against, defaults to {BASELINE_REV}")
+    return parser.parse_args()
+
+
+def _kib(size):
+    return f"{size / 1024:7.1f} KiB"
+
+
+def _bytes(size):
+    return f"{size:7.0f} B"
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    per_game, per_decision, retained, player_after = bench_game(PLAYERS_CNT, args.games)
+    before_game, before_decision, before_retained, player_before = bench_revision(PLAYERS_CNT, args.games, args.before)
+
+    for name, before, after in bench_instances(player_before, player_after):
+        print(f"{name:10s} instance: before {_bytes(before)}, after {_bytes(after)}")
+    print(f"{PLAYERS_CNT} players, {args.games} games, before is {args.before}")
+    print(f"peak per game:     before {_kib(before_game)}, after {_kib(per_game)}")
+    print(f"peak per decision: before {_bytes(before_decision)}, after {_bytes(per_decision)}")
+    print(f"retained by games: before {_kib(before_retained)}, after {_kib(retained)}")
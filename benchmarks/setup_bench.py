@@ -0,0 +1,37 @@
+#! /usr/local/bin/python3
+'''
+Per-game setup cost: run from the repo root with
+    python3 -m benchmarks.setup_bench [games]
+'''
+
+import sys
+import timeit
+
+import catalog
+from board import Board
+
+
+def bench_board_setup(players_cnt, games):
+    '''Seconds per Board construction with the shared catalog'''
+    catalog.get_catalog()
+    return timeit.timeit(lambda: Board(players_cnt, should_shuffle=True), number=games) / games
+
+
+def bench_csv_setup(players_cnt, games):
+    '''Seconds per Board construction when every board parses the CSV files again'''
+    def _setup():
+        catalog._catalog = catalog.load_catalog()
+        Board(players_cnt, should_shuffle=True)
+    try:
+        return timeit.timeit(_setup, number=games) / games
+    finally:
+        catalog._catalog = None
+
+
+if __name__ == '__main__':
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    for players_cnt in (2, 3, 4):
+        parsed = bench_csv_setup(players_cnt, games)
+        shared = bench_board_setup(players_cnt, games)
+        print(f"{players_cnt} players: per-board CSV parse {parsed * 1e6:8.1f} us, "
+              f"shared catalog {shared * 1e6:8.1f} us ({parsed / shared:.1f}x)")
@@ -0,0 +1,472 @@
+#! /usr/local/bin/python3
+'''
+Simulation throughput benchmarks, run from the repo root with
+    python3 -m benchmarks.suite                         # print the results
+    python3 -m benchmarks.suite --save benchmarks/baseline.json
+    python3 -m benchmarks.suite --compare benchmarks/baseline.json [--threshold 0.15]
+The compare mode exits with 1 when a metric got slower than the threshold.
+'''
+
+import argparse
+import copy
+import functools
+import json
+import pickle
+import platform
+import random
+import sys
+import time
+import timeit
+
+from affordability import assess
+from benchmarks.setup_bench import bench_board_setup
+from board import (
+    Board,
+    DEFAULT_STRATEGIES,
+)
+from determinization import Determinizer
+from game import Game
+from model import Gem
+from moves import legal_moves
+from planner import (
+    clear_memo,
+    plan,
+)
+from player import Player
+from state_codec import (
+    decode,
+    encode,
+    StateView,
+)
+from strategies.ismcts_strategy import ISMCTSStrategy
+from strategies.mcts_strategy import MCTSStrategy
+from util import greater_than_or_equal_to
+
+DEFAULT_THRESHOLD = 0.15
+
+# every benchmark registers itself here, see benchmark()
+BENCHMARKS = []
+
+
+class Metric(object):
+    def __init__(self, value, unit, higher_is_better):
+        self.value = value
+        self.unit = unit
+        self.higher_is_better = higher_is_better
+
+    def to_json(self):
+        return {'value': self.value, 'unit': self.unit, 'higher_is_better': self.higher_is_better}
+
+
+def rate(value, unit):
+    return Metric(value, unit, True)
+
+
+def latency(seconds):
+    return Metric(seconds * 1e6, 'us', False)
+
+
+def benchmark(func):
+    '''Registers a benchmark, it takes a scale factor and returns {metric name: Metric}'''
+    BENCHMARKS.append(func)
+    return func
+
+
+@benchmark
+def games_per_second(scale):
+    metrics = {}
+    games = max(1, int(100 * scale))
+    for players_cnt in (2, 3, 4):
+        start = time.perf_counter()
+        for seed in range(games):
+            Game(players_cnt, seed=seed).play()
+        metrics[f"games/{players_cnt}p"] = rate(games / (time.perf_counter() - start), 'games/s')
+    return metrics
+
+
+@benchmark
+def event_stream(scale):
+    '''3-player games of the default strategies reading the board, then reading an events.TableIndex'''
+    games = max(1, int(100 * scale))
+    incremental = tuple(functools.partial(strategy, incremental=True) for strategy in DEFAULT_STRATEGIES)
+    metrics = {}
+    for name, strategies in (('plain', DEFAULT_STRATEGIES), ('incremental', incremental)):
+        start = time.perf_counter()
+        for seed in range(games):
+            Game(3, seed=seed, strategies=strategies).play()
+        metrics[f"events/games/{name}"] = rate(games / (time.perf_counter() - start), 'games/s')
+    return metrics
+
+
+@benchmark
+def batch_games_per_second(scale):
+    '''Throughput of the NumPy batch engine, all players naive'''
+    try:
+        from batch_engine import BatchEngine
+    except ImportError:
+        # numpy is optional
+        return {}
+    from strategies.naive_strategy import NaiveStrategy
+
+    metrics = {}
+    games = max(1, int(1000 * scale))
+    for players_cnt in (2, 3, 4):
+        start = time.perf_counter()
+        BatchEngine(players_cnt, range(games)).run()
+        metrics[f"batch/games/{players_cnt}p"] = rate(games / (time.perf_counter() - start), 'games/s')
+
+    # the same games through the object engine, for reference
+    games = max(1, int(100 * scale))
+    start = time.perf_counter()
+    for seed in range(games):
+        Game(3, seed=seed, strategies=(NaiveStrategy,)).play()
+    metrics['batch/object_games/3p'] = rate(games / (time.perf_counter() - start), 'games/s')
+    return metrics
+
+
+@benchmark
+def next_step_latency(scale):
+    '''Latency percentiles of next_step, per strategy class, over 3-player games'''
+    latencies = {}
+    for seed in range(max(1, int(30 * scale))):
+        game = Game(3, seed=seed)
+        for player in game.board.players:
+            _time_next_step(player.strategy, latencies.setdefault(type(player.strategy).__name__, []))
+        game.play()
+
+    metrics = {}
+    for name, samples in sorted(latencies.items()):
+        samples.sort()
+        for q in (50, 90, 99):
+            metrics[f"next_step/{name}/p{q}"] = latency(samples[min(len(samples) - 1, len(samples) * q // 100)])
+    return metrics
+
+
+def _time_next_step(strategy, samples):
+    next_step = strategy.next_step
+
+    def timed_next_step():
+        start = time.perf_counter()
+        action_params = next_step()
+        samples.append(time.perf_counter() - start)
+        return action_params
+
+    strategy.next_step = timed_next_step
+
+
+@benchmark
+def move_generation(scale):
+    '''Legal move generation over the states of 3-player games'''
+    states = []
+    for seed in range(max(1, int(10 * scale))):
+        game = Game(3, seed=seed)
+        for player in game.board.players:
+            _snapshot_before_step(player, game.board, states)
+        game.play()
+
+    moves = 0
+    start = time.perf_counter()
+    for board, player in states:
+        moves += len(legal_moves(board, player))
+    elapsed = time.perf_counter() - start
+    return {
+        'moves/states': rate(len(states) / elapsed, 'states/s'),
+        'moves/moves': rate(moves / elapsed, 'moves/s'),
+    }
+
+
+def _snapshot_before_step(player, board, states):
+    '''Keeps a copy of the board every time the player is about to decide'''
+    next_step = player.strategy.next_step
+
+    def snapshot_next_step():
+        trial = copy.deepcopy(board)
+        states.append((trial, trial.players[player.id]))
+        return next_step()
+
+    player.strategy.next_step = snapshot_next_step
+
+
+@benchmark
+def make_unmake(scale):
+    '''Board.apply + Board.undo of every legal move against a deepcopy of the board'''
+    game = Game(3, seed=0, max_turns=30)
+    game.play()
+    board = game.board
+    player = board.players[0]
+    moves = legal_moves(board, player)
+    number = max(1, int(2000 * scale))
+
+    def _apply_undo():
+        for move in moves:
+            board.undo(board.apply(player, move))
+
+    return {
+        'search/apply_undo': latency(timeit.timeit(_apply_undo, number=number) / (number * len(moves))),
+        'search/deepcopy': latency(timeit.timeit(lambda: copy.deepcopy(board), number=max(1, number // 20))
+                                   / max(1, number // 20)),
+    }
+
+
+@benchmark
+def mcts_playouts(scale):
+    '''Playout throughput of MCTSStrategy over the opening of 3-player games'''
+    playouts = 0
+    seconds = 0.0
+    for seed in range(max(1, int(3 * scale))):
+        board = Board(3, should_shuffle=True, seed=seed)
+        strategy = MCTSStrategy(board, board.players[0], iterations=200, seed=seed)
+        strategy.next_step()
+        playouts += strategy.playouts
+        seconds += strategy.search_seconds
+    return {'search/mcts_playouts': rate(playouts / seconds, 'playouts/s')}
+
+
+@benchmark
+def ismcts(scale):
+    '''Determinization sampling and ISMCTSStrategy playouts over the opening of 3-player games'''
+    board = Board(3, should_shuffle=True, seed=0)
+    determinizer = Determinizer(board, random.Random(0))
+    number = max(1, int(5000 * scale))
+
+    def _sample():
+        with determinizer:
+            for _ in range(number):
+                determinizer.sample()
+
+    playouts = 0
+    seconds = 0.0
+    for seed in range(max(1, int(3 * scale))):
+        board = Board(3, should_shuffle=True, seed=seed)
+        strategy = ISMCTSStrategy(board, board.players[0], iterations=200, seed=seed)
+        strategy.next_step()
+        playouts += strategy.playouts
+        seconds += strategy.search_seconds
+    return {
+        'search/determinize': latency(timeit.timeit(_sample, number=1) / number),
+        'search/ismcts_playouts': rate(playouts / seconds, 'playouts/s'),
+    }
+
+
+@benchmark
+def planner(scale):
+    '''plan() over the visible cards of every player along 3-player games, with an empty then a warm memo'''
+    queries = []
+    for seed in range(max(1, int(4 * scale))):
+        game = Game(3, seed=seed, max_turns=60)
+        game.play()
+        board = game.board
+        for player in board.players:
+            reserves_left = 3 - player.reserve_count
+            for card in board.visible_cards():
+                queries.append((card.cost_vector, tuple(player.card_vector), tuple(player.hand_vector),
+                                tuple(board.gem_vector), reserves_left))
+
+    def _plan_all():
+        for query in queries:
+            plan(*query)
+
+    clear_memo()
+    cold = timeit.timeit(_plan_all, number=1)
+    warm = timeit.timeit(_plan_all, number=1)
+    return {
+        'planner/cold': latency(cold / len(queries)),
+        'planner/warm': latency(warm / len(queries)),
+    }
+
+
+@benchmark
+def mcts_scaling(scale):
+    '''
+    Root-parallel MCTS by worker count: playouts per wall second, and the move
+    quality, the value of the chosen move over the value of the best move in a
+    reference search with 16 times the iterations of a worker.
+    '''
+    iterations = 100
+    positions = []
+    for seed in range(max(1, int(4 * scale))):
+        game = Game(3, seed=seed, max_turns=15)
+        game.play()
+        board = game.board
+        root = MCTSStrategy(board, board.players[0], iterations=16 * iterations, seed=seed).search()
+        values = {child.move: child.reward / child.visits for child in root.children}
+        best = max(root.children, key=lambda n: n.visits).move
+        positions.append((board, values, values[best]))
+
+    metrics = {}
+    for workers in (1, 2, 4):
+        playouts = 0
+        seconds = 0.0
+        quality = 0.0
+        for board, values, best_value in positions:
+            strategy = MCTSStrategy(board, board.players[0], iterations=iterations, seed=1, workers=workers)
+            quality += values.get(strategy.next_step(), 0.0) / best_value
+            playouts += strategy.playouts
+            seconds += strategy.search_seconds
+        metrics[f"search/root_parallel/{workers}w/playouts"] = rate(playouts / seconds, 'playouts/s')
+        metrics[f"search/root_parallel/{workers}w/move_quality"] = rate(quality / len(positions), 'ratio')
+    return metrics
+
+
+@benchmark
+def state_codec(scale):
+    '''
+    Size and speed of the binary state encoding against pickling the BoardState
+    and the whole Board, the encodings include Board.export_state
+    '''
+    game = Game(3, seed=0, max_turns=60)
+    game.play()
+    board = game.board
+    state = board.export_state()
+    data = encode(state)
+    pickled_state = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+    pickled_board = pickle.dumps(board, protocol=pickle.HIGHEST_PROTOCOL)
+    number = max(1, int(5000 * scale))
+
+    def _time(func, number=number):
+        return latency(timeit.timeit(func, number=number) / number)
+
+    return {
+        'codec/size': Metric(len(data), 'bytes', False),
+        'codec/pickle_state_size': Metric(len(pickled_state), 'bytes', False),
+        'codec/pickle_board_size': Metric(len(pickled_board), 'bytes', False),
+        'codec/encode': _time(lambda: encode(board.export_state())),
+        'codec/decode': _time(lambda: decode(data)),
+        'codec/view': _time(lambda: StateView(data)),
+        'codec/pickle_state_dumps': _time(lambda: pickle.dumps(board.export_state(), protocol=pickle.HIGHEST_PROTOCOL)),
+        'codec/pickle_state_loads': _time(lambda: pickle.loads(pickled_state)),
+        'codec/pickle_board_dumps': _time(lambda: pickle.dumps(board, protocol=pickle.HIGHEST_PROTOCOL),
+                                          max(1, number // 10)),
+        'codec/pickle_board_loads': _time(lambda: pickle.loads(pickled_board), max(1, number // 10)),
+    }
+
+
+@benchmark
+def board_setup(scale):
+    games = max(1, int(1000 * scale))
+    return {f"setup/board/{p}p": latency(bench_board_setup(p, games)) for p in (2, 3, 4)}
+
+
+@benchmark
+def player_micro(scale):
+    number = max(1, int(20000 * scale))
+    board = Board(3, should_shuffle=True, seed=0)
+    player = Player(0)
+    player.set_gems({Gem.RED: 2, Gem.GREEN: 1, Gem.BLUE: 1, Gem.WHITE: 2, Gem.GOLD: 1})
+    cards = [card for row in board.get_cards() for card in row]
+    cheap = min(cards, key=lambda c: c.cost_total)
+
+    def _can_afford():
+        for card in cards:
+            player.can_afford(card)
+
+    eff_gems = player.effective_gems()
+    costs = board.card_costs()
+
+    def _assess():
+        assess(eff_gems, costs)
+
+    def _update_gems():
+        # pay the card and get the gems back, so every round pays the same
+        player.set_gems(cheap.cost)
+        player.update_gems(cheap.cost_vector)
+
+    naive = board.players[0].strategy
+    rows = board.get_cards()
+
+    def _recommend():
+        naive.recommend_gems_to_pick(rows, board.get_gems(), board.gem_demand())
+
+    def _recommend_from_cards():
+        naive.recommend_gems_to_pick(rows, board.get_gems())
+
+    left = board.get_gems()
+    right = {Gem.RED: 1, Gem.GREEN: 1, Gem.BLUE: 1}
+    return {
+        'micro/can_afford': latency(timeit.timeit(_can_afford, number=number) / (number * len(cards))),
+        'micro/assess_table': latency(timeit.timeit(_assess, number=number) / number),
+        'micro/recommend_gems': latency(timeit.timeit(_recommend, number=number) / number),
+        'micro/recommend_gems_from_cards': latency(timeit.timeit(_recommend_from_cards, number=number) / number),
+        'micro/update_gems': latency(timeit.timeit(_update_gems, number=number) / number),
+        'micro/greater_than_or_equal_to': latency(
+            timeit.timeit(lambda: greater_than_or_equal_to(left, right), number=number) / number),
+    }
+
+
+def run(scale=1.0, only=None):
+    results = {}
+    for func in BENCHMARKS:
+        if only and func.__name__ not in only:
+            continue
+        results.update(func(scale))
+    return results
+
+
+def compare(baseline, results, threshold=DEFAULT_THRESHOLD):
+    '''
+    Returns (name, baseline value, current value, relative slowdown) for every
+    metric that got slower than the threshold.
+    '''
+    regressions = []
+    for name, metric in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None or base['value'] <= 0 or metric.value <= 0:
+            continue
+        if metric.higher_is_better:
+            slowdown = base['value'] / metric.value - 1
+        else:
+            slowdown = metric.value / base['value'] - 1
+        if slowdown > threshold:
+            regressions.append((name, base['value'], metric.value, slowdown))
+    return regressions
+
+
+def save(path, results):
+    data = {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'metrics': {name: metric.to_json() for name, metric in sorted(results.items())},
+    }
+    with open(path, 'w') as fo:
+        json.dump(data, fo, indent=2, sort_keys=True)
+        fo.write('\n')
+
+
+def load(path):
+    with open(path) as fo:
+        return json.load(fo)['metrics']
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Benchmarks the simulation throughput')
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help='multiplies the number of games / iterations of every benchmark')
+    parser.add_argument('--only', nargs='*', default=None,
+                        help='names of the benchmarks to run: ' + ', '.join(f.__name__ for f in BENCHMARKS))
+    parser.add_argument('--save', default=None, help='writes the results as a JSON baseline')
+    parser.add_argument('--compare', default=None, help='JSON baseline to compare the results against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='relative slowdown flagged as a regression')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    results = run(args.scale, args.only)
+    baseline = load(args.compare) if args.compare else {}
+    for name, metric in sorted(results.items()):
+        line = f"{name:45s} {metric.value:14.2f} {metric.unit}"
+        if name in baseline:
+            line += f"  (baseline {baseline[name]['value']:.2f})"
+        print(line)
+
+    if args.save:
+        save(args.save, results)
+        print(f"Baseline written to {args.save}")
+    if args.compare:
+        regressions = compare(baseline, results, args.threshold)
+        for name, base, current, slowdown in regressions:
+            print(f"REGRESSION {name}: {base:.2f} -> {current:.2f} ({slowdown:+.1%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regression beyond {args.threshold:.0%}")
@@ -1,190 +1,435 @@
+import math
+from collections import namedtuple
 from enum import Enum
-from player import Player
+from player import (
+    Action,
+    Player,
+)
 from strategies.naive_strategy import NaiveStrategy
 from strategies.aggressive_strategy import AggressiveStrategy
 from strategies.smart_strategy import SmartStrategy
 
 
 from model import (
-    Gem,
-    Card,
-    Noble,
+    GemVector,
+    GemView,
+    GOLD,
+    N_GEMS,
+)
+from catalog import (
+    get_catalog,
+    LEVELS,
+)
+from zobrist import (
+    add_counts,
+    board_key,
+    rep_key,
+    sub_counts,
+    BOARD_GEMS,
+    BOARD_NOBLES,
+    CURSOR,
+    MAX_PLAYERS,
+    TO_MOVE,
+    VISIBLE,
 )
-from util import greater_than_or_equal_to
-import csv
 import random
-import json
 
 REPUTATION_TO_WIN = 15
 
+# weight of a gem a visible card costs in the gem demand, by level
+LEVEL_WEIGHTS = tuple(math.exp(-1 * level) for level in range(LEVELS))
+
+# strategies are handed out to the players round-robin
+DEFAULT_STRATEGIES = (NaiveStrategy, AggressiveStrategy, SmartStrategy)
+
+# the whole game state as plain values, to ship it to another process, see Board.export_state
+BoardState = namedtuple('BoardState', [
+    'players_cnt', 'points_to_win', 'gems', 'decks', 'cards_index', 'cards', 'noble_deck', 'noble_index',
+    'nobles', 'players',
+])
+# a player in a BoardState, the cards, reserves and nobles are catalog ids
+PlayerState = namedtuple('PlayerState', ['rep', 'hand', 'cards', 'rev_cards', 'reserve_count', 'nobles'])
+
+
+class UndoRecord(object):
+    '''What Board.apply changed, the rest of the turn is recomputed by Board.undo'''
+    __slots__ = ('player', 'action', 'card', 'position', 'refilled', 'hand', 'rep', 'reserve_count',
+                 'noble_index', 'noble')
+
+    def __init__(self, player, action, card, position, hand, rep, reserve_count):
+        self.player = player
+        self.action = action
+        # the card bought or reserved, and its (level, slot) when it was showing
+        self.card = card
+        self.position = position
+        # whether the slot was refilled from the deck or the row shrank
+        self.refilled = False
+        # the hand, reputation and reserves of the player before the turn
+        self.hand = hand
+        self.rep = rep
+        self.reserve_count = reserve_count
+        # the noble attracted and its index in Board.nobles
+        self.noble_index = -1
+        self.noble = None
+
+
 class Board(object):
-    def __init__(self, players_cnt, should_shuffle=False, points_to_win=REPUTATION_TO_WIN):
+    def __init__(self, players_cnt, should_shuffle=False, points_to_win=REPUTATION_TO_WIN, seed=None,
+                 strategies=DEFAULT_STRATEGIES):
         self.players_cnt = players_cnt
         self.points_to_win = points_to_win
-        self.all_cards = []
-        self.all_nobles = []
+        self.strategies = strategies
+        # a private generator keeps the shuffle reproducible per game
+        self.rng = random.Random(seed) if seed is not None else random
+        self.catalog = get_catalog()
+        # per-game order of the card ids of each level and of the noble ids
+        self.decks = [list(ids) for ids in self.catalog.level_ids]
+        self.noble_deck = list(range(len(self.catalog.nobles)))
         self.cards_index = [0, 0, 0]
         self.noble_index = 0
         self.cards = []
+        # visible card id -> (level, slot) in self.cards
+        self.visible = {}
+        # (visible cards, their costs) flattened in the table order, rebuilt after take_card
+        self._table = None
+        # level -> gems the visible cards of the level cost, kept up to date by take_card
+        self.demand = [[0] * N_GEMS for _ in range(LEVELS)]
+        # the demand weighted by LEVEL_WEIGHTS, rebuilt after take_card
+        self._demand_scores = None
 
-        self.cards_map = {}
+        self.cards_map = self.catalog.cards_map
         self.nobles = []
-        self.gems = {}
+        self.gem_vector = GemVector()
         self.players = []
+        # the hash of the board part of the state, see zobrist.py
+        self.zobrist = 0
+        # the event listeners, see events.subscribe
+        self.listeners = None
 
         self._load(should_shuffle)
 
+    def export_state(self):
+        '''Returns the BoardState of the game, strategies and random generator left out'''
+        return BoardState(
+            self.players_cnt,
+            self.points_to_win,
+            tuple(self.gem_vector),
+            tuple(tuple(deck) for deck in self.decks),
+            tuple(self.cards_index),
+            tuple(tuple(card.id for card in row) for row in self.cards),
+            tuple(self.noble_deck),
+            self.noble_index,
+            tuple(noble.id for noble in self.nobles),
+            tuple(PlayerState(
+                player.rep,
+                tuple(player.hand_vector),
+                tuple(sorted(card.id for card in player.cards)),
+                tuple(sorted(card.id for card in player.rev_cards)),
+                player.reserve_count,
+                tuple(sorted(player.known_noble_ids)),
+            ) for player in self.players),
+        )
+
+    @classmethod
+    def restore(cls, state, strategies=DEFAULT_STRATEGIES, seed=None):
+        '''Builds a board from a BoardState, the players get new strategies and a generator seeded with seed'''
+        board = cls(state.players_cnt, points_to_win=state.points_to_win, seed=seed, strategies=strategies)
+        catalog = board.catalog
+        board.gem_vector[:] = state.gems
+        board.decks = [list(deck) for deck in state.decks]
+        board.cards_index = list(state.cards_index)
+        board.cards = [[catalog.cards[id] for id in row] for row in state.cards]
+        board.visible = {card.id: (level, slot) for level, row in enumerate(board.cards)
+                         for slot, card in enumerate(row)}
+        board.noble_deck = list(state.noble_deck)
+        board.noble_index = state.noble_index
+        board.nobles = [catalog.nobles[id] for id in state.nobles]
+        board.zobrist = board_key(board)
+        board._reset_demand()
+        for player, player_state in zip(board.players, state.players):
+            for id in player_state.cards:
+                player.add_card(catalog.cards[id])
+            for id in player_state.rev_cards:
+                player._reserve(catalog.cards[id])
+            for id in player_state.nobles:
+                player.attract_noble(catalog.nobles[id])
+            player.rep = player_state.rep
+            player._set_hand(player_state.hand)
+            player.reserve_count = player_state.reserve_count
+        return board
+
+    def state_hash(self, to_move):
+        '''Returns the 64-bit Zobrist hash of the state with the player to_move to play'''
+        key = self.zobrist ^ TO_MOVE[to_move]
+        for player in self.players:
+            key ^= player.zobrist ^ rep_key(player.id, player.rep)
+        return key
+
+    @property
+    def gems(self):
+        return GemView(self.gem_vector)
+
     def get_gems(self):
         '''Returns current gems showing on the board'''
-        return self.gems
+        return GemView(self.gem_vector)
 
     def take_gems(self, gems):
         '''Takes gems from the board'''
-        if not greater_than_or_equal_to(self.gems, gems):
+        self.take_gem_vector(GemVector.from_dict(gems))
+
+    def take_gem_vector(self, gems):
+        '''Takes a GemVector of gems from the board'''
+        if not self.gem_vector.covers(gems):
             raise ValueError("not enough gems")
-        for gem, cnt in gems.items():
-            self.gems[gem] -= cnt
+        self.zobrist ^= sub_counts(BOARD_GEMS, self.gem_vector, gems)
 
     def payback_gems(self, gems):
         '''Pay back the gems to the board'''
-        for gem, cnt in gems.items():
-            self.gems[gem] += cnt
+        self.payback_gem_vector(GemVector.from_dict(gems))
+
+    def payback_gem_vector(self, gems):
+        '''Pay back a GemVector of gems to the board'''
+        self.zobrist ^= add_counts(BOARD_GEMS, self.gem_vector, gems)
 
     def get_cards(self):
         '''Returns current development cards showing on the board'''
         return self.cards
 
+    def visible_cards(self):
+        '''Returns the cards showing on the board as one list, level by level'''
+        return self._get_table()[0]
+
+    def card_costs(self):
+        '''Returns the cost vectors of visible_cards(), the cost table of affordability.assess'''
+        return self._get_table()[1]
+
+    def _get_table(self):
+        if self._table is None:
+            cards = [card for row in self.cards for card in row]
+            self._table = (cards, [card.cost_vector for card in cards])
+        return self._table
+
+    def gem_demand(self):
+        '''
+        Returns how much the visible cards ask for every gem, the gems each
+        card costs weighted by LEVEL_WEIGHTS of its level.
+        '''
+        if self._demand_scores is None:
+            d0, d1, d2 = self.demand
+            w0, w1, w2 = LEVEL_WEIGHTS
+            self._demand_scores = [d0[g] * w0 + d1[g] * w1 + d2[g] * w2 for g in range(N_GEMS)]
+        return self._demand_scores
+
+    def _add_demand(self, card, sign):
+        '''Adds (sign 1) or removes (sign -1) the cost of a card to the demand'''
+        counts = self.demand[card.level - 1]
+        for g, cnt in enumerate(card.cost_vector):
+            if cnt:
+                counts[g] += sign * cnt
+        self._demand_scores = None
+
+    def _reset_demand(self):
+        self.demand = [[0] * N_GEMS for _ in range(LEVELS)]
+        for row in self.cards:
+            for card in row:
+                self._add_demand(card, 1)
+
     def get_card(self, id):
         '''Returns a developement card for a given id'''
         return self.cards_map.get(id, None)
 
+    @property
+    def all_cards(self):
+        '''Returns the development cards of each level in the deck order'''
+        cards = self.catalog.cards
+        return [[cards[id] for id in deck] for deck in self.decks]
+
+    @property
+    def all_nobles(self):
+        '''Returns the nobles in the deck order'''
+        nobles = self.catalog.nobles
+        return [nobles[id] for id in self.noble_deck]
+
+    def is_visible(self, id):
+        '''Returns whether a development card is showing on the board'''
+        return id in self.visible
+
     def take_card(self, id):
-        '''Takes a card from the board'''
-        if id not in self.cards_map:
+        '''Takes a card from the board and refills its slot from the deck'''
+        if id not in self.visible:
             raise ValueError("invalid card_id")
         
-        card = self.cards_map[id]
-        ## notice that the level in the card is starting from 1 !
-        level = card.level - 1
-        for i in range(4):
-            if (self.cards[level][i].id == id):
-                del self.cards[level][i]
-                if self.cards_index[level] < len(self.all_cards[level]):
-                    self.cards[level].append(self.all_cards[level][self.cards_index[level]])
-                    self.cards_index[level] += 1
-                break
+        level, slot = self.visible.pop(id)
+        self._table = None
+        row = self.cards[level]
+        self._add_demand(row[slot], -1)
+        cursor = self.cards_index[level]
+        key = VISIBLE[id][slot]
+        if cursor < len(self.decks[level]):
+            new_id = self.decks[level][cursor]
+            self.cards_index[level] = cursor + 1
+            row[slot] = self.cards_map[new_id]
+            self._add_demand(row[slot], 1)
+            self.visible[new_id] = (level, slot)
+            key ^= VISIBLE[new_id][slot] ^ CURSOR[level][cursor] ^ CURSOR[level][cursor + 1]
+        else:
+            # the deck is empty, the row shrinks
+            del row[slot]
+            for i in range(slot, len(row)):
+                self.visible[row[i].id] = (level, i)
+                key ^= VISIBLE[row[i].id][i + 1] ^ VISIBLE[row[i].id][i]
+        self.zobrist ^= key
 
     def get_nobles(self):
         '''Returns current nobles showing on the board'''
         return self.nobles
 
     def _load(self, should_shuffle):
-        self._load_all_cards()
-        self._load_all_nobles()
         if should_shuffle:
             self._shuffle()
         self._init_players()
         self._init_gems()
         self._init_cards()
         self._init_nobles()
+        self.zobrist = board_key(self)
+        self._reset_demand()
 
     def _init_players(self):
         '''Initiates players for the board to start the game'''
+        assert self.players_cnt <= MAX_PLAYERS
         for i in range(0, self.players_cnt):
             self.players.append(Player(i))
-        
-        self.players[0].set_strategy(NaiveStrategy(self, self.players[0]))
-        self.players[1].set_strategy(AggressiveStrategy(self, self.players[1]))
-        self.players[2].set_strategy(SmartStrategy(self, self.players[2]))
 
-        #for player in self.players:
-        #    player.set_strategy(NaiveStrategy(self, player))
+        for player in self.players:
+            strategy = self.strategies[player.id % len(self.strategies)]
+            player.set_strategy(strategy(self, player))
 
     def _shuffle(self):
         '''Shuffle cards and nobles'''
-        for cards in self.all_cards:
-            random.shuffle(cards)
+        for deck in self.decks:
+            self.rng.shuffle(deck)
         
-        random.shuffle(self.all_nobles)
+        self.rng.shuffle(self.noble_deck)
 
     def _init_cards(self):
         '''Initiates development cards for the board to start the game'''
         for i in range(3):
             self.cards.append([])
-            for _ in range(4):
-                self.cards[i].append(self.all_cards[i][self.cards_index[i]])
+            for slot in range(4):
+                id = self.decks[i][self.cards_index[i]]
+                self.cards[i].append(self.cards_map[id])
+                self.visible[id] = (i, slot)
                 self.cards_index[i] += 1
 
     def _init_gems(self):
         '''Initiates gems for the board to start the game'''
         assert self.players_cnt >= 2 and self.players_cnt <= 4
-        for gem_type in Gem:
+        for i in range(len(self.gem_vector)):
             if self.players_cnt == 4:
-                self.gems[gem_type] = 7
+                self.gem_vector[i] = 7
             else:
-                self.gems[gem_type] = 2 + self.players_cnt
-        self.gems[Gem.GOLD] = 5
+                self.gem_vector[i] = 2 + self.players_cnt
+        self.gem_vector[GOLD] = 5
 
     def _init_nobles(self):
         '''Initiates nobles for the board to start the game'''
         for _ in range(self.players_cnt + 1):
-            self.nobles.append(self.all_nobles[self.noble_index])
+            self.nobles.append(self.catalog.nobles[self.noble_deck[self.noble_index]])
             self.noble_index += 1
 
-    def _load_all_cards(self):
-        '''Loads all development cards from CSV file'''
-        fo = open('config/cards.csv')
-        reader = csv.reader(fo)
-        next(reader, None) # skip header
-        id = 0
-        for _ in range(3):
-            self.all_cards.append([])
-
-        for line in reader:
-            assert len(line) == 8
-            level = int(line[0])
-            assert (level >= 1 and level <= 3)
-            card = Card(
-                id, level, Gem._value2member_map_[line[1]], int(line[2]),
-                self._get_cost([gem for gem in Gem], line[3:]))
-            self.all_cards[level - 1].append(card)
-            self.cards_map[id] = card
-            id += 1
-        fo.close()
-
-    def _load_all_nobles(self):
-        '''Loads all nobles from CSV file'''
-        fo = open('config/nobles.csv')
-        reader = csv.reader(fo)
-        next(reader, None) # skip header
-        id = 0
-        for line in reader:
-            assert len(line) == 6
-            noble = Noble(id, int(line[2]), self._get_cost([gem for gem in Gem], line[1:]))
-            id += 1
-            self.all_nobles.append(noble)
-        fo.close()
-
-    def _get_cost(self, gems, values):
-        cost = {}
-        for gem, count in zip(gems[:-1], values):
-            if len(count) == 0:
-                continue
-            cost[gem] = int(count)
-        return cost
-
     def _check_and_update_nobles(self, player):
-        '''Checks all nobles and take if possible'''
-        idx_to_remove = -1
+        '''Checks all nobles and take if possible, returns the index the noble had or -1'''
+        i = self._find_noble(player)
+        if i >= 0:
+            player.attract_noble(self._remove_noble(i))
+        return i
+
+    def _remove_noble(self, i):
+        noble = self.nobles.pop(i)
+        self.zobrist ^= BOARD_NOBLES[noble.id]
+        return noble
+
+    def _insert_noble(self, i, noble):
+        self.nobles.insert(i, noble)
+        self.zobrist ^= BOARD_NOBLES[noble.id]
+
+    def _find_noble(self, player):
+        '''Returns the index of the first noble the player can attract, or -1'''
         nobles = self.nobles
         for i in range(len(nobles)):
-            if nobles[i].can_attract(player.card_summary()):
-                player.attract_noble(nobles[i])
-                idx_to_remove = i
-                break
-        if idx_to_remove >= 0:
-            del nobles[i]
-    
+            if nobles[i].can_attract(player.card_vector):
+                return i
+        return -1
+
+    def apply(self, player, action_params):
+        '''
+        Plays a turn in place: the action of the player then the noble check.
+        Returns the UndoRecord undo() takes to reverse it exactly. The action
+        must be legal, see moves.legal_moves.
+        '''
+        card = self.cards_map.get(action_params.card_id)
+        position = self.visible.get(action_params.card_id)
+        cursor = self.cards_index[position[0]] if position is not None else -1
+        record = UndoRecord(player, action_params.action, card, position, player.hand_vector.copy(),
+                            player.rep, player.reserve_count)
+        player.apply_action(action_params, self)
+        if position is not None:
+            record.refilled = self.cards_index[position[0]] != cursor
+        i = self._find_noble(player)
+        if i >= 0:
+            record.noble_index = i
+            record.noble = self._remove_noble(i)
+            player.attract_noble(record.noble)
+        return record
+
+    def undo(self, record):
+        '''Reverses the turn played by apply(), the records must be undone last in first out'''
+        player = record.player
+        action = record.action
+        card = record.card
+        if record.noble is not None:
+            self._insert_noble(record.noble_index, record.noble)
+            player.release_noble(record.noble)
+
+        if action is Action.BUY_CARD:
+            player.remove_card(card)
+        elif action is Action.RESERVE_CARD:
+            player._unreserve(card)
+        elif action is Action.BUY_RESERVE_CARD:
+            player.remove_card(card)
+            player._reserve(card)
+        if record.position is not None:
+            self._untake_card(card, record.position, record.refilled)
+
+        # the gems only move between the hand and the board
+        spent = player.hand_vector.minus(record.hand)
+        self.payback_gem_vector(spent)
+        player._sub_gems(spent)
+        player.rep = record.rep
+        player.reserve_count = record.reserve_count
+
+    def _untake_card(self, card, position, refilled):
+        '''Puts a card back in the slot take_card() took it from'''
+        level, slot = position
+        row = self.cards[level]
+        key = VISIBLE[card.id][slot]
+        if refilled:
+            cursor = self.cards_index[level]
+            key ^= VISIBLE[row[slot].id][slot] ^ CURSOR[level][cursor] ^ CURSOR[level][cursor - 1]
+            self._add_demand(row[slot], -1)
+            del self.visible[row[slot].id]
+            self.cards_index[level] = cursor - 1
+            row[slot] = card
+        else:
+            row.insert(slot, card)
+            for i in range(slot + 1, len(row)):
+                self.visible[row[i].id] = (level, i)
+                key ^= VISIBLE[row[i].id][i - 1] ^ VISIBLE[row[i].id][i]
+        self.visible[card.id] = position
+        self._table = None
+        self._add_demand(card, 1)
+        self.zobrist ^= key
+
     def _get_winners(self):
         candidates = []
         for player in self.players:
@@ -0,0 +1,85 @@
+import csv
+import os
+
+from model import (
+    Gem,
+    Card,
+    Noble,
+)
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config')
+CARDS_FILE = os.path.join(CONFIG_DIR, 'cards.csv')
+NOBLES_FILE = os.path.join(CONFIG_DIR, 'nobles.csv')
+
+LEVELS = 3
+
+
+class Catalog(object):
+    '''
+    All the development cards and nobles of the game.
+    The catalog is shared by every board of the process, so the cards and
+    nobles in it must be treated as read-only.
+    '''
+    def __init__(self, cards, nobles):
+        # indexed by card id / noble id
+        self.cards = tuple(cards)
+        self.nobles = tuple(nobles)
+        self.cards_map = {card.id: card for card in self.cards}
+
+        # card ids of each level in the csv order
+        self.level_ids = tuple(
+            tuple(card.id for card in self.cards if card.level == level + 1)
+            for level in range(LEVELS)
+        )
+
+
+_catalog = None
+
+def get_catalog():
+    '''Returns the process-wide catalog, loads it on the first call'''
+    global _catalog
+    if _catalog is None:
+        _catalog = load_catalog()
+    return _catalog
+
+
+def load_catalog(cards_file=CARDS_FILE, nobles_file=NOBLES_FILE):
+    '''Parses the CSV files into a new catalog'''
+    return Catalog(_load_cards(cards_file), _load_nobles(nobles_file))
+
+
+def _load_cards(path):
+    '''Loads all development cards from CSV file'''
+    cards = []
+    with open(path) as fo:
+        reader = csv.reader(fo)
+        next(reader, None) # skip header
+        for line in reader:
+            assert len(line) == 8
+            level = int(line[0])
+            assert (level >= 1 and level <= LEVELS)
+            cards.append(Card(
+                len(cards), level, Gem._value2member_map_[line[1]], int(line[2]),
+                _get_cost(line[3:])))
+    return cards
+
+
+def _load_nobles(path):
+    '''Loads all nobles from CSV file'''
+    nobles = []
+    with open(path) as fo:
+        reader = csv.reader(fo)
+        next(reader, None) # skip header
+        for line in reader:
+            assert len(line) == 6
+            nobles.append(Noble(len(nobles), int(line[2]), _get_cost(line[1:])))
+    return nobles
+
+
+def _get_cost(values):
+    cost = {}
+    for gem, count in zip(list(Gem)[:-1], values):
+        if len(count) == 0:
+            continue
+        cost[gem] = int(count)
+    return cost
@@ -0,0 +1,64 @@
+'''
+Determinization of the hidden information of a board.
+
+The order of the cards left in the decks, Board.decks[level][cards_index[level]:],
+is hidden from the players. A Determinizer reshuffles only those unseen cards
+in place, so a search can play on one possible order at a time without
+reading the real one. It keeps one saved copy of the real order per level and
+writes it back when the search is over; no sample allocates.
+
+The nobles left in the noble deck are never drawn during a game, they do not
+need sampling. The order of the decks is not part of Board.state_hash, so
+every sample of a state hashes the same.
+'''
+
+
+class Determinizer(object):
+    '''
+    Samples the unseen deck order of a board, used as a context manager:
+        with determinizer:
+            determinizer.sample()
+            ...
+    The real order is saved on entry and written back on exit.
+    '''
+    def __init__(self, board, rng):
+        self.board = board
+        self.rng = rng
+        # the real order of the unseen cards of each level, and the same cards
+        # sorted, the samples start from; both reused across searches
+        self.saved = [[] for _ in board.decks]
+        self.sorted = [[] for _ in board.decks]
+        self.samples = 0
+
+    def __enter__(self):
+        board = self.board
+        for saved, ids, deck, cursor in zip(self.saved, self.sorted, board.decks, board.cards_index):
+            saved[:] = deck[cursor:]
+            ids[:] = saved
+            ids.sort()
+        return self
+
+    def __exit__(self, *exc):
+        board = self.board
+        for saved, deck, cursor in zip(self.saved, board.decks, board.cards_index):
+            deck[cursor:] = saved
+        return False
+
+    def unseen(self, level):
+        '''The sorted ids of the cards of the level the players have not seen'''
+        return self.sorted[level]
+
+    def sample(self):
+        '''
+        Reshuffles the unseen cards of every deck, the board must be at the
+        state of entry. The shuffle starts from the sorted ids, so the samples
+        do not depend on the real order at all.
+        '''
+        rng_random = self.rng.random
+        for ids, deck, cursor in zip(self.sorted, self.board.decks, self.board.cards_index):
+            deck[cursor:] = ids
+            # Fisher-Yates over deck[cursor:], in place
+            for i in range(len(deck) - 1, cursor, -1):
+                j = cursor + int(rng_random() * (i - cursor + 1))
+                deck[i], deck[j] = deck[j], deck[i]
+        self.samples += 1
@@ -0,0 +1,269 @@
+'''
+Change events of a board and its players, for strategies that keep their own
+incremental indexes instead of rescanning the board every turn.
+
+subscribe(board, listener) has listener(event, *args) called after every
+change, with the arguments listed with the events below, or after the changes of the
+events it subscribed to. A board without listeners does
+not publish anything: subscribe swaps the classes of the board and its
+players for subclasses whose mutators publish the events listened to, and
+unsubscribing the last listener swaps them back.
+
+Board.undo publishes the reverse events (CARD_RETURNED, CARD_REMOVED, ...);
+it gives the gems back as one GEMS_PAID of the net vector, whose counts can
+be negative.
+'''
+
+# the events, with the arguments the listeners get
+# (card, level, slot, refill): refill is the card dealt in the slot, None when the row shrank
+CARD_TAKEN = 0
+# (card, level, slot, removed): removed is the refill put back in the deck, None when the row grew
+CARD_RETURNED = 1
+# (gems): the GemVector taken from / paid back to the board
+GEMS_TAKEN = 2
+GEMS_PAID = 3
+# (player): the hand of the player changed
+HAND_CHANGED = 4
+# (player, card)
+CARD_RESERVED = 5
+CARD_UNRESERVED = 6
+CARD_ADDED = 7
+CARD_REMOVED = 8
+# (player, noble)
+NOBLE_ATTRACTED = 9
+NOBLE_RELEASED = 10
+
+EVENTS = tuple(range(11))
+
+
+# the publishing overrides of the Board and Player mutators, one mixin per
+# event so the classes swapped in only override what somebody listens to
+
+class _PublishCardTaken(object):
+    def take_card(self, id):
+        position = self.visible.get(id)
+        if position is None:
+            # not showing, the board raises
+            return super().take_card(id)
+        level, slot = position
+        card = self.cards[level][slot]
+        cursor = self.cards_index[level]
+        super().take_card(id)
+        refill = self.cards[level][slot] if self.cards_index[level] != cursor else None
+        for listener in self.listeners[CARD_TAKEN]:
+            listener(CARD_TAKEN, card, level, slot, refill)
+
+
+class _PublishCardReturned(object):
+    def _untake_card(self, card, position, refilled):
+        level, slot = position
+        removed = self.cards[level][slot] if refilled else None
+        super()._untake_card(card, position, refilled)
+        for listener in self.listeners[CARD_RETURNED]:
+            listener(CARD_RETURNED, card, level, slot, removed)
+
+
+class _PublishGemsTaken(object):
+    def take_gem_vector(self, gems):
+        super().take_gem_vector(gems)
+        for listener in self.listeners[GEMS_TAKEN]:
+            listener(GEMS_TAKEN, gems)
+
+
+class _PublishGemsPaid(object):
+    def payback_gem_vector(self, gems):
+        super().payback_gem_vector(gems)
+        for listener in self.listeners[GEMS_PAID]:
+            listener(GEMS_PAID, gems)
+
+
+class _PublishHandChanged(object):
+    __slots__ = ()
+
+    def _set_hand(self, gems):
+        super()._set_hand(gems)
+        for listener in self.listeners[HAND_CHANGED]:
+            listener(HAND_CHANGED, self)
+
+    def _add_gems(self, gems):
+        super()._add_gems(gems)
+        for listener in self.listeners[HAND_CHANGED]:
+            listener(HAND_CHANGED, self)
+
+    def _sub_gems(self, gems):
+        super()._sub_gems(gems)
+        for listener in self.listeners[HAND_CHANGED]:
+            listener(HAND_CHANGED, self)
+
+
+class _PublishCardReserved(object):
+    __slots__ = ()
+
+    def _reserve(self, card):
+        super()._reserve(card)
+        for listener in self.listeners[CARD_RESERVED]:
+            listener(CARD_RESERVED, self, card)
+
+
+class _PublishCardUnreserved(object):
+    __slots__ = ()
+
+    def _unreserve(self, card):
+        super()._unreserve(card)
+        for listener in self.listeners[CARD_UNRESERVED]:
+            listener(CARD_UNRESERVED, self, card)
+
+
+class _PublishCardAdded(object):
+    __slots__ = ()
+
+    def add_card(self, card):
+        super().add_card(card)
+        for listener in self.listeners[CARD_ADDED]:
+            listener(CARD_ADDED, self, card)
+
+
+class _PublishCardRemoved(object):
+    __slots__ = ()
+
+    def remove_card(self, card):
+        super().remove_card(card)
+        for listener in self.listeners[CARD_REMOVED]:
+            listener(CARD_REMOVED, self, card)
+
+
+class _PublishNobleAttracted(object):
+    __slots__ = ()
+
+    def attract_noble(self, noble):
+        super().attract_noble(noble)
+        for listener in self.listeners[NOBLE_ATTRACTED]:
+            listener(NOBLE_ATTRACTED, self, noble)
+
+
+class _PublishNobleReleased(object):
+    __slots__ = ()
+
+    def release_noble(self, noble):
+        super().release_noble(noble)
+        for listener in self.listeners[NOBLE_RELEASED]:
+            listener(NOBLE_RELEASED, self, noble)
+
+
+# indexed by event, the mixin publishing it on the board or on the players
+_BOARD_MIXINS = (
+    _PublishCardTaken, _PublishCardReturned, _PublishGemsTaken, _PublishGemsPaid,
+) + (None,) * 7
+_PLAYER_MIXINS = (None,) * 4 + (
+    _PublishHandChanged, _PublishCardReserved, _PublishCardUnreserved, _PublishCardAdded, _PublishCardRemoved,
+    _PublishNobleAttracted, _PublishNobleReleased,
+)
+
+# (plain class, mixins) -> the publishing class, and the publishing class -> the plain one
+_publishing = {}
+_plain = {}
+
+
+def _publishing_class(cls, listeners, mixins):
+    cls = _plain.get(cls, cls)
+    bases = tuple(mixins[event] for event in EVENTS if mixins[event] is not None and listeners[event])
+    if not bases:
+        return cls
+    sub = _publishing.get((cls, bases))
+    if sub is None:
+        namespace = {'__slots__': ()} if hasattr(cls, '__slots__') else {}
+        sub = _publishing[(cls, bases)] = type('Publishing' + cls.__name__, bases + (cls,), namespace)
+        _plain[sub] = cls
+    return sub
+
+
+def _swap_classes(board):
+    listeners = board.listeners
+    board.__class__ = _publishing_class(type(board), listeners, _BOARD_MIXINS)
+    for player in board.players:
+        player.listeners = listeners
+        player.__class__ = _publishing_class(type(player), listeners, _PLAYER_MIXINS)
+
+
+def subscribe(board, listener, events=EVENTS):
+    '''Calls listener(event, *args) after every change of the board and of its players of the events'''
+    if board.listeners is None:
+        # indexed by event, the listeners of the event, shared by the board and its players
+        board.listeners = [[] for _ in EVENTS]
+    for event in events:
+        board.listeners[event].append(listener)
+    _swap_classes(board)
+
+
+def unsubscribe(board, listener):
+    for listeners in board.listeners:
+        if listener in listeners:
+            listeners.remove(listener)
+    _swap_classes(board)
+    if not any(board.listeners):
+        board.listeners = None
+        for player in board.players:
+            player.listeners = None
+
+
+class TableIndex(object):
+    '''
+    The visible cards and their costs in the table order, like
+    Board.visible_cards and Board.card_costs, kept up to date from the
+    CARD_TAKEN / CARD_RETURNED events instead of being rebuilt. It is built
+    from the board on first use, so it can subscribe before the cards are dealt.
+    '''
+    def __init__(self, board):
+        self.board = board
+        self.rows = None
+        self.cards = None
+        self.costs = None
+        subscribe(board, self._taken, (CARD_TAKEN,))
+        subscribe(board, self._returned, (CARD_RETURNED,))
+
+    def _taken(self, event, card, level, slot, refill):
+        if self.rows is None:
+            return
+        i = self._index(level, slot)
+        if refill is not None:
+            self.rows[level][slot] = refill
+            self.cards[i] = refill
+            self.costs[i] = refill.cost_vector
+        else:
+            del self.rows[level][slot]
+            del self.cards[i]
+            del self.costs[i]
+
+    def _returned(self, event, card, level, slot, removed):
+        if self.rows is None:
+            return
+        i = self._index(level, slot)
+        if removed is not None:
+            self.rows[level][slot] = card
+            self.cards[i] = card
+            self.costs[i] = card.cost_vector
+        else:
+            self.rows[level].insert(slot, card)
+            self.cards.insert(i, card)
+            self.costs.insert(i, card.cost_vector)
+
+    def _index(self, level, slot):
+        i = slot
+        for row in self.rows[:level]:
+            i += len(row)
+        return i
+
+    def _build(self):
+        self.rows = [list(row) for row in self.board.cards]
+        self.cards = [card for row in self.rows for card in row]
+        self.costs = [card.cost_vector for card in self.cards]
+
+    def visible_cards(self):
+        if self.rows is None:
+            self._build()
+        return self.cards
+
+    def card_costs(self):
+        if self.rows is None:
+            self._build()
+        return self.costs
@@ -1,52 +1,371 @@
 #! /usr/local/bin/python3
 
+import argparse
+import functools
+import multiprocessing
+import os
+import random
 import time
-import sys
-from board import Board
+from board import (
+    Board,
+    DEFAULT_STRATEGIES,
+)
+from instrumentation import (
+    Instrumentation,
+    clock,
+    DECIDE,
+    APPLY,
+    NOBLES,
+    CAN_WIN,
+    WINNERS,
+    SEARCH,
+)
+from player import Action
+from state_codec import StateLog
+from profiling import (
+    Profiler,
+    MODES as PROFILE_MODES,
+)
+from strategies.naive_strategy import NaiveStrategy
+from strategies.aggressive_strategy import AggressiveStrategy
+from strategies.smart_strategy import SmartStrategy
+from strategies.mcts_strategy import (
+    MCTSStrategy,
+    DEFAULT_ITERATIONS as MCTS_ITERATIONS,
+)
+from strategies.ismcts_strategy import ISMCTSStrategy
+
+# number of shards handed to each worker, more shards balance the load better
+SHARDS_PER_WORKER = 4
+
+# a game is aborted after that many player turns
+DEFAULT_MAX_TURNS = 1000
+
+# strategy names of the command line
+STRATEGIES = {
+    'naive': NaiveStrategy,
+    'aggressive': AggressiveStrategy,
+    'smart': SmartStrategy,
+    'mcts': MCTSStrategy,
+    'ismcts': ISMCTSStrategy,
+}
+
+# how a game ended
+WIN = 'win'
+DRAW = 'draw'
+ABORT = 'abort'
 
 
 class Game(object):
-    def __init__(self, players_cnt):
-        self.board = Board(players_cnt, should_shuffle=True)
-    
+    def __init__(self, players_cnt, seed=None, max_turns=DEFAULT_MAX_TURNS, instrumentation=None,
+                 strategies=DEFAULT_STRATEGIES, state_log=None):
+        self.board = Board(players_cnt, should_shuffle=True, seed=seed, strategies=strategies)
+        self.max_turns = max_turns
+        # number of player turns played so far
+        self.turns = 0
+        # consecutive turns in which nobody could make progress
+        self.idle_turns = 0
+        self.status = None
+        # an optional state_codec.StateLog the state is appended to after every round
+        self.state_log = state_log
+
+        # the timed turn is only swapped in when instrumentation is wanted
+        self.instrumentation = instrumentation
+        if instrumentation is not None:
+            self._take_turn = self._take_timed_turn
+            self._end_turn = self._end_timed_turn
+
+    @classmethod
+    def from_checkpoint(cls, turns, idle_turns, view, seed=None, max_turns=DEFAULT_MAX_TURNS, instrumentation=None,
+                        strategies=DEFAULT_STRATEGIES, state_log=None):
+        '''
+        Resumes a game from a record of a state log, see state_codec.read_log.
+        The strategies start afresh, so the rest of the game only replays the
+        original one when they do not depend on their history.
+        '''
+        game = cls(view.players_cnt, seed, max_turns, instrumentation, strategies, state_log)
+        game.board = Board.restore(view.state(), strategies, seed)
+        game.turns = turns
+        game.idle_turns = idle_turns
+        return game
+
     def play(self):
+        board = self.board
+        players = board.players
+        idle_turns = self.idle_turns
         can_win = False
         while not can_win:
             # take turns
-            for player in self.board.players:
-                player.take_action(self.board)
-                self.board._check_and_update_nobles(player)
-                if player.can_win(self.board.points_to_win):
+            for player in players:
+                if self._take_turn(player):
+                    idle_turns = 0
+                else:
+                    idle_turns += 1
+                self.turns += 1
+                if self._end_turn(player):
                     can_win = True
-        winners = []
-        if can_win:
-            winners = [p.id for p in self.board._get_winners()]
-        return winners
+            self.idle_turns = idle_turns
+            if self.state_log is not None:
+                self.state_log.append(board.export_state(), self.turns, idle_turns)
+            if can_win:
+                break
+            if idle_turns >= len(players):
+                # every player had to pass, nothing will ever change
+                self.status = DRAW
+                return []
+            if self.max_turns is not None and self.turns >= self.max_turns:
+                self.status = ABORT
+                return []
+        self.status = WIN
+        if self.instrumentation is not None:
+            start = clock()
+            winners = board._get_winners()
+            self.instrumentation.record(WINNERS, 'board', clock() - start)
+        else:
+            winners = board._get_winners()
+        return [p.id for p in winners]
 
-if __name__ == '__main__':
-    args = sys.argv[1:]
-    if len(args) < 2:
-        print("Missing arguments: python3 game.py player_cnt rounds")
-        exit(1)
-
-    players = int(args[0])
-    rounds = int(args[1])
-    win = {}
-    even = {}
-    for i in range(players):
-        win[i] = 0
-        even[i] = 0
-    
-    start = time.perf_counter()
-    for i in range(rounds):
-        game = Game(players)
-        winners = game.play()
-        if len(winners) == 1:
-            win[winners[0]] = win[winners[0]] + 1
+    def _take_turn(self, player):
+        '''Plays the turn of the player, returns False if the player had to pass'''
+        action_params = player.strategy.next_step()
+        if action_params.action is Action.NONE:
+            return False
+        try:
+            player.apply_action(action_params, self.board)
+        except ValueError:
+            # the strategy asked for a move the board cannot give any more
+            return False
+        return True
+
+    def _end_turn(self, player):
+        '''Attracts nobles, returns whether the player reached the points to win'''
+        self.board._check_and_update_nobles(player)
+        return player.can_win(self.board.points_to_win)
+
+    def _take_timed_turn(self, player):
+        instrumentation = self.instrumentation
+        start = clock()
+        action_params = player.strategy.next_step()
+        decided = clock()
+        instrumentation.record(DECIDE, type(player.strategy).__name__, decided - start)
+        if action_params.action is Action.NONE:
+            instrumentation.count('passes')
+            return False
+        try:
+            player.apply_action(action_params, self.board)
+            instrumentation.record(APPLY, action_params.action.name, clock() - decided)
+        except ValueError:
+            instrumentation.count('passes')
+            instrumentation.count('rejected actions')
+            return False
+        return True
+
+    def _end_timed_turn(self, player):
+        instrumentation = self.instrumentation
+        start = clock()
+        self.board._check_and_update_nobles(player)
+        checked = clock()
+        can_win = player.can_win(self.board.points_to_win)
+        instrumentation.record(NOBLES, 'board', checked - start)
+        instrumentation.record(CAN_WIN, 'player', clock() - checked)
+        return can_win
+
+
+class Tally(object):
+    '''Results of a batch of games, tallies of different workers can be merged'''
+    def __init__(self, players_cnt):
+        self.games = 0
+        self.win = {i: 0 for i in range(players_cnt)}
+        self.even = {i: 0 for i in range(players_cnt)}
+        self.draws = 0
+        self.aborts = 0
+        # game length in player turns -> number of games
+        self.turns = {}
+        # set when the games were instrumented / profiled
+        self.instrumentation = None
+        self.profile = None
+
+    def add(self, game, winners):
+        self.games += 1
+        self.turns[game.turns] = self.turns.get(game.turns, 0) + 1
+        if game.status == DRAW:
+            self.draws += 1
+        elif game.status == ABORT:
+            self.aborts += 1
+        elif len(winners) == 1:
+            self.win[winners[0]] += 1
         else:
             for w in winners:
-                even[w] = even[w] + 1
+                self.even[w] += 1
+
+    def merge(self, other):
+        self.games += other.games
+        for i in self.win:
+            self.win[i] += other.win[i]
+            self.even[i] += other.even[i]
+        self.draws += other.draws
+        self.aborts += other.aborts
+        for turns, cnt in other.turns.items():
+            self.turns[turns] = self.turns.get(turns, 0) + cnt
+        if other.instrumentation is not None:
+            if self.instrumentation is None:
+                self.instrumentation = Instrumentation()
+            self.instrumentation.merge(other.instrumentation)
+        if other.profile is not None:
+            if self.profile is None:
+                self.profile = other.profile
+            else:
+                self.profile.merge(other.profile)
+        return self
+
+    def turns_percentile(self, q):
+        '''Returns the game length below which a fraction q of the games ended'''
+        seen = 0
+        for turns in sorted(self.turns):
+            seen += self.turns[turns]
+            if seen >= q * self.games:
+                return turns
+        return 0
+
+    def __eq__(self, other):
+        return (self.games, self.win, self.even, self.draws, self.aborts, self.turns) == \
+            (other.games, other.win, other.even, other.draws, other.aborts, other.turns)
+
+
+def play_games(players_cnt, start, stop, seed, max_turns=DEFAULT_MAX_TURNS, instrument=False, profile=None,
+               strategies=DEFAULT_STRATEGIES, state_log_dir=None):
+    '''
+    Plays the games [start, stop) and returns their Tally.
+    profile is an optional (mode, output directory) pair, see profiling.Profiler.
+    With a state_log_dir the rounds of game i are logged to game-<seed + i>.states in it.
+    '''
+    tally = Tally(players_cnt)
+    if instrument:
+        tally.instrumentation = Instrumentation()
+    profiler = Profiler(*profile) if profile is not None else None
+    for i in range(start, stop):
+        # every game gets its own seed, so the result does not depend on
+        # which worker ends up playing it
+        state_log = StateLog(state_log_path(state_log_dir, seed + i)) if state_log_dir is not None else None
+        game = Game(players_cnt, seed=seed + i, max_turns=max_turns,
+                    instrumentation=tally.instrumentation, strategies=strategies, state_log=state_log)
+        winners = profiler.play(game) if profiler is not None else game.play()
+        if state_log is not None:
+            state_log.close()
+        tally.add(game, winners)
+        if tally.instrumentation is not None:
+            for player in game.board.players:
+                player.strategy.report(tally.instrumentation)
+    if profiler is not None:
+        tally.profile = profiler.report()
+    return tally
+
+
+def state_log_path(state_log_dir, seed):
+    return os.path.join(state_log_dir, f"game-{seed}.states")
+
+
+def _play_shard(args):
+    return play_games(*args)
+
+
+def _shards(rounds, workers):
+    '''Splits the game indexes into contiguous [start, stop) ranges'''
+    shard_cnt = min(rounds, workers * SHARDS_PER_WORKER)
+    bounds = [rounds * i // shard_cnt for i in range(shard_cnt + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(shard_cnt) if bounds[i] < bounds[i + 1]]
+
+
+def run_tournament(players_cnt, rounds, seed, workers=1, max_turns=DEFAULT_MAX_TURNS,
+                   instrument=False, profile=None, strategies=DEFAULT_STRATEGIES, state_log_dir=None):
+    '''Plays rounds games, sharded across workers processes when workers > 1'''
+    if state_log_dir is not None:
+        os.makedirs(state_log_dir, exist_ok=True)
+    if workers <= 1 or rounds <= 1:
+        return play_games(players_cnt, 0, rounds, seed, max_turns, instrument, profile, strategies, state_log_dir)
+
+    tally = Tally(players_cnt)
+    shards = [
+        (players_cnt, start, stop, seed, max_turns, instrument, profile, strategies, state_log_dir)
+        for start, stop in _shards(rounds, workers)
+    ]
+    with multiprocessing.Pool(workers) as pool:
+        for shard_tally in pool.imap_unordered(_play_shard, shards):
+            tally.merge(shard_tally)
+    return tally
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description='Plays a tournament of splendor games')
+    parser.add_argument('player_cnt', type=int, help='number of players per game (2 - 4)')
+    parser.add_argument('rounds', type=int, help='number of games to play')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of worker processes to shard the games across')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='master seed, game i is shuffled with seed + i')
+    parser.add_argument('--max-turns', type=int, default=DEFAULT_MAX_TURNS,
+                        help='player turns after which a game is aborted')
+    parser.add_argument('--instrument', action='store_true',
+                        help='time the decision, action and bookkeeping phases of every turn')
+    parser.add_argument('--profile', choices=PROFILE_MODES, default=None,
+                        help='profile the games per strategy: cprofile writes pstats and collapsed stacks, '
+                             'sample writes collapsed stacks from a sampling profiler')
+    parser.add_argument('--profile-dir', default='profile',
+                        help='directory the profiles are written to')
+    parser.add_argument('--strategies', nargs='+', choices=sorted(STRATEGIES), default=None,
+                        help='strategies handed out to the players round-robin, '
+                             'defaults to naive aggressive smart')
+    parser.add_argument('--mcts-iterations', type=int, default=MCTS_ITERATIONS,
+                        help='playouts per move of the mcts and ismcts strategies')
+    parser.add_argument('--mcts-workers', type=int, default=1,
+                        help='processes of the root-parallel mcts search, each runs the iterations')
+    parser.add_argument('--mcts-time', type=float, default=None,
+                        help='CPU seconds per move of the mcts and ismcts strategies, '
+                             'with --instrument the playouts/sec are reported to tune it')
+    parser.add_argument('--state-log-dir', default=None,
+                        help='directory the binary state of every round of game i is logged to, '
+                             'as game-<seed + i>.states')
+    return parser.parse_args()
+
+
+def _lineup(args):
+    if args.strategies is None:
+        return DEFAULT_STRATEGIES
+    lineup = []
+    for name in args.strategies:
+        strategy = STRATEGIES[name]
+        if strategy is MCTSStrategy:
+            strategy = functools.partial(MCTSStrategy, iterations=args.mcts_iterations, time_budget=args.mcts_time,
+                                         workers=args.mcts_workers)
+        elif strategy is ISMCTSStrategy:
+            strategy = functools.partial(ISMCTSStrategy, iterations=args.mcts_iterations, time_budget=args.mcts_time)
+        lineup.append(strategy)
+    return tuple(lineup)
+
+
+if __name__ == '__main__':
+    args = _parse_args()
+    players = args.player_cnt
+    rounds = args.rounds
+    seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+
+    start = time.perf_counter()
+    profile = (args.profile, args.profile_dir) if args.profile else None
+    tally = run_tournament(players, rounds, seed, workers=args.workers, max_turns=args.max_turns,
+                           instrument=args.instrument, profile=profile, strategies=_lineup(args),
+                           state_log_dir=args.state_log_dir)
     end = time.perf_counter()
-    print(f"Time spent: {end - start:0.4f} seconds")
+    print(f"Time spent: {end - start:0.4f} seconds ({rounds / (end - start):.1f} games/sec, seed: {seed})")
     for i in range(players):
-        print(f"Player {i} win rate: {win[i] / rounds:.2%}, even rate: {even[i] / rounds:.2%}")
\ No newline at end of file
+        print(f"Player {i} win rate: {tally.win[i] / rounds:.2%}, even rate: {tally.even[i] / rounds:.2%}")
+    print(f"Draw rate: {tally.draws / rounds:.2%}, abort rate: {tally.aborts / rounds:.2%}")
+    print(f"Game length in turns: median {tally.turns_percentile(0.5)}, "
+          f"p90 {tally.turns_percentile(0.9)}, max {max(tally.turns, default=0)}")
+    if tally.instrumentation is not None:
+        print(tally.instrumentation.summary())
+        for (phase, key), (calls, seconds) in sorted(tally.instrumentation.timers.items()):
+            if phase == SEARCH and seconds > 0:
+                print(f"{key}: {calls} playouts, {calls / seconds:.1f} playouts/sec")
+    if tally.profile is not None:
+        for path in tally.profile.write(args.profile_dir):
+            print(f"Profile written to {path}")
@@ -0,0 +1,67 @@
+import time
+
+# the phases of a simulated turn
+DECIDE = 'decide'       # strategy.next_step, keyed by strategy class
+APPLY = 'apply'         # Player.apply_action, keyed by action type
+NOBLES = 'nobles'       # Board._check_and_update_nobles
+CAN_WIN = 'can_win'     # Player.can_win
+WINNERS = 'winners'     # Board._get_winners
+SEARCH = 'search'       # playouts of the search strategies, keyed by strategy class
+
+PHASES = (DECIDE, APPLY, NOBLES, CAN_WIN, WINNERS, SEARCH)
+
+clock = time.perf_counter
+
+
+class Instrumentation(object):
+    '''
+    Timers and counters of the simulation hot path.
+    Games only pay for it when they are given one, see Game.
+    '''
+    def __init__(self):
+        # (phase, key) -> [calls, seconds]
+        self.timers = {}
+        # name -> count
+        self.counters = {}
+
+    def record(self, phase, key, seconds):
+        timer = self.timers.get((phase, key))
+        if timer is None:
+            self.timers[(phase, key)] = [1, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+
+    def record_many(self, phase, key, calls, seconds):
+        '''Records calls timed together, like the playouts of a whole game'''
+        if calls:
+            timer = self.timers.setdefault((phase, key), [0, 0.0])
+            timer[0] += calls
+            timer[1] += seconds
+
+    def count(self, name, cnt=1):
+        self.counters[name] = self.counters.get(name, 0) + cnt
+
+    def merge(self, other):
+        for key, (calls, seconds) in other.timers.items():
+            timer = self.timers.setdefault(key, [0, 0.0])
+            timer[0] += calls
+            timer[1] += seconds
+        for name, cnt in other.counters.items():
+            self.count(name, cnt)
+        return self
+
+    def summary(self):
+        '''Returns the timers as a table, sorted by phase then by time spent'''
+        total = sum(seconds for _, seconds in self.timers.values()) or 1.0
+        lines = [f"{'phase':<10}{'key':<22}{'calls':>12}{'total (s)':>12}{'mean (us)':>12}{'share':>9}"]
+        order = {phase: i for i, phase in enumerate(PHASES)}
+        rows = sorted(self.timers.items(), key=lambda kv: (order.get(kv[0][0], len(order)), -kv[1][1]))
+        for (phase, key), (calls, seconds) in rows:
+            lines.append(
+                f"{phase:<10}{str(key):<22}{calls:>12}{seconds:>12.4f}"
+                f"{seconds / calls * 1e6:>12.2f}{seconds / total:>9.2%}"
+            )
+        for name, cnt in sorted(self.counters.items()):
+            lines.append(f"{'count':<10}{name:<22}{cnt:>12}")
+        return '\n'.join(lines)
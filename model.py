@@ -1,8 +1,8 @@
 #! /usr/local/bin/python3
 
+from collections.abc import Mapping
 from enum import Enum
-import csv
-import random
+from types import MappingProxyType
 from util import greater_than_or_equal_to
 
 
@@ -14,20 +14,175 @@ class Gem(Enum):
     BLACK = 'k'
     GOLD = 'o'
 
+# gem vectors are indexed in the Gem declaration order, gold is the last slot
+GEMS = tuple(Gem)
+GEM_INDEX = {gem: i for i, gem in enumerate(GEMS)}
+GOLD = GEM_INDEX[Gem.GOLD]
+N_GEMS = len(GEMS)
+
+
+class GemVector(list):
+    '''Fixed six-slot gem counts, slot i holds the count of GEMS[i]'''
+    __slots__ = ()
+
+    def __init__(self, counts=(0, 0, 0, 0, 0, 0)):
+        super().__init__(counts)
+        assert len(self) == N_GEMS
+
+    @classmethod
+    def from_dict(cls, gems):
+        '''Builds a vector from a Gem-keyed dict'''
+        vector = cls()
+        for gem, cnt in gems.items():
+            vector[GEM_INDEX[gem]] += cnt
+        return vector
+
+    def to_dict(self):
+        return {gem: self[i] for i, gem in enumerate(GEMS)}
+
+    def copy(self):
+        return GemVector(self)
+
+    def total(self):
+        return sum(self)
+
+    def covers(self, other):
+        '''Returns whether every slot is greater than or equal to the other one'''
+        for mine, theirs in zip(self, other):
+            if mine < theirs:
+                return False
+        return True
+
+    def add(self, other):
+        '''Adds the other vector in place'''
+        for i, cnt in enumerate(other):
+            self[i] += cnt
+        return self
+
+    def sub(self, other):
+        '''Substracts the other vector in place'''
+        for i, cnt in enumerate(other):
+            self[i] -= cnt
+        return self
+
+    def plus(self, other):
+        return GemVector([mine + theirs for mine, theirs in zip(self, other)])
+
+    def minus(self, other):
+        return GemVector([mine - theirs for mine, theirs in zip(self, other)])
+
+    def shortfall(self, cost):
+        '''Returns the gems still missing per slot to pay the cost'''
+        return GemVector([c - mine if c > mine else 0 for mine, c in zip(self, cost)])
+
+    def deficit_after_gold(self, cost):
+        '''Returns how many gems are still missing to pay the cost once the gold is spent'''
+        missing = 0
+        for mine, c in zip(self, cost):
+            if c > mine:
+                missing += c - mine
+        missing -= self[GOLD]
+        return missing if missing > 0 else 0
+
+
+class GemView(Mapping):
+    '''Read-only Gem-keyed dict view over a GemVector'''
+    __slots__ = ('_vector',)
+
+    def __init__(self, vector):
+        self._vector = vector
+
+    def __getitem__(self, gem):
+        return self._vector[GEM_INDEX[gem]]
+
+    def __iter__(self):
+        return iter(GEMS)
+
+    def __len__(self):
+        return N_GEMS
+
+    def __repr__(self):
+        return repr(self._vector.to_dict())
+
+
 class Card(object):
+    '''
+    A development card. Cards are immutable and shared by every board through
+    the catalog; cost is a read-only Gem-keyed view and cost_vector the cost
+    as a tuple in the GemVector order. A copied or unpickled catalog card is
+    the catalog card itself.
+    '''
+    __slots__ = ('id', 'level', 'gem', 'reputation', 'cost', 'cost_vector', 'cost_total', '_hash')
+
     def __init__(self, id, level, gem, reputation, cost):
-        self.id = id
-        self.level = level
-        self.gem = gem
-        self.reputation = reputation
-        self.cost = cost
+        _set = object.__setattr__
+        _set(self, 'id', id)
+        _set(self, 'level', level)
+        _set(self, 'gem', gem)
+        _set(self, 'reputation', reputation)
+        _set(self, 'cost', MappingProxyType(dict(cost)))
+        _set(self, 'cost_vector', tuple(GemVector.from_dict(cost)))
+        _set(self, 'cost_total', sum(self.cost_vector))
+        _set(self, '_hash', hash(id))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Card is immutable, cannot set {name}")
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        return (_catalog_card, (self.id, self.level, self.gem, self.reputation, dict(self.cost)))
+
+    def __repr__(self):
+        return f"Card({self.id}, {self.level}, {self.gem}, {self.reputation}, {dict(self.cost)})"
 
 class Noble(object):
+    '''A noble, immutable and shared through the catalog like the cards'''
+    __slots__ = ('id', 'reputation', 'cost', 'cost_vector', '_hash')
+
     def __init__(self, id, reputation, cost):
-        self.id = id
-        self.reputation = reputation
-        self.cost = cost
+        _set = object.__setattr__
+        _set(self, 'id', id)
+        _set(self, 'reputation', reputation)
+        _set(self, 'cost', MappingProxyType(dict(cost)))
+        _set(self, 'cost_vector', tuple(GemVector.from_dict(cost)))
+        _set(self, '_hash', hash(id))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Noble is immutable, cannot set {name}")
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        return (_catalog_noble, (self.id, self.reputation, dict(self.cost)))
+
+    def __repr__(self):
+        return f"Noble({self.id}, {self.reputation}, {dict(self.cost)})"
 
     def can_attract(self, card_summary):
         '''Returns whether a player can attract the noble'''
+        if isinstance(card_summary, GemVector):
+            return card_summary.covers(self.cost_vector)
         return greater_than_or_equal_to(card_summary, self.cost)
+
+
+def _catalog_card(id, level, gem, reputation, cost):
+    '''Returns the catalog card of the id when it is that card, a new Card otherwise'''
+    # catalog imports model, so it is imported here
+    from catalog import get_catalog
+    card = get_catalog().cards_map.get(id)
+    if card is not None and (card.level, card.gem, card.reputation, card.cost) == (level, gem, reputation, cost):
+        return card
+    return Card(id, level, gem, reputation, cost)
+
+
+def _catalog_noble(id, reputation, cost):
+    '''Returns the catalog noble of the id when it is that noble, a new Noble otherwise'''
+    from catalog import get_catalog
+    nobles = get_catalog().nobles
+    noble = nobles[id] if 0 <= id < len(nobles) else None
+    if noble is not None and (noble.reputation, noble.cost) == (reputation, cost):
+        return noble
+    return Noble(id, reputation, cost)
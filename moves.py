@@ -0,0 +1,99 @@
+'''
+Legal move generation for search-based strategies.
+
+legal_moves(board, player) lists every action the player can apply on the
+board without Player raising. The gem picks come from tables precomputed per
+set of non-empty piles, the card moves from the board's cost table.
+'''
+
+import itertools
+
+from model import (
+    GEMS,
+    GOLD,
+)
+from player import (
+    Action,
+    ActionParams,
+)
+
+# the gem colors a player can pick, gold is only handed out by reserving
+COLORS = tuple(range(GOLD))
+MAX_RESERVED = 3
+# a pile needs that many gems to pick two of them
+PICK_SAME_MIN = 4
+
+
+def _pick_three_table():
+    '''
+    Bit mask of the non-empty piles -> the gem dicts of every PICK_THREE.
+    Three different gems when three piles are left, else all the piles left.
+    '''
+    table = []
+    for mask in range(1 << len(COLORS)):
+        available = [g for g in COLORS if mask >> g & 1]
+        size = min(3, len(available))
+        table.append(tuple(
+            {GEMS[g]: 1 for g in combo} for combo in itertools.combinations(available, size)
+        ) if size else ())
+    return tuple(table)
+
+
+def _pick_same_table():
+    '''Bit mask of the piles holding PICK_SAME_MIN gems -> the gem dicts of every PICK_SAME'''
+    return tuple(
+        tuple({GEMS[g]: 2} for g in COLORS if mask >> g & 1)
+        for mask in range(1 << len(COLORS))
+    )
+
+
+PICK_THREE_TABLE = _pick_three_table()
+PICK_SAME_TABLE = _pick_same_table()
+
+# (player id, action, mask) -> the interned ActionParams of the gem picks
+_pick_moves = {}
+
+
+def _picks(player_id, action, table, mask):
+    key = (player_id, action, mask)
+    moves = _pick_moves.get(key)
+    if moves is None:
+        moves = _pick_moves[key] = tuple(ActionParams.of(player_id, action, gems) for gems in table[mask])
+    return moves
+
+
+def legal_moves(board, player):
+    '''
+    Returns the ActionParams of every legal move of the player, in the
+    Action order. An empty list means the player can only pass.
+    '''
+    player_id = player.id
+    gems = board.gem_vector
+    non_empty = 0
+    piles = 0
+    for g in COLORS:
+        if gems[g] > 0:
+            non_empty |= 1 << g
+            if gems[g] >= PICK_SAME_MIN:
+                piles |= 1 << g
+
+    moves = list(_picks(player_id, Action.PICK_THREE, PICK_THREE_TABLE, non_empty))
+    moves.extend(_picks(player_id, Action.PICK_SAME, PICK_SAME_TABLE, piles))
+
+    cards = board.visible_cards()
+    affordable = player.affordable(board.card_costs())
+    for card, can_afford in zip(cards, affordable):
+        if can_afford:
+            moves.append(ActionParams.of(player_id, Action.BUY_CARD, None, card.id))
+
+    if player.reserve_count < MAX_RESERVED and gems[GOLD] > 0:
+        for card in cards:
+            moves.append(ActionParams.of(player_id, Action.RESERVE_CARD, None, card.id))
+
+    if player.rev_cards:
+        reserved = sorted(player.rev_cards, key=lambda c: c.id)
+        affordable = player.affordable([card.cost_vector for card in reserved])
+        for card, can_afford in zip(reserved, affordable):
+            if can_afford:
+                moves.append(ActionParams.of(player_id, Action.BUY_RESERVE_CARD, None, card.id))
+    return moves
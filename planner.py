@@ -0,0 +1,148 @@
+'''
+Shortest gem-acquisition plans.
+
+plan(cost, discount, hand, supply) returns the fewest turns a player needs to
+afford a card, and the moves of those turns, under the gem rules of
+moves.legal_moves: three different gems, two of a pile holding PICK_SAME_MIN
+gems, or a gold by reserving a card while the player has reserves left.
+The board supply is the one given, less the gems the plan takes itself; the
+other players are not modelled.
+
+The hand holds at most HAND_LIMIT gems at the end of a turn. Gems picked that
+the card does not need are discarded, which costs nothing, so the limit only
+rules out the cards needing more gems than that beyond the discount.
+
+A plan only depends on what the card still misses, so the searches are keyed
+by the missing gems, the gold and the supply capped at what can still matter,
+and memoized across turns and games.
+'''
+
+import itertools
+from collections import namedtuple
+from functools import lru_cache
+
+from model import GOLD
+from moves import (
+    COLORS,
+    MAX_RESERVED,
+    PICK_SAME_MIN,
+)
+from player import Action
+
+HAND_LIMIT = 10
+# normalized searches kept by the memo
+PLAN_CACHE_SIZE = 1 << 16
+
+# a turn of a plan: the action and the gem indexes it takes for the card, a
+# PICK_THREE may fill up with gems of any other color
+Step = namedtuple('Step', ['action', 'gems'])
+Plan = namedtuple('Plan', ['turns', 'steps'])
+
+_AFFORDABLE = Plan(0, ())
+
+
+def plan(cost, discount, hand, supply, reserves_left=MAX_RESERVED, limit=HAND_LIMIT):
+    '''
+    Returns the Plan affording a card of the cost vector, Plan(0, ()) when
+    the hand already pays it, or None when no sequence of moves does.
+    discount is the card vector of the player, hand its hand vector and
+    supply the gem vector of the board.
+    '''
+    deficit = []
+    needed = 0
+    capped = []
+    for g in COLORS:
+        need = cost[g] - discount[g]
+        if need <= 0:
+            deficit.append(0)
+            capped.append(0)
+            continue
+        needed += need
+        missing = need - hand[g] if need > hand[g] else 0
+        deficit.append(missing)
+        # a pile still lets the plan take two gems after it took all but one it needs
+        capped.append(min(supply[g], missing + PICK_SAME_MIN - 1) if missing else 0)
+    if needed > limit:
+        return None
+
+    gold = hand[GOLD]
+    short = sum(deficit) - gold
+    if short <= 0:
+        return _AFFORDABLE
+    golds = min(reserves_left, supply[GOLD], short)
+    return _search(tuple(deficit), gold, tuple(capped), golds)
+
+
+def plan_card(card, player, board):
+    '''The plan of the player to afford the card on the board, see plan'''
+    return plan(card.cost_vector, player.card_vector, player.hand_vector, board.gem_vector,
+                MAX_RESERVED - player.reserve_count)
+
+
+def turns_to_afford(card, player, board):
+    '''The number of turns of plan_card, None when the card is out of reach'''
+    card_plan = plan_card(card, player, board)
+    return None if card_plan is None else card_plan.turns
+
+
+def clear_memo():
+    '''Forgets the memoized searches'''
+    _search.cache_clear()
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _search(deficit, gold, supply, golds):
+    '''Breadth-first search over (deficit, gold, supply, golds) states, the first affordable one is the closest'''
+    start = (deficit, gold, supply, golds)
+    # state -> (parent state, step), None for the start
+    parents = {start: None}
+    frontier = [start]
+    while frontier:
+        next_frontier = []
+        for state in frontier:
+            for step, child in _moves(*state):
+                if child in parents:
+                    continue
+                parents[child] = (state, step)
+                if sum(child[0]) <= child[1]:
+                    return _plan(parents, child)
+                next_frontier.append(child)
+        frontier = next_frontier
+    return None
+
+
+def _moves(deficit, gold, supply, golds):
+    '''The (step, state) of every move bringing the card closer'''
+    available = [g for g in COLORS if deficit[g] and supply[g]]
+    for colors in itertools.combinations(available, min(3, len(available))):
+        yield Step(Action.PICK_THREE, colors), _take(deficit, gold, supply, golds, colors)
+    for g in available:
+        if supply[g] >= PICK_SAME_MIN:
+            yield Step(Action.PICK_SAME, (g, g)), _take(deficit, gold, supply, golds, (g, g))
+    if golds:
+        yield Step(Action.RESERVE_CARD, (GOLD,)), (deficit, gold + 1, supply, golds - 1)
+
+
+def _take(deficit, gold, supply, golds, gems):
+    deficit = list(deficit)
+    supply = list(supply)
+    for g in gems:
+        supply[g] -= 1
+        if deficit[g]:
+            deficit[g] -= 1
+    # re-cap the piles like plan does, so equal situations share a state
+    for g in COLORS:
+        cap = deficit[g] + PICK_SAME_MIN - 1 if deficit[g] else 0
+        if supply[g] > cap:
+            supply[g] = cap
+    short = sum(deficit) - gold
+    return tuple(deficit), gold, tuple(supply), min(golds, short) if short > 0 else 0
+
+
+def _plan(parents, state):
+    steps = []
+    while parents[state] is not None:
+        state, step = parents[state]
+        steps.append(step)
+    steps.reverse()
+    return Plan(len(steps), tuple(steps))
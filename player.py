@@ -1,19 +1,33 @@
-import functools
-import itertools
-import operator
-import collections
-
+from collections.abc import Mapping
 from enum import Enum
+from affordability import (
+    assess,
+    Affordability,
+)
+from catalog import get_catalog
+from residual import get_residuals
 from model import (
     Gem,
-    Card,
-    Noble,
+    GemVector,
+    GemView,
+    GEM_INDEX,
+    GOLD,
 )
-from util import (
-    greater_than_or_equal_to
+from zobrist import (
+    add_counts,
+    gems_key,
+    sub_counts,
+    HAND,
+    OWNED,
+    RESERVED,
+    PLAYER_NOBLES,
 )
 
 
+# the gold a player gets for reserving a card
+ONE_GOLD = GemVector((0, 0, 0, 0, 0, 1))
+
+
 class Action(Enum):
     PICK_THREE = 0
     PICK_SAME = 1
@@ -24,41 +38,81 @@ class Action(Enum):
 
 
 class ActionParams(object):
-    def __init__(self, player_id, action, gems, card_id):
+    '''
+    An action submitted by a strategy, validated when it is built.
+    Instances are shared by ActionParams.of, treat them as read-only.
+    '''
+    __slots__ = ('player_id', 'action', 'gems', 'card_id', 'gem_vector')
+
+    # interned actions, see ActionParams.of
+    _pool = {}
+
+    def __init__(self, player_id, action, gems, card_id, board=None):
         self.player_id = player_id
         self.action = action
         self.gems = gems
         self.card_id = card_id
-
-        self._func_map = {
-            Action.PICK_THREE: self.validate_pick_three,
-            Action.PICK_SAME: self.validate_pick_same,
-            Action.BUY_CARD: self.validate_reserve_card,
-            Action.BUY_RESERVE_CARD: self.validate_reserve_card,
-            Action.RESERVE_CARD: self.validate_reserve_card,
-            Action.NONE: self.no_action,
-        }
-
-        if not self._func_map[action]():
+        # the picked gems as a GemVector for the player to apply
+        self.gem_vector = GemVector.from_dict(gems) if gems else None
+        self._validate(board)
+
+    @classmethod
+    def of(cls, player_id, action, gems=None, card_id=None, board=None):
+        '''Returns an interned action, common moves are only built and validated once'''
+        key = (player_id, action, tuple(gems.items()) if gems else None, card_id)
+        params = cls._pool.get(key)
+        if params is None:
+            params = cls(player_id, action, dict(gems) if gems else gems, card_id, board)
+            cls._pool[key] = params
+        elif board is not None:
+            params._validate(board)
+        return params
+
+    def _validate(self, board):
+        if not _VALIDATORS[self.action.value](self, board):
             raise ValueError(
-                f"Player {self.player_id} submits invalid argument for action: {action}!! \n" + 
+                f"Player {self.player_id} submits invalid argument for action: {self.action}!! \n" + 
                 f"Gem counts: {self.gems}, card to purchase: {self.card_id}"
             )
 
-    def validate_pick_three(self):
-        return len(self.gems) >= 1 and len(self.gems) <= 3 and Gem.GOLD not in self.gems
+    def validate_pick_three(self, board=None):
+        return self.gems is not None and len(self.gems) >= 1 and len(self.gems) <= 3 and Gem.GOLD not in self.gems
 
-    def validate_pick_same(self):
-        return len(self.gems) == 1 and Gem.GOLD not in self.gems
+    def validate_pick_same(self, board=None):
+        return self.gems is not None and len(self.gems) == 1 and Gem.GOLD not in self.gems
 
-    def validate_reserve_card(self):
-        return self.card_id >= 0 and self.card_id <= 89
+    def validate_reserve_card(self, board=None):
+        '''The card must be showing on the board, or at least exist without a board'''
+        if board is None:
+            return self.card_id in get_catalog().cards_map
+        return board.is_visible(self.card_id)
 
-    def no_action(self):
-        pass
+    def validate_buy_reserve_card(self, board=None):
+        if board is None:
+            return self.card_id in get_catalog().cards_map
+        return board.get_card(self.card_id) is not None
+
+    def no_action(self, board=None):
+        return True
+
+# validators indexed by Action.value
+_VALIDATORS = (
+    ActionParams.validate_pick_three,
+    ActionParams.validate_pick_same,
+    ActionParams.validate_reserve_card,
+    ActionParams.validate_reserve_card,
+    ActionParams.validate_buy_reserve_card,
+    ActionParams.no_action,
+)
 
 class Player(object):
+    __slots__ = (
+        'rep', 'id', 'reserve_count', 'cards', 'nobles', 'known_noble_ids',
+        'rev_cards', 'gold', 'card_vector', 'hand_vector', '_effective_gems', '_residuals', 'strategy', 'zobrist', 'listeners',
+    )
+
     def __init__(self, id):
+        self.strategy = None
         self.rep = 0
         self.id = id
         self.reserve_count = 0
@@ -77,30 +131,37 @@ class Player(object):
         self.gold = 0
 
         # the gems player has via the develop card
-        self.gems_from_card = {
-            gem: 0 for gem in Gem.__members__.values()
-        }
+        self.card_vector = GemVector()
 
         # the gems player has in hand
-        self.gems_from_hand = {
-            gem: 0 for gem in Gem.__members__.values()
-        }
-
-        # the function map for simplicity:
-        self._func_map = {
-            Action.PICK_THREE: self.pick_different_gems,
-            Action.PICK_SAME: self.pick_same_gems,
-            Action.BUY_CARD: self.buy_board_card,
-            Action.BUY_RESERVE_CARD: self.buy_reserve_card,
-            Action.RESERVE_CARD: self.reserve_card,
-            Action.NONE: self.no_action,
-        }
+        self.hand_vector = GemVector()
+
+        # cached card_vector + hand_vector, reset whenever either changes
+        self._effective_gems = None
+
+        # cached residual costs for card_vector, reset when it changes, see residual.py
+        self._residuals = None
+
+        # the hash of the hand, cards, reserved cards and nobles, see zobrist.py
+        self.zobrist = 0
+
+        # the listeners of the board, see events.subscribe
+        self.listeners = None
 
     def attract_noble(self, noble):
         assert (noble.id not in self.known_noble_ids)
         self.nobles.add(noble)
         self.known_noble_ids.add(noble.id)
         self.rep += noble.reputation
+        self.zobrist ^= PLAYER_NOBLES[self.id][noble.id]
+
+
+    def release_noble(self, noble):
+        '''Reverses attract_noble'''
+        self.nobles.remove(noble)
+        self.known_noble_ids.remove(noble.id)
+        self.rep -= noble.reputation
+        self.zobrist ^= PLAYER_NOBLES[self.id][noble.id]
 
 
     def can_win(self, points_to_win):
@@ -108,21 +169,56 @@ class Player(object):
 
 
     def can_afford(self, card):
-        c_dict = collections.defaultdict(int)
-        for k, v in itertools.chain(self.gems_from_card.items(), self.gems_from_hand.items()):
-            c_dict[k] += v
-        total_available_gems = dict(c_dict)
-
-        gold_count = self.gems_from_hand.get(Gem.GOLD, 0)
-        for gem_t, cnt in card.cost.items():
-            availb = total_available_gems[gem_t]
-            if cnt > availb:
-                if cnt > availb + gold_count:
-                    return False
-                else:
-                    gold_count = gold_count - (cnt - availb)
-                    assert (gold_count >= 0)
-        return True
+        residual = self.residuals()[card.cost_vector]
+        if residual is None:
+            # not a catalog cost
+            return self.effective_gems().deficit_after_gold(card.cost_vector) == 0
+        return residual.missing(self.hand_vector) == 0
+
+
+    def assess(self, costs):
+        '''
+        affordability.assess of the effective gems over a cost table, from the
+        residual costs of the card vector and the hand. The costs outside of
+        the catalog are assessed from the effective gems.
+        '''
+        rows = self.residuals()
+        hand = self.hand_vector
+        affordable = []
+        deficits = []
+        distances = []
+        for cost in costs:
+            residual = rows[cost]
+            if residual is None:
+                single = assess(self.effective_gems(), (cost,))
+                can_afford, deficit, distance = single.affordable[0], single.deficits[0], single.distances[0]
+            else:
+                can_afford, deficit, distance = residual.assess(hand)
+            affordable.append(can_afford)
+            deficits.append(deficit)
+            distances.append(distance)
+        return Affordability(affordable, deficits, distances)
+
+
+    def affordable(self, costs):
+        '''The affordable column of assess alone'''
+        rows = self.residuals()
+        hand = self.hand_vector
+        affordable = []
+        for cost in costs:
+            residual = rows[cost]
+            if residual is None:
+                affordable.append(self.effective_gems().deficit_after_gold(cost) == 0)
+            else:
+                affordable.append(residual.missing(hand) == 0)
+        return affordable
+
+
+    def residuals(self):
+        '''Cost vector -> the Residual of the catalog cards of that cost, None outside of the catalog, see ResidualTable.rows'''
+        if self._residuals is None:
+            self._residuals = get_residuals().rows(self.card_vector)
+        return self._residuals
 
 
     ## getters:
@@ -130,7 +226,15 @@ class Player(object):
         return self.id
 
     def get_gems(self):
-        return self.gems_from_hand
+        return GemView(self.hand_vector)
+
+    @property
+    def gems_from_hand(self):
+        return GemView(self.hand_vector)
+
+    @property
+    def gems_from_card(self):
+        return GemView(self.card_vector)
 
     def get_cards(self):
         return self.cards
@@ -140,32 +244,69 @@ class Player(object):
 
     ## setters:
     def set_gems(self, gems):
-        self.gems_from_hand = gems
+        self._set_hand(GemVector.from_dict(gems))
+
+    def _set_hand(self, gems):
+        keys = HAND[self.id]
+        self.zobrist ^= gems_key(keys, self.hand_vector) ^ gems_key(keys, gems)
+        self.hand_vector[:] = gems
+        self._effective_gems = None
 
     def set_strategy(self, strategy):
         self.strategy = strategy
 
     def _add_gems(self, gems):
-        for gem_t, cnt in gems.items():
-            self.gems_from_hand[gem_t] += cnt
+        self.zobrist ^= add_counts(HAND[self.id], self.hand_vector, gems)
+        self._effective_gems = None
+
+    def _sub_gems(self, gems):
+        self.zobrist ^= sub_counts(HAND[self.id], self.hand_vector, gems)
+        self._effective_gems = None
+
+    def _reserve(self, card):
+        self.rev_cards.add(card)
+        self.zobrist ^= RESERVED[self.id][card.id]
+
+    def _unreserve(self, card):
+        self.rev_cards.remove(card)
+        self.zobrist ^= RESERVED[self.id][card.id]
+
+    def add_card(self, card):
+        '''Adds a development card to the pocket and counts its gem'''
+        assert (card not in self.cards)
+        self.cards.add(card)
+        self.card_vector[GEM_INDEX[card.gem]] += 1
+        self._effective_gems = None
+        self._residuals = None
+        self.zobrist ^= OWNED[self.id][card.id]
+
+
+    def remove_card(self, card):
+        '''Reverses add_card'''
+        self.cards.remove(card)
+        self.card_vector[GEM_INDEX[card.gem]] -= 1
+        self._effective_gems = None
+        self._residuals = None
+        self.zobrist ^= OWNED[self.id][card.id]
 
 
     def card_summary(self):
-        summary = {gem : 0 for gem in Gem}
-        for c in self.cards:
-            if c.gem not in summary:
-                summary[c.gem] = 0
-            summary[c.gem] += 1
-        return summary
+        '''Returns a read-only view of the gems from the development cards'''
+        return GemView(self.card_vector)
 
 
     def card_summary_plus_current_gems(self):
-        summary = self.card_summary()
-        
-        for g, c in self.gems_from_hand.items():
-            if g in summary:
-                summary[g] += c
-        return summary
+        return GemView(self.effective_gems())
+
+
+    def effective_gems(self):
+        '''
+        Returns the gems from cards plus the gems in hand, gold included.
+        The vector is cached until the hand or the cards change, do not modify it.
+        '''
+        if self._effective_gems is None:
+            self._effective_gems = self.card_vector.plus(self.hand_vector)
+        return self._effective_gems
 
 
     # ---------------------------------------------------------
@@ -178,19 +319,19 @@ class Player(object):
     def pick_gems(self, gems, board):
         assert (gems is not None)
 
-        all_gems = board.get_gems()
-        if ( greater_than_or_equal_to(all_gems, gems) ):
+        gem_vector = gems if isinstance(gems, GemVector) else GemVector.from_dict(gems)
+        if board.gem_vector.covers(gem_vector):
             # take the gems from the board
-            board.take_gems(gems)
+            board.take_gem_vector(gem_vector)
 
             # add to player's pocket
-            self._add_gems(gems)
+            self._add_gems(gem_vector)
 
         else:
             raise ValueError(
                 'Invalid gems counts! You want to get: {want}, but the Board only has: {existing}'.format(
-                    want='\n'.join([f"{k}:{v}" for k, v in gems.items()]),
-                    existing='\n'.join([f"{k}:{v}" for k, v in all_gems.items()])
+                    want='\n'.join([f"{k}:{v}" for k, v in gem_vector.to_dict().items()]),
+                    existing='\n'.join([f"{k}:{v}" for k, v in board.get_gems().items()])
                 )
             )
 
@@ -211,27 +352,21 @@ class Player(object):
                 f"Trying to buy a card with required gems {card.cost}, gems at hand: {self.gems_from_hand}; gems from card: {self.gems_from_card}"
             )
 
-        all_cards = board.get_cards()
-        all_cards_set = set(functools.reduce(operator.iconcat, all_cards, []))
-        assert (card in all_cards_set), (
+        assert (board.is_visible(card.id)), (
             f"Try to buy a card {card.id} that is not on the current board! "
         )
 
         # add up the reputation if any:
         self.rep += card.reputation
 
-        # add the card to your pocket
-        assert (card not in self.cards)
-        self.cards.add(card)
-
-        # update your card pocket map:
-        self.gems_from_card[card.gem] += 1
+        # add the card to your pocket and update your card pocket map:
+        self.add_card(card)
 
         # substract your gem:
-        diff_gems = self.update_gems(card.cost)
+        diff_gems = self.update_gems(card.cost_vector)
 
         board.take_card(card.id)
-        board.payback_gems(diff_gems)
+        board.payback_gem_vector(diff_gems)
     
     def buy_reserve_card(self, gems, card, board):
         assert (card is not None)
@@ -245,21 +380,17 @@ class Player(object):
             f"Try to buy a reserved card {card.id} that is not being reverved!"
         )
 
-        # add the card to your pocket
-        assert (card not in self.cards)
-        self.cards.add(card)
-
-        # update your card pocket map:
-        self.gems_from_card[card.gem] += 1
+        # add the card to your pocket and update your card pocket map:
+        self.add_card(card)
 
         # substract your gem:
-        diff_gems = self.update_gems(card.cost)
+        diff_gems = self.update_gems(card.cost_vector)
 
         # put the gems back to board
-        board.payback_gems(diff_gems)
+        board.payback_gem_vector(diff_gems)
 
         # remove the reversed card:
-        self.rev_cards.remove(card)
+        self._unreserve(card)
         self.reserve_count -= 1
 
     
@@ -267,10 +398,7 @@ class Player(object):
         if self.reserve_count >= 3:
             raise ValueError("You cannot reserve the card because you have only reserved for three times!")
 
-        all_cards = board.get_cards()
-        all_cards_set = set(functools.reduce(operator.iconcat, all_cards, []))
-
-        assert (card in all_cards_set), (
+        assert (board.is_visible(card.id)), (
             f"Try to reserve a card {card.id} that is not in the board!"
         )
 
@@ -278,10 +406,12 @@ class Player(object):
             f"Try to reverse card: {card.id}, but you already have it!"
         )
 
-        self.rev_cards.add(card)
-        self.gems_from_hand[Gem.GOLD] += 1
+        # take the gold first, so a board without gold leaves the player untouched
+        board.take_gem_vector(ONE_GOLD)
+
+        self._reserve(card)
+        self._add_gems(ONE_GOLD)
 
-        board.take_gems({Gem.GOLD: 1})
         board.take_card(card.id)
         self.reserve_count += 1
 
@@ -291,48 +421,29 @@ class Player(object):
 
     
     # substract your gem, expect to update your current gems
+    # returns the GemVector of gems paid back to the board
     def update_gems(self, gem_cost):
-        def _raise_not_enough_error():
+        if isinstance(gem_cost, Mapping):
+            gem_cost = GemVector.from_dict(gem_cost)
+
+        hand = self.hand_vector
+        # if the card gems cover a color, you do not need to pay any thing!
+        gems_to_pay = self.card_vector.shortfall(gem_cost)
+        gold_to_pay = hand.shortfall(gems_to_pay).total()
+        if gold_to_pay > hand[GOLD]:
             raise ValueError(
                 'Not enough gem balance even you are using gold\n' +
-                'You need: {}\n'.format('\n'.join(f'{k}:{v}' for k, v in gem_cost.items())) +
+                'You need: {}\n'.format('\n'.join(f'{k}:{v}' for k, v in GemVector(gem_cost).to_dict().items())) +
                 'But you have: {}\n'.format('\n'.join(f'{k}:{v}' for k, v in self.gems_from_hand.items())) +
                 'And your card value: {}\n'.format('\n'.join(f'{k}:{v}' for k, v in self.gems_from_card.items()))
             )
 
-        gems_to_pay = {}
-        for g, v in gem_cost.items():
-            gem_in_hand = self.gems_from_hand.get(g, 0)
-            gem_from_card = self.gems_from_card.get(g, 0)
-
-            if (gem_in_hand + gem_from_card < v):
-                gold_count = self.gems_from_hand.get(Gem.GOLD, 0)
-                if (gem_in_hand + gem_from_card + gold_count >= v):
-                    # substract the permanent gem:
-                    remain = v - gem_from_card
-                    if (remain > gem_in_hand):
-                        # you will have to use gold here
-                        self.gems_from_hand[g] = 0
-                        self.gems_from_hand[Gem.GOLD] -= remain - gem_in_hand
-                        assert (self.gems_from_hand[Gem.GOLD] >= 0)
-                        gems_to_pay[Gem.GOLD] = remain - gem_in_hand
-                        gems_to_pay[g] = gem_in_hand
-                    else:
-                        _raise_not_enough_error()
-                        #self.gems_from_hand[g] -= gem_in_hand - remain
-                        #gems_to_pay[g] = remain
-                else:
-                    _raise_not_enough_error()
-            else:
-                # pay without gold
-                remain = v - gem_from_card
-                # if remain <= 0, then you do not need to pay any thing!
-                if (remain > 0):
-                    # you still need to pay your gem
-                    self.gems_from_hand[g] -= remain
-                    assert(self.gems_from_hand[g] >= 0)
-                    gems_to_pay[g] = remain 
-
+        for i, remain in enumerate(gems_to_pay):
+            if remain > hand[i]:
+                # you will have to use gold here
+                gems_to_pay[i] = hand[i]
+        gems_to_pay[GOLD] = gold_to_pay
+        self._sub_gems(gems_to_pay)
         return gems_to_pay
 
 
@@ -343,16 +454,26 @@ class Player(object):
         # 2. params:
         #   - # gems you want to pick
         #   - Or: the card you want to buy or reserve
-
-        action_params = self.strategy.next_step()
-        action, gems, card_id = action_params.action, action_params.gems, action_params.card_id 
-        card = board.get_card(card_id)
-        self._func_map[action](gems, card, board)
-        #pass
+        self.apply_action(self.strategy.next_step(), board)
 
 
     # this is use to take an action from outside (for test)
     def take_external_action(self, action_params, board):
-        action, gems, card_id = action_params.action, action_params.gems, action_params.card_id 
-        card = board.get_card(card_id)
-        self._func_map[action](gems, card, board)
\ No newline at end of file
+        self.apply_action(action_params, board)
+
+
+    def apply_action(self, action_params, board):
+        card = board.get_card(action_params.card_id)
+        gems = action_params.gem_vector
+        _HANDLERS[action_params.action.value](self, gems, card, board)
+
+
+# action handlers indexed by Action.value
+_HANDLERS = (
+    Player.pick_different_gems,
+    Player.pick_same_gems,
+    Player.buy_board_card,
+    Player.reserve_card,
+    Player.buy_reserve_card,
+    Player.no_action,
+)
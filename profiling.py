@@ -0,0 +1,220 @@
+import collections
+import cProfile
+import os
+import pstats
+import signal
+import tempfile
+
+# the profile everything outside of the strategies lands in
+ENGINE = 'engine'
+
+CPROFILE = 'cprofile'   # deterministic, writes pstats and collapsed stacks
+SAMPLE = 'sample'       # statistical, writes collapsed stacks
+MODES = (CPROFILE, SAMPLE)
+
+SAMPLE_INTERVAL = 0.001
+
+# collapsed stacks derived from pstats stop below this many microseconds
+MIN_COLLAPSED_US = 1
+MAX_COLLAPSED_DEPTH = 64
+
+
+class Profiler(object):
+    '''
+    Profiles games split per strategy class: the time spent in a strategy's
+    next_step goes to the profile of its class, everything else to ENGINE.
+    '''
+    def __init__(self, mode, out_dir, interval=SAMPLE_INTERVAL):
+        assert mode in MODES
+        self.mode = mode
+        self.out_dir = out_dir
+        self.interval = interval
+        # name -> cProfile.Profile
+        self.profiles = {}
+        # name -> {collapsed stack: samples}
+        self.samples = {}
+        # the signal handler the sampler replaced while it runs
+        self._previous_handler = None
+
+    def play(self, game):
+        '''Plays the game under the profiler and returns its winners'''
+        if self.mode == SAMPLE:
+            return self._play_sampled(game)
+
+        for player in game.board.players:
+            self._wrap_strategy(player.strategy)
+        engine = self._profile(ENGINE)
+        engine.enable()
+        try:
+            return game.play()
+        finally:
+            engine.disable()
+
+    def _profile(self, name):
+        profile = self.profiles.get(name)
+        if profile is None:
+            profile = self.profiles[name] = cProfile.Profile()
+        return profile
+
+    def _wrap_strategy(self, strategy):
+        '''Switches from the engine profile to the strategy one around next_step'''
+        engine = self._profile(ENGINE)
+        profile = self._profile(type(strategy).__name__)
+        next_step = strategy.next_step
+
+        def profiled_next_step():
+            engine.disable()
+            profile.enable()
+            try:
+                return next_step()
+            finally:
+                profile.disable()
+                engine.enable()
+
+        strategy.next_step = profiled_next_step
+
+    def _play_sampled(self, game):
+        # the timer keeps running across games, the system timer granularity
+        # can be coarser than a whole game
+        if self._previous_handler is None:
+            self._previous_handler = signal.signal(signal.SIGPROF, self._sample)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        return game.play()
+
+    def _stop_sampling(self):
+        if self._previous_handler is not None:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, self._previous_handler)
+            self._previous_handler = None
+
+    def _sample(self, signum, frame):
+        name = ENGINE
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            if code is _PLAY_SAMPLED_CODE:
+                # the frames above the game belong to the runner
+                break
+            stack.append(_frame_name(code.co_filename, code.co_firstlineno, code.co_name))
+            if name == ENGINE and code.co_name == 'next_step':
+                strategy = frame.f_locals.get('self')
+                if strategy is not None:
+                    name = type(strategy).__name__
+            frame = frame.f_back
+        if frame is None:
+            # sampled in between two games
+            return
+        key = ';'.join(reversed(stack))
+        samples = self.samples.setdefault(name, {})
+        samples[key] = samples.get(key, 0) + 1
+
+    def report(self):
+        '''Returns the picklable ProfileReport of everything played so far'''
+        report = ProfileReport(self.mode)
+        if self.mode == SAMPLE:
+            self._stop_sampling()
+            report.samples = self.samples
+            return report
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        for name, profile in self.profiles.items():
+            # a worker plays several shards, each needs its own dump
+            fd, path = tempfile.mkstemp(prefix=f"{name}.", suffix='.part.pstats', dir=self.out_dir)
+            os.close(fd)
+            profile.dump_stats(path)
+            report.stats_files.setdefault(name, []).append(path)
+        return report
+
+
+_PLAY_SAMPLED_CODE = Profiler._play_sampled.__code__
+
+
+class ProfileReport(object):
+    '''Profile results of one or more workers'''
+    def __init__(self, mode):
+        self.mode = mode
+        # name -> pstats files dumped by the workers
+        self.stats_files = {}
+        # name -> {collapsed stack: samples}
+        self.samples = {}
+
+    def merge(self, other):
+        for name, paths in other.stats_files.items():
+            self.stats_files.setdefault(name, []).extend(paths)
+        for name, samples in other.samples.items():
+            mine = self.samples.setdefault(name, {})
+            for stack, cnt in samples.items():
+                mine[stack] = mine.get(stack, 0) + cnt
+        return self
+
+    def write(self, out_dir):
+        '''
+        Writes <name>.pstats (cprofile mode) and <name>.collapsed for each profile,
+        the collapsed files can be fed to flamegraph.pl or speedscope.
+        Returns the written paths.
+        '''
+        os.makedirs(out_dir, exist_ok=True)
+        written = []
+        for name, paths in sorted(self.stats_files.items()):
+            stats = pstats.Stats(*paths)
+            path = os.path.join(out_dir, f"{name}.pstats")
+            stats.dump_stats(path)
+            written.append(path)
+            for part in paths:
+                os.remove(part)
+            written.append(_write_collapsed(os.path.join(out_dir, f"{name}.collapsed"), collapse_pstats(stats)))
+        for name, samples in sorted(self.samples.items()):
+            written.append(_write_collapsed(os.path.join(out_dir, f"{name}.collapsed"), samples))
+        return written
+
+
+def collapse_pstats(stats):
+    '''
+    Approximates collapsed stacks from the pstats call graph: the time of a
+    function is split among its callers in proportion to their call edges.
+    '''
+    entries = stats.stats
+    children = collections.defaultdict(list)
+    roots = []
+    for func, (_, _, _, _, callers) in entries.items():
+        if not callers:
+            roots.append(func)
+        for caller, edge in callers.items():
+            # edge: (primitive calls, calls, own time, cumulative time)
+            children[caller].append((func, edge[3]))
+
+    collapsed = {}
+
+    def walk(func, path, share, depth):
+        _, _, own, cumulative, _ = entries[func]
+        path = path + (_frame_name(*func),)
+        self_us = int(own * share * 1e6)
+        if self_us >= MIN_COLLAPSED_US:
+            key = ';'.join(path)
+            collapsed[key] = collapsed.get(key, 0) + self_us
+        if depth >= MAX_COLLAPSED_DEPTH:
+            return
+        for child, edge_cumulative in children[func]:
+            child_cumulative = entries[child][3]
+            child_share = share * edge_cumulative / child_cumulative if child_cumulative > 0 else 0
+            if child_share * child_cumulative * 1e6 < MIN_COLLAPSED_US or _frame_name(*child) in path:
+                continue
+            walk(child, path, child_share, depth + 1)
+
+    for root in roots:
+        walk(root, (), 1.0, 0)
+    return collapsed
+
+
+def _frame_name(filename, lineno, name):
+    if filename == '~':
+        # built-in functions
+        return name
+    return f"{name} ({os.path.basename(filename)}:{lineno})"
+
+
+def _write_collapsed(path, collapsed):
+    with open(path, 'w') as fo:
+        for stack, cnt in sorted(collapsed.items()):
+            fo.write(f"{stack} {cnt}\n")
+    return path
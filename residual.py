@@ -0,0 +1,162 @@
+'''
+Residual costs of the catalog cards by discount.
+
+The discount of a player (Player.card_vector) only reduces a cost up to the
+cost itself, so a card has one residual cost per discount capped at its cost:
+a few thousand entries for the whole catalog. ResidualTable holds them per
+card, keyed by the capped discount, and the rows of a discount map every
+catalog cost to its residual, memoized across players and games for the
+ROWS_CACHE_SIZE discounts used last. A player keeps the rows of its
+discount until it gains or loses a card, so
+Player.can_afford, Player.affordable and Player.assess (the deficits and
+distances of affordability.assess) are a lookup and a subtraction of the hand.
+
+The tables are built from the process-wide catalog on first use, in about
+ten milliseconds.
+'''
+
+import itertools
+from collections import (
+    namedtuple,
+    OrderedDict,
+)
+
+from catalog import get_catalog
+from model import GOLD
+
+# discounts whose rows a table keeps, the least recently used go first
+ROWS_CACHE_SIZE = 256
+
+_NO_DEFICIT = (0, 0, 0, 0, 0, 0)
+
+
+class Residual(namedtuple('Residual', ['vector', 'total', 'gems'])):
+    '''
+    The cost left once the discount is applied: the vector, its total and
+    the (gem index, count) of its non-zero slots. There is no gold in it.
+    '''
+    __slots__ = ()
+
+    def missing(self, hand):
+        '''Returns how many gems the hand still misses once the gold is spent'''
+        missing = -hand[GOLD]
+        if self.total <= -missing:
+            return 0
+        for g, c in self.gems:
+            mine = hand[g]
+            if c > mine:
+                missing += c - mine
+        return missing if missing > 0 else 0
+
+    def assess(self, hand):
+        '''Returns (affordable, deficit, distance) of the hand, like affordability.assess of the effective gems'''
+        gold = hand[GOLD]
+        deficit = [0] * len(self.vector)
+        missing = -gold
+        for g, c in self.gems:
+            mine = hand[g]
+            if c > mine:
+                deficit[g] = c - mine
+                missing += c - mine
+        if missing <= 0:
+            return True, _NO_DEFICIT, 0
+
+        # spend the gold on the first gems we miss
+        left = gold
+        g = 0
+        while left:
+            c = deficit[g]
+            if c:
+                used = c if c < left else left
+                deficit[g] = c - used
+                left -= used
+            g += 1
+        return False, tuple(deficit), missing
+
+
+def _residual(cost, discount):
+    vector = tuple(c - d if c > d else 0 for c, d in zip(cost, discount))
+    return Residual(vector, sum(vector), tuple((g, c) for g, c in enumerate(vector) if c))
+
+
+def _discounts(cost):
+    '''Every discount capped at the cost'''
+    return [discount + (0,) for discount in itertools.product(*(range(c + 1) for c in cost[:GOLD]))]
+
+
+class ResidualTable(object):
+    def __init__(self, catalog):
+        self.costs = tuple(card.cost_vector for card in catalog.cards)
+        # [card id] -> {discount capped at the cost: Residual}
+        self.tables = [{discount: _residual(cost, discount) for discount in _discounts(cost)} for cost in self.costs]
+        # no discount past the most any card costs of a gem matters
+        self.cap = max(max(cost[:GOLD]) for cost in self.costs)
+        # cost vector -> the id of a catalog card of that cost
+        self.cost_ids = {cost: card_id for card_id, cost in enumerate(self.costs)}
+        # capped discount -> _Rows, in the order they were last used
+        self.rows_cache = OrderedDict()
+
+    def __deepcopy__(self, memo):
+        # derived from the catalog, shared like it
+        return self
+
+    def residual(self, card_id, discount):
+        '''The Residual of a catalog card for the discount'''
+        # the cost has no gold, so neither has the capped discount
+        return self.tables[card_id][tuple(map(min, discount, self.costs[card_id]))]
+
+    def rows(self, discount):
+        '''
+        Cost vector -> the Residual of the catalog cards of that cost for the
+        discount, None for a cost outside of the catalog. The rows are filled
+        as they are looked up.
+        '''
+        cap = self.cap
+        key = tuple(d if d < cap else cap for d in discount)
+        rows_cache = self.rows_cache
+        rows = rows_cache.get(key)
+        if rows is None:
+            if len(rows_cache) >= ROWS_CACHE_SIZE:
+                rows_cache.popitem(last=False)
+            rows = rows_cache[key] = _Rows(self, key)
+        else:
+            rows_cache.move_to_end(key)
+        return rows
+
+
+class _Rows(dict):
+    '''Cost vector -> Residual for one discount, see ResidualTable.rows'''
+    __slots__ = ('table', 'discount')
+
+    def __init__(self, table, discount):
+        self.table = table
+        self.discount = discount
+
+    def __missing__(self, cost):
+        table = self.table
+        card_id = table.cost_ids.get(cost)
+        if card_id is None:
+            residual = None
+        else:
+            residual = table.tables[card_id][tuple(map(min, self.discount, cost))]
+        self[cost] = residual
+        return residual
+
+    def __reduce__(self):
+        # a copied or pickled player gets the rows of the process-wide table
+        return (_process_rows, (self.discount,))
+
+
+def _process_rows(discount):
+    return get_residuals().rows(discount)
+
+
+_residuals = None
+
+def get_residuals():
+    '''Returns the tables of the process-wide catalog'''
+    global _residuals
+    if _residuals is None:
+        _residuals = ResidualTable(get_catalog())
+    return _residuals
+
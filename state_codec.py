@@ -0,0 +1,294 @@
+'''
+Versioned fixed-layout binary encoding of a game state (board.BoardState).
+
+Cards and nobles are written as their catalog ids, so a state is about 200
+bytes and decodes against the catalog of the reading process. Every field
+sits at an offset known from the version, the catalog and the number of
+players; StateView reads them in place without copying the buffer.
+
+Layout of version 1, one unsigned byte per value unless noted:
+  header   magic b'SPLD', version, players_cnt, points_to_win,
+           cards in the catalog (uint16 little-endian), nobles in the catalog
+  board    gems[6], cards_index[3], visible cards[3][4], the decks in the
+           catalog level sizes, noble_deck, noble_index, nobles[MAX_PLAYERS + 1]
+  players  players_cnt times: rep, hand[6], reserve_count, reserved[3],
+           owned cards as a bit set, nobles as a bit set
+Rows shrunk by an empty deck and missing nobles or reserves are padded with EMPTY.
+
+A StateLog records the state of a game after every round; read_log reads the
+records back as views of one buffer, the last one being a checkpoint to resume
+the game from (see game.Game.from_checkpoint).
+'''
+
+import struct
+
+from board import (
+    BoardState,
+    PlayerState,
+)
+from catalog import (
+    get_catalog,
+    LEVELS,
+)
+from model import N_GEMS
+from moves import MAX_RESERVED
+from zobrist import (
+    MAX_PLAYERS,
+    SLOTS,
+)
+
+MAGIC = b'SPLD'
+VERSION = 1
+EMPTY = 0xFF
+
+HEADER = struct.Struct('<4sBBBHB')
+# a record of a state log: size of the encoded state, player turns played, idle turns in a row
+RECORD = struct.Struct('<HIB')
+
+
+class _Layout(object):
+    '''Offsets of the version 1 fields for the catalog of the process'''
+    def __init__(self, catalog):
+        self.n_cards = len(catalog.cards)
+        self.n_nobles = len(catalog.nobles)
+        assert self.n_cards < EMPTY and self.n_nobles < EMPTY
+        self.deck_lens = tuple(len(ids) for ids in catalog.level_ids)
+        self.card_bytes = (self.n_cards + 7) // 8
+        self.noble_bytes = (self.n_nobles + 7) // 8
+
+        offset = HEADER.size
+        self.gems = offset
+        self.cards_index = self.gems + N_GEMS
+        self.visible = self.cards_index + LEVELS
+        self.decks = []
+        offset = self.visible + LEVELS * SLOTS
+        for deck_len in self.deck_lens:
+            self.decks.append(offset)
+            offset += deck_len
+        self.noble_deck = offset
+        self.noble_index = self.noble_deck + self.n_nobles
+        self.nobles = self.noble_index + 1
+        self.players = self.nobles + MAX_PLAYERS + 1
+
+        # offsets inside a player record
+        self.rep = 0
+        self.hand = 1
+        self.reserve_count = self.hand + N_GEMS
+        self.reserved = self.reserve_count + 1
+        self.owned = self.reserved + MAX_RESERVED
+        self.player_nobles = self.owned + self.card_bytes
+        self.player_size = self.player_nobles + self.noble_bytes
+
+    def size(self, players_cnt):
+        return self.players + players_cnt * self.player_size
+
+
+_layout = None
+
+def get_layout():
+    global _layout
+    if _layout is None:
+        _layout = _Layout(get_catalog())
+    return _layout
+
+
+# [i][byte] -> the ids of the set bits of byte i of a bit set
+_BIT_IDS = []
+
+
+def _ids_of_bit_set(data):
+    while len(_BIT_IDS) < len(data):
+        base = len(_BIT_IDS) * 8
+        _BIT_IDS.append(tuple(tuple(base + bit for bit in range(8) if byte >> bit & 1) for byte in range(256)))
+    ids = ()
+    for i, byte in enumerate(data):
+        if byte:
+            ids += _BIT_IDS[i][byte]
+    return ids
+
+
+# n -> n bytes of padding
+_PADS = tuple((EMPTY,) * n for n in range(MAX_PLAYERS + 2))
+
+
+def encode(state):
+    '''Returns the bytes of a BoardState'''
+    layout = get_layout()
+    values = list(state.gems)
+    values += state.cards_index
+    for row in state.cards:
+        values += row
+        values += _PADS[SLOTS - len(row)]
+    for deck, deck_len in zip(state.decks, layout.deck_lens):
+        if len(deck) != deck_len:
+            raise ValueError('the decks do not match the catalog')
+        values += deck
+    values += state.noble_deck
+    values.append(state.noble_index)
+    values += state.nobles
+    values += _PADS[MAX_PLAYERS + 1 - len(state.nobles)]
+    card_bytes = layout.card_bytes
+    noble_bytes = layout.noble_bytes
+    for player in state.players:
+        values.append(player.rep)
+        values += player.hand
+        values.append(player.reserve_count)
+        values += player.rev_cards
+        values += _PADS[MAX_RESERVED - len(player.rev_cards)]
+        bits = 0
+        for id in player.cards:
+            bits |= 1 << id
+        values += bits.to_bytes(card_bytes, 'little')
+        bits = 0
+        for id in player.nobles:
+            bits |= 1 << id
+        values += bits.to_bytes(noble_bytes, 'little')
+    header = HEADER.pack(MAGIC, VERSION, state.players_cnt, state.points_to_win, layout.n_cards, layout.n_nobles)
+    return header + bytes(values)
+
+
+def decode(data):
+    '''Returns the BoardState of the bytes'''
+    return StateView(data).state()
+
+
+class StateView(object):
+    '''
+    Read-only view of an encoded state. The accessors return memoryview
+    slices of the buffer, nothing is copied until state() is called.
+    '''
+    __slots__ = ('data', 'players_cnt', 'points_to_win', '_layout')
+
+    def __init__(self, data):
+        data = memoryview(data)
+        if len(data) < HEADER.size:
+            raise ValueError('truncated state')
+        magic, version, players_cnt, points_to_win, n_cards, n_nobles = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError('not an encoded state')
+        if version != VERSION:
+            raise ValueError(f"unsupported state version {version}, expected {VERSION}")
+        layout = get_layout()
+        if (n_cards, n_nobles) != (layout.n_cards, layout.n_nobles):
+            raise ValueError('the state was encoded against another catalog')
+        if len(data) != layout.size(players_cnt):
+            raise ValueError('truncated state')
+        self.data = data
+        self.players_cnt = players_cnt
+        self.points_to_win = points_to_win
+        self._layout = layout
+
+    @property
+    def gems(self):
+        return self.data[self._layout.gems:self._layout.gems + N_GEMS]
+
+    @property
+    def cards_index(self):
+        return self.data[self._layout.cards_index:self._layout.cards_index + LEVELS]
+
+    def visible(self, level):
+        '''The visible card ids of the level, EMPTY padded'''
+        start = self._layout.visible + level * SLOTS
+        return self.data[start:start + SLOTS]
+
+    def deck(self, level):
+        start = self._layout.decks[level]
+        return self.data[start:start + self._layout.deck_lens[level]]
+
+    @property
+    def noble_deck(self):
+        return self.data[self._layout.noble_deck:self._layout.noble_index]
+
+    @property
+    def noble_index(self):
+        return self.data[self._layout.noble_index]
+
+    @property
+    def nobles(self):
+        '''The noble ids on the board, EMPTY padded'''
+        return self.data[self._layout.nobles:self._layout.players]
+
+    def player(self, i):
+        '''The record of player i'''
+        start = self._layout.players + i * self._layout.player_size
+        return self.data[start:start + self._layout.player_size]
+
+    def rep(self, i):
+        return self.player(i)[self._layout.rep]
+
+    def hand(self, i):
+        return self.player(i)[self._layout.hand:self._layout.hand + N_GEMS]
+
+    def state(self):
+        '''Copies the view into a BoardState'''
+        layout = self._layout
+        # one copy of the buffer, slicing bytes is cheaper than slicing the view
+        data = bytes(self.data)
+        players = []
+        start = layout.players
+        for _ in range(self.players_cnt):
+            players.append(PlayerState(
+                data[start + layout.rep],
+                tuple(data[start + layout.hand:start + layout.reserve_count]),
+                _ids_of_bit_set(data[start + layout.owned:start + layout.player_nobles]),
+                _unpadded(data[start + layout.reserved:start + layout.owned]),
+                data[start + layout.reserve_count],
+                _ids_of_bit_set(data[start + layout.player_nobles:start + layout.player_size]),
+            ))
+            start += layout.player_size
+        visible = layout.visible
+        return BoardState(
+            self.players_cnt,
+            self.points_to_win,
+            tuple(data[layout.gems:layout.cards_index]),
+            tuple(tuple(data[start:start + deck_len]) for start, deck_len in zip(layout.decks, layout.deck_lens)),
+            tuple(data[layout.cards_index:visible]),
+            tuple(_unpadded(data[start:start + SLOTS]) for start in range(visible, visible + LEVELS * SLOTS, SLOTS)),
+            tuple(data[layout.noble_deck:layout.noble_index]),
+            data[layout.noble_index],
+            _unpadded(data[layout.nobles:layout.players]),
+            tuple(players),
+        )
+
+
+def _unpadded(data):
+    return tuple(data[:data.index(EMPTY)]) if EMPTY in data else tuple(data)
+
+
+class StateLog(object):
+    '''
+    File of the encoded states of one game, see read_log. An existing file is
+    overwritten, so logging a game again does not run two games together.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.fo = open(path, 'wb')
+
+    def append(self, state, turns, idle_turns=0):
+        data = encode(state)
+        self.fo.write(RECORD.pack(len(data), turns, idle_turns) + data)
+
+    def close(self):
+        self.fo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_log(path):
+    '''Returns the (turns, idle turns, StateView) of the records of a state log'''
+    with open(path, 'rb') as fi:
+        data = memoryview(fi.read())
+    records = []
+    offset = 0
+    while offset < len(data):
+        if offset + RECORD.size > len(data):
+            raise ValueError('truncated state log')
+        size, turns, idle_turns = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        records.append((turns, idle_turns, StateView(data[offset:offset + size])))
+        offset += size
+    return records
@@ -1,14 +1,18 @@
-import functools, operator, math
+import math
 from strategies.strategy import Strategy
-from copy import deepcopy
+from collections import namedtuple
 
+from catalog import get_catalog
 from player import (
     Action,
     ActionParams,
 )
 
 from model import (
-    Gem
+    GEMS,
+    GEM_INDEX,
+    GOLD,
+    N_GEMS,
 )
 
 from util import (
@@ -16,14 +20,26 @@ from util import (
 )
 
 
-class CardValue(object):
-    def __init__(self, card_id, card_rep, can_afford, value, dist, req_gems):
-        self.card_id = card_id
-        self.card_reputation = card_rep
-        self.can_afford = can_afford
-        self.value = value
-        self.dist = dist
-        self.req_gems = req_gems
+# immutable and dict-free, a dozen of them are built every turn
+CardValue = namedtuple('CardValue', ['card_id', 'card_reputation', 'can_afford', 'value', 'dist', 'req_gems'])
+
+_catalog = get_catalog()
+# card id -> gem index of the card
+_gem_indexes = tuple(GEM_INDEX[card.gem] for card in _catalog.cards)
+
+# card id -> the reputation term of the card value
+REP_SCORES = tuple(math.log(1 + card.reputation) for card in _catalog.cards)
+# distance -> the distance term of a card value, a card is never further than its cost
+DIST_SCORES = tuple(math.exp(-1 * dist) for dist in range(max(card.cost_total for card in _catalog.cards) + 1))
+# [card id][card gem term][distance] -> the rounded value of the card: 2 when it is
+# affordable, plus its distance, card gem (see AggressiveStrategy.card_gem_scores) and reputation terms
+CARD_VALUES = tuple(
+    tuple(
+        tuple(round((2 if dist == 0 else 0) + dist_score + gem_score + rep_score, 2) for dist, dist_score in enumerate(DIST_SCORES))
+        for gem_score in (0, 1)
+    )
+    for rep_score in REP_SCORES
+)
 
 '''
 Aggressive Strategy:
@@ -32,32 +48,33 @@ Aggressive Strategy:
 - It will try to purchase the cards from low to high if it can afford
 '''
 class AggressiveStrategy(Strategy):
-    def __init__(self, board, player):
+    def __init__(self, board, player, incremental=False):
         self.steps = 0
         self.player = player
         #self.other_players = other_players
-        super().__init__(board, [player])
+        # the card gem terms of the card summary they were computed for
+        self._gem_scores_summary = None
+        self._gem_scores = None
+        super().__init__(board, [player], incremental)
 
     ## just pick the top three most common gems
     def recommend_gems_to_pick(self, gems_on_board, sorted_card_values):
-        gem_scores = {gem : 0 for gem in Gem}
+        gem_scores = [0] * N_GEMS
 
         for c_v in sorted_card_values:
-            for g, c in c_v.req_gems.items():
-                if g == Gem.GOLD:
-                    import pdb; pdb.set_trace()
-
-                gem_scores[g] += math.log(1 + c_v.value) * c
+            value_score = math.log(1 + c_v.value)
+            for g, c in enumerate(c_v.req_gems):
+                if c:
+                    gem_scores[g] += value_score * c
 
-        sorted_v = sorted(gem_scores.items(), key=lambda kv: kv[1], reverse=True)
+        sorted_v = sorted(range(N_GEMS), key=gem_scores.__getitem__, reverse=True)
         gems_to_pick = {}
         
-        for gem, _ in sorted_v:
-            if gem == Gem.GOLD:
+        for g in sorted_v:
+            if g == GOLD:
                 continue
+            gem = GEMS[g]
             if gems_on_board[gem] > 0:
-                if gem == Gem.GOLD:
-                    import pdb; pdb.set_trace()
                 gems_to_pick[gem] = 1
             if len(gems_to_pick) == 3:
                 break
@@ -65,83 +82,61 @@ class AggressiveStrategy(Strategy):
         return gems_to_pick
 
 
-    def compute_distance(self, eff_gems, cost):
-        gems_to_pay = {}
-        gold_count = eff_gems.get(Gem.GOLD, 0)
-        dist = 0
-        for g, v in cost.items():
-            eff_gem = eff_gems.get(g, 0)
-            if (eff_gem < v):
-                dist += v - eff_gem
-                gems_to_pay[g] = v - eff_gem
-        
-        dist = max(0, dist - gold_count)
-        if gold_count > 0:
-            for g, c in gems_to_pay.items():
-                if c > 0:
-                    while (gold_count > 0) and (gems_to_pay[g] > 0):
-                        gems_to_pay[g] -= 1
-                        gold_count -= 1
-                if gold_count == 0:
-                    break
-
-        cost_to_pay = 0
-        for _, c in gems_to_pay.items():
-            cost_to_pay += c
-        
-        if dist != cost_to_pay:
-            import pdb; pdb.set_trace()
-
-        assert (dist == cost_to_pay)
-        return dist, gems_to_pay
-
-
-    def get_card_value(self, card_gem, card_rep, can_afford, dist, ply_card_summary):
-        aff_score = 2 if can_afford else 0
-        dist_score = math.exp(-1 * dist)
+    def card_gem_scores(self, card_vector):
+        '''
+        Returns the card gem term of a card value for every gem: 1 when one more
+        card of the gem lowers the variance of the player's card vector, else 0.
+        It is kept until the card vector changes, so once per turn at most.
+        '''
+        summary = tuple(card_vector)
+        if summary == self._gem_scores_summary:
+            return self._gem_scores
 
         sum_c = 0
         n_c = 0
-        for g, c in ply_card_summary.items():
+        for c in summary:
             if c > 0:
                 n_c += 1
                 sum_c += c
 
         mean_c = 0 if n_c == 0 else 1.0 * sum_c / n_c
-        var_new = 0
         var_old = 0
-
-        for g, c in ply_card_summary.items():
+        for c in summary:
             if c > 0:
                 var_old += abs(c - mean_c) ** 2
-                if g != card_gem:
-                    var_new += abs(c - mean_c) ** 2
-                else:
-                    var_new += abs((c + 1) - mean_c) ** 2
 
-        card_gem_score = 1 if var_old > var_new else 0
-        card_rep_score = math.log( 1 + card_rep )
-        return aff_score + dist_score + card_gem_score + card_rep_score
+        scores = []
+        for card_g in range(N_GEMS):
+            var_new = 0
+            for g, c in enumerate(summary):
+                if c > 0:
+                    if g != card_g:
+                        var_new += abs(c - mean_c) ** 2
+                    else:
+                        var_new += abs((c + 1) - mean_c) ** 2
+            scores.append(1 if var_old > var_new else 0)
+
+        self._gem_scores_summary = summary
+        self._gem_scores = scores
+        return scores
 
 
     def get_current_cards_summary(self, cards):
         summary = []
-        eff_gems = self.player.card_summary_plus_current_gems()
-        ply_card_summary = self.player.card_summary()
+        gem_scores = self.card_gem_scores(self.player.card_vector)
+        affordability = self.player.assess([card.cost_vector for card in cards])
 
-        for card in cards:
-            dist, diff = self.compute_distance(eff_gems, card.cost)
-            can_afford = self.player.can_afford(card)
-            value = self.get_card_value(card.gem, card.reputation, can_afford, dist, ply_card_summary)
-            summary.append(CardValue(card.id, card.reputation, can_afford, round(value, 2), dist, diff))
+        for card, can_afford, diff, dist in zip(cards, *affordability):
+            id = card.id
+            value = CARD_VALUES[id][gem_scores[_gem_indexes[id]]][dist]
+            summary.append(CardValue(id, card.reputation, can_afford, value, dist, diff))
 
         return summary
 
     def next_step(self):
         # print(f'In step: {self.steps}')
         self.steps = self.steps + 1
-        cards = self.board.get_cards()
-        cards_list = functools.reduce(operator.iconcat, cards, [])
+        cards_list = self.card_table.visible_cards()
 
         gems_on_board = self.board.get_gems()
 
@@ -159,13 +154,13 @@ class AggressiveStrategy(Strategy):
         for sorted_value in sorted_card_vals[:5]:
             if sorted_value.can_afford:
                 # print(f'buy card: {sorted_value.card_id}')
-                return ActionParams(self.player.id, Action.BUY_CARD, None, sorted_value.card_id)
+                return ActionParams.of(self.player.id, Action.BUY_CARD, None, sorted_value.card_id, self.board)
         
         # if we cannot afford them, let's collect gems to get closer
         gems_to_pick = self.recommend_gems_to_pick(gems_on_board, sorted_card_vals[:5])
         if greater_than_or_equal_to(gems_on_board, gems_to_pick) and len(gems_to_pick) > 0:
             # print(f'pick three gems - 1: {gems_to_pick}')
-            return ActionParams(self.player.id, Action.PICK_THREE, gems_to_pick, None)
+            return ActionParams.of(self.player.id, Action.PICK_THREE, gems_to_pick, None, self.board)
         else:
             # print(f'Reserve card: {cards_list[0].id}')
-            return ActionParams(self.player.id, Action.RESERVE_CARD, None, cards_list[0].id)
+            return ActionParams.of(self.player.id, Action.RESERVE_CARD, None, cards_list[0].id, self.board)
@@ -0,0 +1,117 @@
+import math
+import time
+from strategies.mcts_strategy import (
+    MCTSStrategy,
+    DEFAULT_ITERATIONS,
+    EXPLORATION,
+    ROLLOUT_DEPTH,
+)
+
+from determinization import Determinizer
+from moves import legal_moves
+from player import (
+    Action,
+    ActionParams,
+)
+
+
+class _ISNode(object):
+    __slots__ = ('move', 'mover', 'parent', 'children', 'index', 'visits', 'avail', 'reward', 'terminal')
+
+    def __init__(self, move, mover, parent, terminal=False):
+        self.move = move
+        self.mover = mover
+        self.parent = parent
+        self.children = []
+        # move -> child, the moves are interned so equal moves are the same object
+        self.index = {}
+        self.visits = 0
+        # the iterations in which the move was legal at the parent
+        self.avail = 0
+        self.reward = 0.0
+        self.terminal = terminal
+
+
+'''
+ISMCTS Strategy:
+- An MCTS that does not read the hidden deck order (single observer information set MCTS)
+- Every iteration plays on a new determinization: the cards nobody has seen are
+  reshuffled in place, see determinization.Determinizer
+- The iterations share one tree keyed by move, so its statistics average over
+  the samples; a move only competes in the iterations where it is legal, its
+  exploration term counts those instead of the parent visits
+- The real order is put back after the search
+- It searches on its own, no root-parallel workers nor transposition table
+'''
+class ISMCTSStrategy(MCTSStrategy):
+    def __init__(self, board, player, iterations=DEFAULT_ITERATIONS, time_budget=None,
+                 rollout_depth=ROLLOUT_DEPTH, seed=None):
+        super().__init__(board, player, iterations, time_budget, rollout_depth, seed)
+        self.determinizer = Determinizer(board, self.rng)
+
+    def search(self, root=None, next_turns=None):
+        '''Runs the iterations, one determinization each, and returns the root of the tree'''
+        board = self.board
+        players = board.players
+        players_cnt = len(players)
+        if root is None:
+            root = _ISNode(None, (self.player.id - 1) % players_cnt, None)
+        deadline = time.process_time() + self.time_budget if self.time_budget is not None else None
+
+        with self.determinizer as determinizer:
+            for i in range(self.iterations):
+                if deadline is not None and i > 0 and time.process_time() >= deadline:
+                    break
+                determinizer.sample()
+                records = []
+                node = root
+                try:
+                    while not node.terminal:
+                        mover = (node.mover + 1) % players_cnt
+                        moves = legal_moves(board, players[mover]) or [ActionParams.of(mover, Action.NONE)]
+                        index = node.index
+                        available = []
+                        untried = []
+                        for move in moves:
+                            child = index.get(move)
+                            if child is None:
+                                untried.append(move)
+                            else:
+                                child.avail += 1
+                                available.append(child)
+
+                        # expansion
+                        if untried:
+                            move = untried[self.rng.randrange(len(untried))]
+                            records.append(board.apply(players[mover], move))
+                            child = _ISNode(move, mover, node, self._is_over(mover))
+                            child.avail = 1
+                            node.children.append(child)
+                            index[move] = child
+                            node = child
+                            break
+
+                        # selection among the moves legal in this determinization
+                        node = self._select_available(available)
+                        records.append(board.apply(players[mover], node.move))
+
+                    rewards = self._playout(node.mover, node.terminal, records)
+                finally:
+                    while records:
+                        board.undo(records.pop())
+                self.playouts += 1
+
+                # backpropagation
+                while node is not None:
+                    node.visits += 1
+                    node.reward += rewards[node.mover]
+                    node = node.parent
+        return root
+
+    def _select_available(self, children):
+        best, best_score = None, -1.0
+        for child in children:
+            score = child.reward / child.visits + EXPLORATION * math.sqrt(math.log(child.avail) / child.visits)
+            if score > best_score:
+                best, best_score = child, score
+        return best
@@ -0,0 +1,293 @@
+import atexit
+import math
+import multiprocessing
+import random
+import time
+from strategies.strategy import Strategy
+
+from board import Board
+from instrumentation import SEARCH
+from moves import (
+    legal_moves,
+    PICK_THREE_TABLE,
+    COLORS,
+    MAX_RESERVED,
+)
+from player import (
+    Action,
+    ActionParams,
+)
+from state_codec import (
+    decode,
+    encode,
+)
+
+from model import GOLD
+
+DEFAULT_ITERATIONS = 100
+# plies a playout runs before the position is scored
+ROLLOUT_DEPTH = 24
+EXPLORATION = 1.4
+# what a development card is worth next to a reputation point when a playout is cut short
+CARD_WEIGHT = 0.3
+
+# workers -> the pool kept by the root-parallel searches of this process, see get_pool
+_pools = {}
+
+
+def get_pool(workers):
+    '''Returns the persistent pool of workers processes, reused across moves and games'''
+    pool = _pools.get(workers)
+    if pool is None:
+        pool = _pools[workers] = multiprocessing.Pool(workers)
+    return pool
+
+
+def close_pools():
+    for pool in _pools.values():
+        pool.terminate()
+    _pools.clear()
+
+
+atexit.register(close_pools)
+
+
+class _Node(object):
+    __slots__ = ('move', 'mover', 'parent', 'children', 'untried', 'visits', 'reward', 'terminal')
+
+    def __init__(self, move, mover, parent, terminal=False):
+        # the move that led here and the index of the player who played it
+        self.move = move
+        self.mover = mover
+        self.parent = parent
+        self.children = []
+        # the moves not expanded yet, listed on the first visit
+        self.untried = None
+        self.visits = 0
+        # summed rewards of the mover
+        self.reward = 0.0
+        self.terminal = terminal
+
+
+'''
+MCTS Strategy:
+- It searches the game tree with UCT, every player maximizing its own reward
+- It plays the moves in place on the board and undoes them, no copies
+- The playouts buy the most reputable card they can afford, else pick random gems
+- It stops after a number of iterations or a CPU time budget, whichever comes first
+- It sees the real deck order
+- With workers > 1 the search is root-parallel: every worker process searches
+  its own copy of the state, shipped as state_codec bytes, and the root visit counts are summed
+- With a zobrist.TranspositionTable it keeps the subtrees down to its next turn,
+  keyed by state hash; it or another MCTS player sharing the table resumes
+  from them when the game gets there
+'''
+class MCTSStrategy(Strategy):
+    def __init__(self, board, player, iterations=DEFAULT_ITERATIONS, time_budget=None,
+                 rollout_depth=ROLLOUT_DEPTH, seed=None, workers=1, table=None):
+        self.player = player
+        self.steps = 0
+        # per move, and per worker in the root-parallel mode
+        self.iterations = iterations
+        # CPU seconds per move
+        self.time_budget = time_budget
+        self.rollout_depth = rollout_depth
+        self.workers = workers
+        # shared by the strategies of the process, unused by the root-parallel mode
+        self.table = table
+        self.reused_roots = 0
+        self.rng = random.Random(seed) if seed is not None else board.rng
+        # totals over the game, see playouts_per_second
+        self.playouts = 0
+        self.search_seconds = 0.0
+        super().__init__(board, [player])
+
+    def next_step(self):
+        self.steps = self.steps + 1
+        start = time.perf_counter()
+        if self.workers > 1:
+            visits = self._search_parallel()
+        else:
+            visits = {_move_key(child.move): child.visits for child in self._search_with_table().children}
+        self.search_seconds += time.perf_counter() - start
+
+        if not visits:
+            return ActionParams.of(self.player.id, Action.NONE)
+        action, gems, card_id = max(visits, key=visits.__getitem__)
+        return ActionParams.of(self.player.id, Action(action), dict(gems) if gems else None, card_id, self.board)
+
+    def _search_parallel(self):
+        '''Runs a root search per worker on a copy of the state, returns the summed visits per move'''
+        # a few hundred bytes to send per worker instead of the pickled tuples
+        state = encode(self.board.export_state())
+        tasks = [
+            (state, self.player.id, self.iterations, self.time_budget, self.rollout_depth,
+             self.rng.randrange(2 ** 32))
+            for _ in range(self.workers)
+        ]
+        if multiprocessing.current_process().daemon:
+            # a pool worker cannot have children, search one root after the other
+            results = map(_search_root, tasks)
+        else:
+            results = get_pool(self.workers).map(_search_root, tasks)
+
+        visits = {}
+        for children, playouts in results:
+            self.playouts += playouts
+            for key, child_visits in children:
+                visits[key] = visits.get(key, 0) + child_visits
+        return visits
+
+    def _search_with_table(self):
+        table = self.table
+        if table is None:
+            return self.search()
+
+        root = table.get(self.board.state_hash(self.player.id))
+        if root is not None:
+            # the game went where the last search expected, keep its statistics
+            root.parent = None
+            self.reused_roots += 1
+        table.new_generation()
+        next_turns = []
+        root = self.search(root, next_turns)
+        for key, node in next_turns:
+            table.put(key, node, node.visits)
+        return root
+
+    def playouts_per_second(self):
+        return self.playouts / self.search_seconds if self.search_seconds > 0 else 0.0
+
+    def report(self, instrumentation):
+        instrumentation.record_many(SEARCH, type(self).__name__, self.playouts, self.search_seconds)
+
+    def search(self, root=None, next_turns=None):
+        '''
+        Runs the iterations from the current board and returns the root of the tree.
+        A root from an earlier search of the same state is searched further.
+        next_turns collects the (state hash, node) of the nodes up to the next turn of the player.
+        '''
+        board = self.board
+        players = board.players
+        players_cnt = len(players)
+        if root is None:
+            root = _Node(None, (self.player.id - 1) % players_cnt, None)
+        deadline = time.process_time() + self.time_budget if self.time_budget is not None else None
+
+        for i in range(self.iterations):
+            if deadline is not None and i > 0 and time.process_time() >= deadline:
+                break
+            records = []
+            node = root
+            try:
+                # selection
+                while node.untried == [] and node.children and not node.terminal:
+                    node = self._select(node)
+                    records.append(board.apply(players[node.mover], node.move))
+
+                # expansion
+                if not node.terminal:
+                    mover = (node.mover + 1) % players_cnt
+                    if node.untried is None:
+                        node.untried = legal_moves(board, players[mover]) or [ActionParams.of(mover, Action.NONE)]
+                    move = node.untried.pop(self.rng.randrange(len(node.untried)))
+                    records.append(board.apply(players[mover], move))
+                    child = _Node(move, mover, node, self._is_over(mover))
+                    node.children.append(child)
+                    node = child
+                    if next_turns is not None and len(records) <= players_cnt:
+                        next_turns.append((board.state_hash((mover + 1) % players_cnt), child))
+
+                rewards = self._playout(node.mover, node.terminal, records)
+            finally:
+                while records:
+                    board.undo(records.pop())
+            self.playouts += 1
+
+            # backpropagation
+            while node is not None:
+                node.visits += 1
+                node.reward += rewards[node.mover]
+                node = node.parent
+        return root
+
+    def _select(self, node):
+        log_visits = math.log(node.visits)
+        best, best_score = None, -1.0
+        for child in node.children:
+            score = child.reward / child.visits + EXPLORATION * math.sqrt(log_visits / child.visits)
+            if score > best_score:
+                best, best_score = child, score
+        return best
+
+    def _is_over(self, mover):
+        '''The game ends when a round ends with a player at the points to win'''
+        board = self.board
+        if mover != len(board.players) - 1:
+            return False
+        for player in board.players:
+            if player.can_win(board.points_to_win):
+                return True
+        return False
+
+    def _playout(self, mover, over, records):
+        '''Plays the playout policy from the state, returns the reward of every player'''
+        board = self.board
+        players = board.players
+        for _ in range(self.rollout_depth):
+            if over:
+                break
+            mover = (mover + 1) % len(players)
+            records.append(board.apply(players[mover], self._playout_move(players[mover])))
+            over = self._is_over(mover)
+        return self._rewards(over)
+
+    def _playout_move(self, player):
+        board = self.board
+        rng = self.rng
+
+        # the most reputable card it can afford
+        best, best_rep = None, -1
+        cards = board.visible_cards()
+        for card, can_afford in zip(cards, player.affordable(board.card_costs())):
+            if can_afford and card.reputation > best_rep:
+                best, best_rep = card, card.reputation
+        if best is not None:
+            return ActionParams.of(player.id, Action.BUY_CARD, None, best.id)
+        for card in player.rev_cards:
+            if player.can_afford(card):
+                return ActionParams.of(player.id, Action.BUY_RESERVE_CARD, None, card.id)
+
+        gems = board.gem_vector
+        mask = 0
+        for g in COLORS:
+            if gems[g] > 0:
+                mask |= 1 << g
+        picks = PICK_THREE_TABLE[mask]
+        if picks:
+            return ActionParams.of(player.id, Action.PICK_THREE, rng.choice(picks))
+        if cards and player.reserve_count < MAX_RESERVED and gems[GOLD] > 0:
+            return ActionParams.of(player.id, Action.RESERVE_CARD, None, rng.choice(cards).id)
+        return ActionParams.of(player.id, Action.NONE)
+
+    def _rewards(self, over):
+        board = self.board
+        if over:
+            winners = board._get_winners()
+            return [1.0 if p in winners else 0.0 for p in board.players]
+        points = board.points_to_win
+        return [min(1.0, (p.rep + CARD_WEIGHT * len(p.cards)) / points) * 0.5 for p in board.players]
+
+
+def _move_key(move):
+    '''A picklable key of the move, the same in every process'''
+    return (move.action.value, tuple(move.gems.items()) if move.gems else None, move.card_id)
+
+
+def _search_root(task):
+    '''Runs the root search of one worker, returns the visits per root move and the playouts'''
+    state, player_id, iterations, time_budget, rollout_depth, seed = task
+    board = Board.restore(decode(state))
+    strategy = MCTSStrategy(board, board.players[player_id], iterations, time_budget, rollout_depth, seed)
+    root = strategy.search()
+    return [(_move_key(child.move), child.visits) for child in root.children], strategy.playouts
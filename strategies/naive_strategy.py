@@ -1,5 +1,7 @@
-import functools, operator, math
-from strategies.strategy import Strategy
+from strategies.strategy import (
+    demand_scores,
+    Strategy,
+)
 
 from player import (
     Action,
@@ -7,7 +9,9 @@ from player import (
 )
 
 from model import (
-    Gem
+    GEMS,
+    GOLD,
+    N_GEMS,
 )
 
 from util import (
@@ -21,27 +25,25 @@ Naive Strategy:
 - It will try to purchase the cards from low to high if it can afford
 '''
 class NaiveStrategy(Strategy):
-    def __init__(self, board, player):
+    def __init__(self, board, player, incremental=False):
         self.player = player
         self.steps = 0
-        super().__init__(board, [player])
+        super().__init__(board, [player], incremental)
 
     ## just pick the top three most common gems
-    def recommend_gems_to_pick(self, all_cards, gems_on_board):
-        def _lvl_score(lvl):
-            return math.exp(-1 * lvl)
-
-        gem_scores = {gem : 0 for gem in Gem}
-        for lvl, cards in enumerate(all_cards):
-            for card in cards:
-                for g, cnt in card.cost.items():
-                    gem_scores[g] += cnt * _lvl_score(lvl)
+    ## demand is the Board.gem_demand() of all_cards, the same scores as demand_scores(all_cards)
+    def recommend_gems_to_pick(self, all_cards, gems_on_board, demand=None):
+        if demand is not None:
+            gem_scores = demand
+        else:
+            gem_scores = demand_scores(all_cards)
 
-        sorted_x = sorted(gem_scores.items(), key=lambda kv: kv[1], reverse=True)
+        sorted_x = sorted(range(N_GEMS), key=gem_scores.__getitem__, reverse=True)
         gems_to_pick = {}
-        for gem, _ in sorted_x:
-            if gem == Gem.GOLD:
+        for g in sorted_x:
+            if g == GOLD:
                 continue
+            gem = GEMS[g]
             if gems_on_board[gem] > 0:
                 gems_to_pick[gem] = 1
             if len(gems_to_pick) == 3:
@@ -53,19 +55,20 @@ class NaiveStrategy(Strategy):
         # print(f'In step: {self.steps}')
         self.steps = self.steps + 1
         cards = self.board.get_cards()
-        cards_list = functools.reduce(operator.iconcat, cards, [])
+        cards_list = self.card_table.visible_cards()
         gems_on_board = self.board.get_gems()
 
-        for card in cards_list:
-            # just buy the card if it can afford
-            if self.player.can_afford(card):
-                # print(f'buy card: {card.id}')
-                return ActionParams(self.player.id, Action.BUY_CARD, None, card.id)
+        # just buy the first card it can afford
+        affordable = self.player.affordable(self.card_table.card_costs())
+        if True in affordable:
+            card = cards_list[affordable.index(True)]
+            # print(f'buy card: {card.id}')
+            return ActionParams.of(self.player.id, Action.BUY_CARD, None, card.id, self.board)
 
         # if you cannot afford anything, get gems if possible:
-        gems_to_pick = self.recommend_gems_to_pick(cards, gems_on_board)
+        gems_to_pick = self.recommend_gems_to_pick(cards, gems_on_board, self.board.gem_demand())
         if greater_than_or_equal_to(gems_on_board, gems_to_pick) and len(gems_to_pick) > 0:
-            return ActionParams(self.player.id, Action.PICK_THREE, gems_to_pick, None)
+            return ActionParams.of(self.player.id, Action.PICK_THREE, gems_to_pick, None, self.board)
         else:
-            return ActionParams(self.player.id, Action.RESERVE_CARD, None, cards_list[0].id)
+            return ActionParams.of(self.player.id, Action.RESERVE_CARD, None, cards_list[0].id, self.board)
 
@@ -1,5 +1,7 @@
-import functools, operator, math
-from strategies.strategy import Strategy
+from strategies.strategy import (
+    demand_scores,
+    Strategy,
+)
 
 from player import (
     Action,
@@ -7,7 +9,10 @@ from player import (
 )
 
 from model import (
-    Gem
+    Gem,
+    GEMS,
+    GOLD,
+    N_GEMS,
 )
 
 from util import (
@@ -22,23 +27,21 @@ Smart Strategy:
 - It will try to attract nobles
 '''
 class SmartStrategy(Strategy):
-    def __init__(self, board, player):
+    def __init__(self, board, player, incremental=False):
         self.player = player
         self.steps = 0
-        super().__init__(board, [player])
+        super().__init__(board, [player], incremental)
 
     ## just pick the top three most common gems
-    def recommend_gems_to_pick(self, all_cards, gems_on_board, current_gems):
-        def _lvl_score(lvl):
-            return math.exp(-1 * lvl)
-
+    ## demand is the Board.gem_demand() of all_cards, the same scores as demand_scores(all_cards)
+    def recommend_gems_to_pick(self, all_cards, gems_on_board, current_gems, demand=None):
         def gems_needed(card, current_gems):
             gems = {}
             needed = 0
-            for g, cnt in card.cost.items():
+            for g, cnt in enumerate(card.cost_vector):
                 if current_gems[g] < cnt:
                     diff = cnt - current_gems[g]
-                    gems[g] = gems.get(g, 0) + diff
+                    gems[GEMS[g]] = diff
                     needed += diff
             return gems, needed
 
@@ -48,11 +51,10 @@ class SmartStrategy(Strategy):
                     return False
             return True
 
-        gem_scores = {gem : 0 for gem in Gem}
-        for lvl, cards in enumerate(all_cards):
-            for card in cards:
-                for g, cnt in card.cost.items():
-                    gem_scores[g] += cnt * _lvl_score(lvl)
+        if demand is not None:
+            gem_scores = demand
+        else:
+            gem_scores = demand_scores(all_cards)
         
         candidates = {}
         needs = {}
@@ -73,11 +75,12 @@ class SmartStrategy(Strategy):
                     gems_to_pick[gem] = 1
 
 
-        sorted_x = sorted(gem_scores.items(), key=lambda kv: kv[1], reverse=True)
-        for gem, _ in sorted_x:
+        sorted_x = sorted(range(N_GEMS), key=gem_scores.__getitem__, reverse=True)
+        for g in sorted_x:
             if len(gems_to_pick) == 3:
                 break
-            if gems_to_pick.get(gem, 0) == 1 or gem == Gem.GOLD:
+            gem = GEMS[g]
+            if gems_to_pick.get(gem, 0) == 1 or g == GOLD:
                 continue
             if gems_on_board[gem] > 0:
                 gems_to_pick[gem] = 1
@@ -99,21 +102,21 @@ class SmartStrategy(Strategy):
         # print(f'In step: {self.steps}')
         self.steps = self.steps + 1
         cards = self.board.get_cards()
-        cards_list = functools.reduce(operator.iconcat, cards, [])
-        cards_list.reverse()
+        cards_list = self.card_table.visible_cards()
         gems_on_board = self.board.get_gems()
-        current_gems = self.player.card_summary_plus_current_gems()
+        current_gems = self.player.effective_gems()
 
-        for card in cards_list:
-            # just buy the card if it can afford
-            if self.player.can_afford(card):
-                return ActionParams(self.player.id, Action.BUY_CARD, None, card.id)
+        # just buy the highest card it can afford
+        affordable = self.player.affordable(self.card_table.card_costs())
+        for i in range(len(cards_list) - 1, -1, -1):
+            if affordable[i]:
+                return ActionParams.of(self.player.id, Action.BUY_CARD, None, cards_list[i].id, self.board)
 
         # if you cannot afford anything, get gems if possible:
-        gems_to_pick = self.recommend_gems_to_pick(cards, gems_on_board, current_gems)
+        gems_to_pick = self.recommend_gems_to_pick(cards, gems_on_board, current_gems, self.board.gem_demand())
         if greater_than_or_equal_to(gems_on_board, gems_to_pick) and len(gems_to_pick) > 0:
-            return ActionParams(self.player.id, Action.PICK_THREE, gems_to_pick, None)
+            return ActionParams.of(self.player.id, Action.PICK_THREE, gems_to_pick, None, self.board)
         else:
             #import pdb; pdb.set_trace()
-            return ActionParams(self.player.id, Action.RESERVE_CARD, None, cards_list[0].id)
+            return ActionParams.of(self.player.id, Action.RESERVE_CARD, None, cards_list[-1].id, self.board)
 
@@ -1,5 +1,36 @@
+import math
+
+from events import TableIndex
+from model import N_GEMS
+
 
 class Strategy(object):
-    def __init__(self, board, players):
+    def __init__(self, board, players, incremental=False):
         self.board = board
         self.players = players
+        # where the visible cards and their costs are read from: the board,
+        # or with incremental an index kept up to date by the board events
+        self.card_table = TableIndex(board) if incremental else board
+
+    def report(self, instrumentation):
+        '''Adds the strategy's own timers and counters once its game ended'''
+        pass
+
+
+def demand_scores(all_cards):
+    '''
+    Returns how much the cards of each level ask for every gem, weighted by
+    the level like Board.gem_demand. The gems of a level are counted before
+    they are weighted, as the board does, so both give the same scores.
+    '''
+    gem_scores = [0] * N_GEMS
+    for lvl, cards in enumerate(all_cards):
+        counts = [0] * N_GEMS
+        for card in cards:
+            for g, cnt in enumerate(card.cost_vector):
+                if cnt:
+                    counts[g] += cnt
+        weight = math.exp(-1 * lvl)
+        for g in range(N_GEMS):
+            gem_scores[g] += counts[g] * weight
+    return gem_scores
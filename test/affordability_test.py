@@ -0,0 +1,43 @@
+#! /usr/local/bin/python3
+
+import unittest
+
+from affordability import assess
+from board import Board
+
+
+class AffordabilityTest(unittest.TestCase):
+    def test_assess(self):
+        eff_gems = (2, 1, 0, 0, 0, 2)
+        costs = [
+            (2, 1, 0, 0, 0, 0),
+            (3, 1, 1, 0, 0, 0),
+            (0, 3, 2, 1, 0, 0),
+        ]
+        affordability = assess(eff_gems, costs)
+        self.assertEqual(affordability.affordable, [True, True, False])
+        self.assertEqual(affordability.distances, [0, 0, 3])
+        # the gold goes to the first missing gems
+        self.assertEqual(affordability.deficits[2], (0, 0, 2, 1, 0, 0))
+        self.assertEqual(affordability.deficits[0], (0,) * 6)
+
+    def test_matches_per_card_checks(self):
+        board = Board(3, should_shuffle=True, seed=3)
+        player = board.players[0]
+        player.set_gems({gem: 1 for gem in board.gems})
+        eff_gems = player.effective_gems()
+        affordability = assess(eff_gems, board.card_costs())
+        for i, card in enumerate(board.visible_cards()):
+            self.assertEqual(affordability.affordable[i], player.can_afford(card))
+            self.assertEqual(affordability.distances[i], eff_gems.deficit_after_gold(card.cost_vector))
+
+    def test_card_costs_follow_the_table(self):
+        board = Board(3, should_shuffle=True, seed=3)
+        card = board.visible_cards()[0]
+        board.take_card(card.id)
+        self.assertNotIn(card, board.visible_cards())
+        self.assertEqual(board.card_costs(), [c.cost_vector for row in board.get_cards() for c in row])
+
+
+if __name__ == "__main__":
+    unittest.main()
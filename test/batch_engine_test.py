@@ -0,0 +1,123 @@
+#! /usr/local/bin/python3
+
+import unittest
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from game import (
+    Game,
+    Tally,
+)
+from model import GOLD
+from player import (
+    Action,
+    ActionParams,
+)
+from strategies.naive_strategy import NaiveStrategy
+
+
+class ReservingStrategy(NaiveStrategy):
+    '''Buys its cheapest-id affordable reserved card first, and reserves rather than picks while it can'''
+    reserved_buys = 0
+
+    def next_step(self):
+        player = self.player
+        for card in sorted(player.rev_cards, key=lambda c: c.id):
+            if player.can_afford(card):
+                self.reserved_buys += 1
+                return ActionParams.of(player.id, Action.BUY_RESERVE_CARD, None, card.id, self.board)
+        params = super().next_step()
+        cards = self.board.visible_cards()
+        if params.action is Action.PICK_THREE and player.reserve_count < 3 and self.board.gem_vector[GOLD] and cards:
+            return ActionParams.of(player.id, Action.RESERVE_CARD, None, cards[0].id, self.board)
+        return params
+
+
+def reserving_policy(engine, g, p):
+    '''ReservingStrategy over the arrays, see batch_engine.naive_policy'''
+    import numpy as np
+    from batch_engine import (
+        naive_policy,
+        BUY_RESERVED,
+        PICK,
+        RESERVE,
+    )
+
+    kind, slot, picks = naive_policy(engine, g, p)
+    reserved = engine.reserved[g, p]
+    hand = engine.hand[g, p]
+    eff = engine.discount[g, p] + hand
+    missing = np.maximum(engine.tables.card_cost[reserved] - eff[:, None, :], 0).sum(axis=2)
+    affordable = (reserved >= 0) & (missing <= hand[:, GOLD][:, None])
+    has_buy = affordable.any(axis=1)
+    cheapest = np.where(affordable, reserved, np.iinfo(np.int64).max).argmin(axis=1)
+    can_reserve = (reserved < 0).any(axis=1) & (engine.gems[g, GOLD] > 0) & (engine.table[g] >= 0).any(axis=1)
+
+    # a pick comes with the first visible card as its slot, the one to reserve
+    kind = np.where(has_buy, BUY_RESERVED, np.where((kind == PICK) & can_reserve, RESERVE, kind))
+    slot = np.where(has_buy, cheapest, slot)
+    return kind, slot, picks
+
+
+@unittest.skipIf(numpy is None, 'the batch engine needs numpy')
+class BatchEngineTest(unittest.TestCase):
+    def test_matches_object_engine(self):
+        from batch_engine import BatchEngine, STATUSES
+
+        for players_cnt in (2, 3, 4):
+            seeds = list(range(40))
+            engine = BatchEngine(players_cnt, seeds).run()
+            winners = engine.winners()
+            for i, seed in enumerate(seeds):
+                game = Game(players_cnt, seed=seed, strategies=(NaiveStrategy,))
+                expected = game.play()
+                self.assertEqual(STATUSES[engine.status[i]], game.status, (players_cnt, seed))
+                self.assertEqual(int(engine.turns[i]), game.turns, (players_cnt, seed))
+                self.assertEqual([int(p) for p in winners[i].nonzero()[0]], expected, (players_cnt, seed))
+                self.assertEqual([int(r) for r in engine.rep[i]], [p.rep for p in game.board.players])
+                self.assertEqual([int(c) for c in engine.cards[i]], [len(p.cards) for p in game.board.players])
+
+    def test_reserved_cards(self):
+        from batch_engine import BatchEngine, STATUSES
+
+        reserved_buys = 0
+        for players_cnt in (2, 3, 4):
+            seeds = list(range(30))
+            engine = BatchEngine(players_cnt, seeds, policy=reserving_policy).run()
+            for i, seed in enumerate(seeds):
+                game = Game(players_cnt, seed=seed, strategies=(ReservingStrategy,))
+                game.play()
+                players = game.board.players
+                reserved_buys += sum(p.strategy.reserved_buys for p in players)
+                self.assertEqual(STATUSES[engine.status[i]], game.status, (players_cnt, seed))
+                self.assertEqual(int(engine.turns[i]), game.turns, (players_cnt, seed))
+                self.assertEqual([int(r) for r in engine.rep[i]], [p.rep for p in players])
+                self.assertEqual([int(c) for c in engine.cards[i]], [len(p.cards) for p in players])
+                self.assertEqual([sorted(int(c) for c in ids if c >= 0) for ids in engine.reserved[i]],
+                                 [sorted(c.id for c in p.rev_cards) for p in players])
+                self.assertEqual(engine.hand[i].tolist(), [list(p.hand_vector) for p in players])
+        # the games do buy reserved cards
+        self.assertGreater(reserved_buys, 0)
+
+    def test_tally(self):
+        from batch_engine import BatchEngine
+
+        expected = Tally(3)
+        for seed in range(10):
+            game = Game(3, seed=seed, strategies=(NaiveStrategy,))
+            expected.add(game, game.play())
+        self.assertEqual(BatchEngine(3, range(10)).run().to_tally(), expected)
+
+    def test_turn_cap(self):
+        from batch_engine import BatchEngine
+
+        tally = BatchEngine(3, range(10), max_turns=30).run().to_tally()
+        self.assertEqual(tally.aborts, 10)
+        self.assertEqual(tally.turns, {30: 10})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+#! /usr/local/bin/python3
+
+import unittest
+
+from benchmarks.suite import (
+    compare,
+    latency,
+    rate,
+)
+
+
+class BenchmarkTest(unittest.TestCase):
+    def test_compare_flags_slowdowns(self):
+        baseline = {
+            'games/3p': rate(100.0, 'games/s').to_json(),
+            'micro/can_afford': latency(1e-6).to_json(),
+            'setup/board/3p': latency(1e-5).to_json(),
+        }
+        results = {
+            'games/3p': rate(80.0, 'games/s'),
+            'micro/can_afford': latency(1.05e-6),
+            'setup/board/3p': latency(2e-5),
+            'games/new': rate(1.0, 'games/s'),
+        }
+        regressions = compare(baseline, results, threshold=0.1)
+        self.assertEqual([r[0] for r in regressions], ['games/3p', 'setup/board/3p'])
+        self.assertAlmostEqual(regressions[0][3], 0.25)
+        self.assertAlmostEqual(regressions[1][3], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,13 +2,24 @@
 import unittest
 from copy import deepcopy
 
+import math
+import pickle
+
 from board import Board
+from game import Game
+from moves import legal_moves
 from model import (
     Gem,
     Card,
     Noble,
+    N_GEMS,
 )
 from player import Player
+from strategies.strategy import demand_scores
+from test.walk import (
+    random_walk,
+    short_deck_board,
+)
 
 
 class BoardTest(unittest.TestCase):
@@ -31,12 +42,36 @@ class BoardTest(unittest.TestCase):
         self.assertEqual(len(b.cards), 3)
         self.assertEqual(len(b.cards[0]), 4)
 
+    def test_shared_catalog(self):
+        b1 = Board(2, should_shuffle=True, seed=1)
+        b2 = Board(2, should_shuffle=True, seed=2)
+        self.assertIs(b1.catalog, b2.catalog)
+        self.assertIs(b1.get_card(0), b2.get_card(0))
+        for deck1, deck2 in zip(b1.decks, b2.decks):
+            self.assertEqual(sorted(deck1), sorted(deck2))
+
     def test_take_card(self):
         b = Board(2)
         card = b.cards[0][0]
         b.take_card(card.id)
         self.assertEqual(len(b.cards[0]), 4)
 
+    def test_visible_index(self):
+        b = Board(2)
+        card = b.cards[0][1]
+        self.assertTrue(b.is_visible(card.id))
+        b.take_card(card.id)
+        self.assertFalse(b.is_visible(card.id))
+        # the slot is refilled in place
+        self.assertEqual(b.visible[b.cards[0][1].id], (0, 1))
+
+        # drain the level 3 deck, the row shrinks once it is empty
+        while b.cards[2]:
+            b.take_card(b.cards[2][-1].id)
+            for slot, c in enumerate(b.cards[2]):
+                self.assertEqual(b.visible[c.id], (2, slot))
+        self.assertEqual(len(b.visible), 8)
+
     def test_take_gems(self):
         b = Board(2)
         gems = {}
@@ -60,11 +95,11 @@ class BoardTest(unittest.TestCase):
         player = Player(1)
     
         for i in range(10):
-           player.cards.add(Card(i, 1, Gem.RED, 0, {}))
-           player.cards.add(Card(i, 1, Gem.GREEN, 0, {}))
-           player.cards.add(Card(i, 1, Gem.BLUE, 0, {}))
-           player.cards.add(Card(i, 1, Gem.WHITE, 0, {}))
-           player.cards.add(Card(i, 1, Gem.BLACK, 0, {}))
+           player.add_card(Card(i, 1, Gem.RED, 0, {}))
+           player.add_card(Card(i, 1, Gem.GREEN, 0, {}))
+           player.add_card(Card(i, 1, Gem.BLUE, 0, {}))
+           player.add_card(Card(i, 1, Gem.WHITE, 0, {}))
+           player.add_card(Card(i, 1, Gem.BLACK, 0, {}))
         
         b._check_and_update_nobles(player)
         self.assertEqual(len(player.nobles), 1)
@@ -87,5 +122,78 @@ class BoardTest(unittest.TestCase):
             self.assertEqual(cnt, orginal_board_gems[gem])
 
 
+    def test_apply_undo(self):
+        game = Game(3, seed=4, max_turns=45)
+        game.play()
+        b = game.board
+        for player in b.players:
+            before = _state(b)
+            for move in legal_moves(b, player):
+                record = b.apply(player, move)
+                b.undo(record)
+                self.assertEqual(_state(b), before, move.action)
+
+    def test_export_restore(self):
+        game = Game(3, seed=4, max_turns=60)
+        game.play()
+        state = game.board.export_state()
+        b = Board.restore(pickle.loads(pickle.dumps(state)))
+        self.assertEqual(_state(b), _state(game.board))
+        self.assertEqual(b.export_state(), state)
+
+    def test_undo_sequence(self):
+        b = short_deck_board()
+        start = _state(b)
+        states = [start]
+        records = []
+        # prefer buying, to go through the nobles
+        for _, _, record in random_walk(b, 0, 60, buy_first=True):
+            states.append(_state(b))
+            records.append(record)
+        while records:
+            b.undo(records.pop())
+            states.pop()
+            self.assertEqual(_state(b), states[-1])
+        self.assertEqual(_state(b), start)
+
+    def test_gem_demand(self):
+        b = short_deck_board()
+        for _ in random_walk(b, 1, 40):
+            demand = [list(counts) for counts in b.demand]
+            b._reset_demand()
+            self.assertEqual(demand, b.demand)
+
+        scores = [0] * N_GEMS
+        for lvl, cards in enumerate(b.get_cards()):
+            for card in cards:
+                for g, cnt in enumerate(card.cost_vector):
+                    scores[g] += cnt * math.exp(-1 * lvl)
+        for expected, score in zip(scores, b.gem_demand()):
+            self.assertAlmostEqual(expected, score)
+
+        # the strategies score the cards without the board to the same bit
+        for seed in range(20):
+            b = Board(2, should_shuffle=True, seed=seed)
+            for _ in random_walk(b, seed, 60):
+                self.assertEqual(demand_scores(b.get_cards()), b.gem_demand())
+
+
+def _state(b):
+    return (
+        list(b.gem_vector),
+        [[c.id for c in row] for row in b.cards],
+        dict(b.visible),
+        list(b.cards_index),
+        [n.id for n in b.nobles],
+        b.card_costs(),
+        [list(counts) for counts in b.demand],
+        [(
+            p.rep, list(p.hand_vector), list(p.card_vector), list(p.effective_gems()), p.reserve_count,
+            sorted(c.id for c in p.cards), sorted(c.id for c in p.rev_cards),
+            sorted(n.id for n in p.nobles), sorted(p.known_noble_ids),
+        ) for p in b.players],
+    )
+
+
 if __name__ == "__main__":
     unittest.main()
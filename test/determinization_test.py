@@ -0,0 +1,47 @@
+#! /usr/local/bin/python3
+
+import random
+import unittest
+
+from determinization import Determinizer
+from game import Game
+
+
+class DeterminizerTest(unittest.TestCase):
+    def test_sample_shuffles_the_unseen_cards_only(self):
+        game = Game(3, seed=4, max_turns=30)
+        game.play()
+        board = game.board
+        decks = [list(deck) for deck in board.decks]
+        determinizer = Determinizer(board, random.Random(0))
+        with determinizer:
+            samples = set()
+            for _ in range(20):
+                determinizer.sample()
+                for level, (deck, real) in enumerate(zip(board.decks, decks)):
+                    cursor = board.cards_index[level]
+                    self.assertEqual(deck[:cursor], real[:cursor])
+                    self.assertEqual(sorted(deck[cursor:]), sorted(real[cursor:]))
+                    self.assertEqual(determinizer.unseen(level), sorted(real[cursor:]))
+                samples.add(tuple(board.decks[0]))
+            self.assertGreater(len(samples), 1)
+        self.assertEqual(board.decks, decks)
+        self.assertEqual(determinizer.samples, 20)
+
+    def test_samples_ignore_the_real_order(self):
+        game = Game(2, seed=1, max_turns=20)
+        game.play()
+        board = game.board
+        with Determinizer(board, random.Random(3)) as determinizer:
+            determinizer.sample()
+            first = [list(deck) for deck in board.decks]
+        for level, deck in enumerate(board.decks):
+            cursor = board.cards_index[level]
+            deck[cursor:] = reversed(deck[cursor:])
+        with Determinizer(board, random.Random(3)) as determinizer:
+            determinizer.sample()
+            self.assertEqual(board.decks, first)
+
+
+if __name__ == '__main__':
+    unittest.main()
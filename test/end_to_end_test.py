@@ -53,7 +53,7 @@ class EndToEndTest(unittest.TestCase):
                 gems[Gem[gem]] = 2
 
         card_id = obj.get('card', -1)
-        return ActionParams(action, gems, card_id)
+        return ActionParams(obj['player'], action, gems, card_id)
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
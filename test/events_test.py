@@ -0,0 +1,92 @@
+#! /usr/local/bin/python3
+
+import functools
+import unittest
+
+from board import Board
+from events import (
+    subscribe,
+    unsubscribe,
+    CARD_RETURNED,
+    CARD_TAKEN,
+    CARD_RESERVED,
+    CARD_UNRESERVED,
+    GEMS_TAKEN,
+    HAND_CHANGED,
+    TableIndex,
+)
+from game import (
+    Game,
+    play_games,
+)
+from moves import legal_moves
+from player import (
+    Action,
+    Player,
+)
+from strategies.naive_strategy import NaiveStrategy
+from strategies.aggressive_strategy import AggressiveStrategy
+from strategies.smart_strategy import SmartStrategy
+from test.walk import (
+    random_walk,
+    short_deck_board,
+)
+
+
+class EventsTest(unittest.TestCase):
+    def test_no_listener_no_publishing(self):
+        b = Board(2, should_shuffle=True, seed=0)
+        self.assertIs(type(b), Board)
+        self.assertIs(type(b.players[0]), Player)
+
+        events = []
+        listener = lambda event, *args: events.append(event)
+        subscribe(b, listener)
+        self.assertIsInstance(b, Board)
+        self.assertIsNot(type(b), Board)
+        unsubscribe(b, listener)
+        self.assertIs(type(b), Board)
+        self.assertIs(type(b.players[0]), Player)
+        self.assertEqual(events, [])
+
+    def test_events_of_a_turn(self):
+        b = Board(2, should_shuffle=True, seed=0)
+        events = []
+        subscribe(b, lambda event, *args: events.append((event, args)))
+        player = b.players[0]
+        card = b.cards[0][1]
+        record = b.apply(player, next(m for m in legal_moves(b, player) if m.action is Action.RESERVE_CARD
+                                      and m.card_id == card.id))
+        self.assertEqual([event for event, _ in events],
+                         [GEMS_TAKEN, CARD_RESERVED, HAND_CHANGED, CARD_TAKEN])
+        self.assertEqual(events[-1][1], (card, 0, 1, b.cards[0][1]))
+
+        del events[:]
+        refill = b.cards[0][1]
+        b.undo(record)
+        self.assertIn((CARD_UNRESERVED, (player, card)), events)
+        self.assertIn((CARD_RETURNED, (card, 0, 1, refill)), events)
+
+    def test_table_index(self):
+        b = short_deck_board()
+        index = TableIndex(b)
+        records = []
+        for _, _, record in random_walk(b, 0, 60):
+            records.append(record)
+            self.assertEqual(index.visible_cards(), b.visible_cards())
+            self.assertEqual(index.card_costs(), b.card_costs())
+        while records:
+            b.undo(records.pop())
+            self.assertEqual(index.visible_cards(), b.visible_cards())
+
+    def test_incremental_strategies_play_the_same_games(self):
+        incremental = tuple(functools.partial(strategy, incremental=True)
+                            for strategy in (NaiveStrategy, AggressiveStrategy, SmartStrategy))
+        self.assertEqual(play_games(3, 0, 10, 3, strategies=incremental), play_games(3, 0, 10, 3))
+        game = Game(3, seed=0, strategies=incremental)
+        self.assertEqual(len(game.board.listeners[CARD_TAKEN]), 3)
+        self.assertEqual(game.board.listeners[GEMS_TAKEN], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+#! /usr/local/bin/python3
+
+import unittest
+
+from game import (
+    Game,
+    run_tournament,
+    ABORT,
+    DRAW,
+    WIN,
+)
+from instrumentation import (
+    Instrumentation,
+    DECIDE,
+    WINNERS,
+)
+from model import GemVector
+
+
+class GameTest(unittest.TestCase):
+    def test_same_seed_same_winners(self):
+        self.assertEqual(Game(3, seed=11).play(), Game(3, seed=11).play())
+
+    def test_workers_match_single_process(self):
+        single = run_tournament(3, 6, seed=5, workers=1)
+        sharded = run_tournament(3, 6, seed=5, workers=2)
+        self.assertEqual(single, sharded)
+        self.assertEqual(single.games, 6)
+        self.assertEqual(sum(single.turns.values()), 6)
+
+    def test_win(self):
+        game = Game(3, seed=3)
+        self.assertTrue(game.play())
+        self.assertEqual(game.status, WIN)
+        self.assertGreater(game.turns, 0)
+
+    def test_stalemate_is_a_draw(self):
+        game = Game(2, seed=1)
+        # no gems left to pick and no reservation left to make
+        game.board.gem_vector = GemVector()
+        for player in game.board.players:
+            player.reserve_count = 3
+        self.assertEqual(game.play(), [])
+        self.assertEqual(game.status, DRAW)
+        self.assertEqual(game.turns, 2)
+
+    def test_turn_cap_aborts(self):
+        game = Game(2, seed=1, max_turns=3)
+        self.assertEqual(game.play(), [])
+        self.assertEqual(game.status, ABORT)
+        self.assertEqual(game.turns, 4)
+
+    def test_strategy_errors_surface(self):
+        class BrokenStrategy(object):
+            def __init__(self, board, player):
+                pass
+
+            def next_step(self):
+                raise ValueError('broken strategy')
+
+        for instrumentation in (None, Instrumentation()):
+            game = Game(2, seed=1, strategies=(BrokenStrategy, BrokenStrategy), instrumentation=instrumentation)
+            with self.assertRaisesRegex(ValueError, 'broken strategy'):
+                game.play()
+
+    def test_instrumentation(self):
+        instrumentation = Instrumentation()
+        game = Game(3, seed=11, instrumentation=instrumentation)
+        self.assertEqual(game.play(), Game(3, seed=11).play())
+        decisions = sum(calls for (phase, _), (calls, _) in instrumentation.timers.items() if phase == DECIDE)
+        self.assertEqual(decisions, game.turns)
+        self.assertEqual(instrumentation.timers[(WINNERS, 'board')][0], 1)
+
+        merged = run_tournament(3, 4, seed=5, workers=2, instrument=True).instrumentation
+        self.assertEqual(merged.timers[(WINNERS, 'board')][0], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
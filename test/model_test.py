@@ -0,0 +1,87 @@
+#! /usr/local/bin/python3
+
+import unittest
+
+import copy
+import pickle
+
+from catalog import get_catalog
+from model import (
+    Card,
+    Gem,
+    GemVector,
+    GemView,
+    GOLD,
+)
+
+
+class GemVectorTest(unittest.TestCase):
+    def test_dict_round_trip(self):
+        gems = {Gem.RED: 2, Gem.GOLD: 1}
+        vector = GemVector.from_dict(gems)
+        self.assertEqual(vector, [2, 0, 0, 0, 0, 1])
+        self.assertEqual(vector[GOLD], 1)
+        self.assertEqual(vector.to_dict()[Gem.RED], 2)
+        self.assertEqual(vector.to_dict()[Gem.BLUE], 0)
+
+    def test_arithmetic(self):
+        a = GemVector((1, 2, 3, 0, 0, 1))
+        b = GemVector((1, 1, 1, 0, 0, 0))
+        self.assertTrue(a.covers(b))
+        self.assertFalse(b.covers(a))
+        self.assertEqual(a.plus(b), [2, 3, 4, 0, 0, 1])
+        self.assertEqual(a.minus(b), [0, 1, 2, 0, 0, 1])
+        a.sub(b).add(b)
+        self.assertEqual(a, [1, 2, 3, 0, 0, 1])
+        self.assertEqual(a.total(), 7)
+
+    def test_deficit_after_gold(self):
+        gems = GemVector((1, 0, 2, 0, 0, 1))
+        cost = GemVector((2, 1, 2, 0, 0, 0))
+        self.assertEqual(gems.shortfall(cost), [1, 1, 0, 0, 0, 0])
+        self.assertEqual(gems.deficit_after_gold(cost), 1)
+        gems[GOLD] = 2
+        self.assertEqual(gems.deficit_after_gold(cost), 0)
+
+    def test_view(self):
+        vector = GemVector((4, 4, 4, 4, 4, 5))
+        view = GemView(vector)
+        self.assertEqual(len(view), 6)
+        self.assertEqual(view[Gem.GOLD], 5)
+        vector[GOLD] -= 1
+        self.assertEqual(view[Gem.GOLD], 4)
+        self.assertEqual(dict(view)[Gem.RED], 4)
+
+
+class CardTest(unittest.TestCase):
+    def test_frozen(self):
+        card = Card(3, 1, Gem.RED, 0, {Gem.BLUE: 2, Gem.BLACK: 1})
+        self.assertEqual(card.cost_vector, (0, 0, 2, 0, 1, 0))
+        self.assertEqual(card.cost_total, 3)
+        with self.assertRaises(AttributeError):
+            card.reputation = 5
+        with self.assertRaises(TypeError):
+            card.cost[Gem.BLUE] = 1
+        self.assertEqual(card.cost_vector, (0, 0, 2, 0, 1, 0))
+        unpickled = pickle.loads(pickle.dumps(card))
+        self.assertEqual(unpickled.cost_vector, card.cost_vector)
+        self.assertEqual(hash(unpickled), hash(card))
+
+    def test_catalog_identity(self):
+        catalog = get_catalog()
+        for card in catalog.cards:
+            self.assertIs(pickle.loads(pickle.dumps(card)), card)
+            self.assertIs(copy.deepcopy(card), card)
+        for noble in catalog.nobles:
+            self.assertIs(pickle.loads(pickle.dumps(noble)), noble)
+            with self.assertRaises(TypeError):
+                noble.cost[Gem.RED] = 9
+        # a card of a catalog id that is not the catalog card stays itself
+        card = catalog.cards[0]
+        other = Card(card.id, card.level, card.gem, card.reputation + 1, card.cost)
+        self.assertIsNot(pickle.loads(pickle.dumps(other)), card)
+        self.assertEqual(pickle.loads(pickle.dumps(other)).reputation, card.reputation + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+#! /usr/local/bin/python3
+
+import copy
+import unittest
+
+from board import Board
+from game import Game
+from model import (
+    Gem,
+    GOLD,
+)
+from moves import (
+    legal_moves,
+    PICK_THREE_TABLE,
+)
+from player import Action
+
+
+class MovesTest(unittest.TestCase):
+    def test_opening_moves(self):
+        board = Board(3, should_shuffle=True, seed=1)
+        moves = legal_moves(board, board.players[0])
+        by_action = {}
+        for move in moves:
+            by_action.setdefault(move.action, []).append(move)
+        self.assertEqual(len(by_action[Action.PICK_THREE]), 10)
+        # 5 gems per pile with 3 players
+        self.assertEqual(len(by_action[Action.PICK_SAME]), 5)
+        self.assertEqual(len(by_action[Action.RESERVE_CARD]), 12)
+        self.assertNotIn(Action.BUY_CARD, by_action)
+        self.assertNotIn(Action.BUY_RESERVE_CARD, by_action)
+
+    def test_pick_three_table(self):
+        # all five piles, two piles, no pile
+        self.assertEqual(len(PICK_THREE_TABLE[0b11111]), 10)
+        self.assertEqual(PICK_THREE_TABLE[0b00101], ({Gem.RED: 1, Gem.BLUE: 1},))
+        self.assertEqual(PICK_THREE_TABLE[0], ())
+
+    def test_reserve_limits(self):
+        board = Board(2, should_shuffle=True, seed=1)
+        player = board.players[0]
+        board.gem_vector[GOLD] = 0
+        self.assertFalse(any(m.action is Action.RESERVE_CARD for m in legal_moves(board, player)))
+        board.gem_vector[GOLD] = 1
+        player.reserve_count = 3
+        self.assertFalse(any(m.action is Action.RESERVE_CARD for m in legal_moves(board, player)))
+
+    def test_every_move_applies(self):
+        for seed in range(3):
+            game = Game(3, seed=seed, max_turns=30)
+            game.play()
+            board = game.board
+            for player in board.players:
+                moves = legal_moves(board, player)
+                self.assertTrue(moves)
+                for move in moves:
+                    trial = copy.deepcopy(board)
+                    trial.players[player.id].apply_action(move, trial)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+#! /usr/local/bin/python3
+
+import itertools
+import random
+import unittest
+
+from board import Board
+from game import Game
+from moves import (
+    COLORS,
+    PICK_SAME_MIN,
+)
+from player import Action
+from planner import (
+    clear_memo,
+    plan,
+    plan_card,
+    turns_to_afford,
+    HAND_LIMIT,
+)
+
+NO_GEMS = (0, 0, 0, 0, 0, 0)
+
+
+def _reference_turns(cost, discount, hand, supply, reserves_left):
+    '''Breadth-first search over the whole hand and board, no normalization'''
+    def affordable(hand):
+        missing = sum(max(0, cost[g] - discount[g] - hand[g]) for g in COLORS)
+        return missing <= hand[5]
+
+    def discard(hand):
+        # drop the gems the card does not need down to the limit
+        hand = list(hand)
+        for g in COLORS:
+            while sum(hand) > HAND_LIMIT and hand[g] > max(0, cost[g] - discount[g]):
+                hand[g] -= 1
+        return tuple(hand) if sum(hand) <= HAND_LIMIT else None
+
+    start = (tuple(hand), tuple(supply), reserves_left)
+    if affordable(start[0]):
+        return 0
+    seen = {start}
+    frontier = [start]
+    turns = 0
+    while frontier:
+        turns += 1
+        next_frontier = []
+        for hand, supply, reserves in frontier:
+            piles = [g for g in COLORS if supply[g]]
+            picks = [colors for colors in itertools.combinations(piles, min(3, len(piles)))]
+            picks += [(g, g) for g in COLORS if supply[g] >= PICK_SAME_MIN]
+            children = []
+            for gems in picks:
+                new_hand, new_supply = list(hand), list(supply)
+                for g in gems:
+                    new_hand[g] += 1
+                    new_supply[g] -= 1
+                children.append((discard(new_hand), tuple(new_supply), reserves))
+            if reserves and supply[5]:
+                new_hand, new_supply = list(hand), list(supply)
+                new_hand[5] += 1
+                new_supply[5] -= 1
+                children.append((discard(new_hand), tuple(new_supply), reserves - 1))
+            for child in children:
+                if child[0] is None or child in seen:
+                    continue
+                if affordable(child[0]):
+                    return turns
+                seen.add(child)
+                next_frontier.append(child)
+        frontier = next_frontier
+    return None
+
+
+class PlannerTest(unittest.TestCase):
+    def test_affordable(self):
+        self.assertEqual(plan((1, 1, 0, 0, 0, 0), NO_GEMS, (1, 0, 0, 0, 0, 1), (4,) * 6), (0, ()))
+        # the discount pays the card
+        self.assertEqual(plan((2, 0, 0, 0, 0, 0), (2, 0, 0, 0, 0, 0), NO_GEMS, (4,) * 6).turns, 0)
+
+    def test_steps(self):
+        card_plan = plan((3, 3, 3, 0, 0, 0), NO_GEMS, NO_GEMS, (4, 4, 4, 4, 4, 5))
+        self.assertEqual(card_plan.turns, 3)
+        self.assertEqual([step.action for step in card_plan.steps], [Action.PICK_THREE] * 3)
+
+        # a pile of 3 cannot be picked twice, the gold makes up for it
+        card_plan = plan((0, 0, 4, 0, 0, 0), NO_GEMS, NO_GEMS, (4, 4, 3, 4, 4, 5))
+        self.assertEqual(card_plan.turns, 4)
+        self.assertIn(Action.RESERVE_CARD, [step.action for step in card_plan.steps])
+
+    def test_out_of_reach(self):
+        # more than the hand can hold
+        self.assertIsNone(plan((0, 7, 0, 4, 0, 0), NO_GEMS, NO_GEMS, (7,) * 6))
+        self.assertIsNotNone(plan((0, 7, 0, 4, 0, 0), (0, 1, 0, 0, 0, 0), NO_GEMS, (7,) * 6))
+        # not enough gems left on the board
+        self.assertIsNone(plan((0, 0, 7, 0, 0, 0), NO_GEMS, NO_GEMS, (4, 4, 3, 4, 4, 5)))
+        self.assertIsNone(plan((0, 0, 7, 0, 0, 0), NO_GEMS, NO_GEMS, (4, 4, 3, 4, 4, 5), reserves_left=0))
+
+    def test_matches_reference(self):
+        rng = random.Random(0)
+        for _ in range(300):
+            cost = tuple(rng.choice((0, 0, 1, 2, 3, 4, 5)) for _ in COLORS) + (0,)
+            discount = tuple(rng.randrange(3) for _ in COLORS) + (0,)
+            hand = tuple(rng.randrange(3) for _ in COLORS) + (rng.randrange(2),)
+            supply = tuple(rng.randrange(6) for _ in COLORS) + (rng.randrange(3),)
+            reserves_left = rng.randrange(4)
+            card_plan = plan(cost, discount, hand, supply, reserves_left)
+            turns = _reference_turns(cost, discount, hand, supply, reserves_left)
+            self.assertEqual(None if card_plan is None else card_plan.turns, turns,
+                             (cost, discount, hand, supply, reserves_left))
+
+    def test_memo(self):
+        clear_memo()
+        game = Game(3, seed=3, max_turns=30)
+        game.play()
+        board = game.board
+        first = [turns_to_afford(card, player, board) for player in board.players for card in board.visible_cards()]
+        second = [plan_card(card, player, board) for player in board.players for card in board.visible_cards()]
+        self.assertEqual(first, [None if card_plan is None else card_plan.turns for card_plan in second])
+        # memoized: a later query of the same situation gets the same plan
+        self.assertIs(plan((3, 3, 3, 0, 0, 0), NO_GEMS, NO_GEMS, (6,) * 6), plan((4, 3, 3, 0, 0, 0), (1, 0, 0, 0, 0, 0), NO_GEMS, (7,) * 6))
+        # the steps of a plan follow from the board of the start
+        board = Board(2, should_shuffle=True, seed=1)
+        for card in board.visible_cards():
+            card_plan = plan_card(card, board.players[0], board)
+            self.assertTrue(card_plan is None or card_plan.turns == len(card_plan.steps))
+
+
+if __name__ == '__main__':
+    unittest.main()
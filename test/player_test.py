@@ -4,7 +4,11 @@ import unittest
 from copy import deepcopy
 
 from board import Board
-from player import Player
+from player import (
+    Player,
+    Action,
+    ActionParams,
+)
 from model import (
     Gem,
     Card,
@@ -24,6 +28,24 @@ class PlayerTest(unittest.TestCase):
         
         self.assertEqual(player1.card_summary(), {})
 
+    def test_action_params(self):
+        my_board = Board(2)
+        pick = ActionParams.of(0, Action.PICK_THREE, {Gem.RED: 1, Gem.BLUE: 1})
+        self.assertIs(pick, ActionParams.of(0, Action.PICK_THREE, {Gem.RED: 1, Gem.BLUE: 1}))
+        self.assertEqual(pick.gem_vector[0], 1)
+        ActionParams(0, Action.NONE, None, None)
+
+        with self.assertRaises(ValueError):
+            ActionParams(0, Action.PICK_THREE, {Gem.GOLD: 1}, None)
+        with self.assertRaises(ValueError):
+            ActionParams(0, Action.BUY_CARD, None, 90)
+
+        card = my_board.get_cards()[0][0]
+        ActionParams(0, Action.RESERVE_CARD, None, card.id, my_board)
+        my_board.take_card(card.id)
+        with self.assertRaises(ValueError):
+            ActionParams.of(0, Action.RESERVE_CARD, None, card.id, my_board)
+
     def test_can_afford(self):
         player = Player(0)
         card = Card(
@@ -192,7 +214,7 @@ class PlayerTest(unittest.TestCase):
         
         player1.reserve_card(None, card, my_board)
 
-        cost = deepcopy(card.cost)
+        cost = dict(card.cost)
         # test if we can use the gold
         for g, c in cost.items():
             if c > 0:
@@ -225,7 +247,7 @@ class PlayerTest(unittest.TestCase):
 
         card = cards[0][2]
 
-        cost = deepcopy(card.cost)
+        cost = dict(card.cost)
         # test if we can use two golds to buy a simple card
         times = 2
         for g, c in cost.items():
@@ -237,6 +259,22 @@ class PlayerTest(unittest.TestCase):
         player1.buy_board_card(None, card, my_board)
         self.assertEqual(player1.get_cards(), {card})
 
+    def test_effective_gems_follow_hand_and_cards(self):
+        my_board = Board(2)
+        player1 = Player(0)
+        card = my_board.get_cards()[0][0]
+
+        self.assertEqual(player1.effective_gems().total(), 0)
+        player1.pick_different_gems(card.cost, None, my_board)
+        self.assertEqual(tuple(player1.effective_gems()), card.cost_vector)
+
+        player1.buy_board_card(None, card, my_board)
+        summary = player1.card_summary()
+        self.assertEqual(summary[card.gem], 1)
+        self.assertEqual(player1.effective_gems(), player1.card_vector)
+        with self.assertRaises(TypeError):
+            summary[card.gem] = 2
+
     def test_buy_card_and_use_card_gem(self):
         my_board = Board(2)
         orginal_board_gems = deepcopy(my_board.get_gems())
@@ -247,18 +285,20 @@ class PlayerTest(unittest.TestCase):
         # just let player1 pick enough gems and use them to buy cards
         for i in range(4):
             card = cards[0][i]
+            card_summary = player1.card_summary()
+            cost = {g: max(0, c - card_summary[g]) for g, c in card.cost.items()}
             
-            player1.pick_different_gems(card.cost, None, my_board)
+            player1.pick_different_gems(cost, None, my_board)
             player1.buy_board_card(None, card, my_board)
 
         # get a new card from the refreshed board
         card = my_board.get_cards()[0][0]
 
-        cost = deepcopy(card.cost)
+        cost = dict(card.cost)
         card_summary = player1.card_summary()
         # use the gems to adjust the cost
         for g, c in cost.items():
-            c = max(0, c - card_summary.get(g, 0))
+            cost[g] = max(0, c - card_summary.get(g, 0))
         
         player1.pick_different_gems(cost, None, my_board)
         player1.buy_board_card(None, card, my_board)
@@ -0,0 +1,36 @@
+#! /usr/local/bin/python3
+
+import os
+import tempfile
+import unittest
+
+from game import Game
+from profiling import (
+    Profiler,
+    CPROFILE,
+    ENGINE,
+)
+
+
+class ProfilingTest(unittest.TestCase):
+    def test_cprofile_split_per_strategy(self):
+        with tempfile.TemporaryDirectory() as out_dir:
+            profiler = Profiler(CPROFILE, out_dir)
+            winners = profiler.play(Game(3, seed=11))
+            self.assertEqual(winners, Game(3, seed=11).play())
+
+            written = profiler.report().write(out_dir)
+            names = sorted(os.path.basename(path) for path in written)
+            for name in ('AggressiveStrategy', 'NaiveStrategy', 'SmartStrategy', ENGINE):
+                self.assertIn(f"{name}.pstats", names)
+                self.assertIn(f"{name}.collapsed", names)
+            self.assertEqual(len(os.listdir(out_dir)), len(written))
+
+            with open(os.path.join(out_dir, 'NaiveStrategy.collapsed')) as fo:
+                lines = fo.read().splitlines()
+            self.assertTrue(lines)
+            self.assertTrue(any(line.startswith('next_step') for line in lines))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+#! /usr/local/bin/python3
+
+import copy
+import pickle
+import random
+import unittest
+
+from affordability import assess
+from catalog import get_catalog
+from game import Game
+from model import (
+    Gem,
+    GemVector,
+    GEM_INDEX,
+)
+from player import Player
+from residual import (
+    get_residuals,
+    ResidualTable,
+    ROWS_CACHE_SIZE,
+)
+
+
+class ResidualTest(unittest.TestCase):
+    def test_matches_assess(self):
+        catalog = get_catalog()
+        residuals = get_residuals()
+        rng = random.Random(0)
+        for _ in range(200):
+            discount = GemVector([rng.randrange(6) for _ in range(5)] + [0])
+            hand = GemVector([rng.randrange(4) for _ in range(5)] + [rng.randrange(3)])
+            eff_gems = discount.plus(hand)
+            rows = residuals.rows(discount)
+            affordability = assess(eff_gems, [card.cost_vector for card in catalog.cards])
+            for card in catalog.cards:
+                residual = rows[card.cost_vector]
+                self.assertIs(residual, residuals.residual(card.id, discount))
+                self.assertEqual(residual.vector, tuple(discount.shortfall(card.cost_vector)))
+                self.assertEqual(residual.missing(hand), eff_gems.deficit_after_gold(card.cost_vector))
+                self.assertEqual(residual.assess(hand), (
+                    affordability.affordable[card.id],
+                    affordability.deficits[card.id],
+                    affordability.distances[card.id],
+                ))
+
+    def test_player_follows_its_cards(self):
+        catalog = get_catalog()
+        player = Player(0)
+        card = min(catalog.cards, key=lambda c: c.cost_total)
+        self.assertFalse(player.can_afford(card))
+        # buy the discount of the card, one gem at a time
+        for owned in catalog.cards:
+            g = GEM_INDEX[owned.gem]
+            if player.card_vector[g] < card.cost_vector[g]:
+                player.add_card(owned)
+                last = owned
+        self.assertTrue(player.can_afford(card))
+        player.remove_card(last)
+        self.assertFalse(player.can_afford(card))
+        player.set_gems({Gem.GOLD: 1})
+        self.assertTrue(player.can_afford(card))
+
+    def test_rows_cache_bound(self):
+        residuals = ResidualTable(get_catalog())
+        discounts = [(a, b, c, d, 0, 0) for a in range(5) for b in range(5) for c in range(5) for d in range(5)]
+        self.assertGreater(len(discounts), ROWS_CACHE_SIZE)
+        first = residuals.rows(discounts[0])
+        for discount in discounts[1:]:
+            residuals.rows(discount)
+            # the first discount stays, it is used again and again
+            self.assertIs(residuals.rows(discounts[0]), first)
+            self.assertLessEqual(len(residuals.rows_cache), ROWS_CACHE_SIZE)
+        self.assertEqual(len(residuals.rows_cache), ROWS_CACHE_SIZE)
+        # the least recently used went first
+        self.assertNotIn(discounts[1], residuals.rows_cache)
+        self.assertIn(discounts[-1], residuals.rows_cache)
+
+    def test_player_assess(self):
+        game = Game(3, seed=4, max_turns=40)
+        game.play()
+        board = game.board
+        # a cost outside of the catalog is assessed from the effective gems
+        costs = board.card_costs() + [(9, 0, 0, 0, 1, 0)]
+        for player in board.players:
+            affordability = assess(player.effective_gems(), costs)
+            self.assertEqual(player.assess(costs), affordability)
+            self.assertEqual(player.affordable(costs), affordability.affordable)
+
+    def test_copied_players_share_the_tables(self):
+        game = Game(3, seed=2, max_turns=30)
+        game.play()
+        player = game.board.players[0]
+        costs = game.board.card_costs()
+        copied = copy.deepcopy(player)
+        self.assertIs(copied.residuals(), player.residuals())
+        self.assertEqual(pickle.loads(pickle.dumps(player)).assess(costs), player.assess(costs))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+#! /usr/local/bin/python3
+
+import os
+import pickle
+import tempfile
+import unittest
+
+from board import Board
+from game import (
+    Game,
+    state_log_path,
+    run_tournament,
+)
+from player import (
+    Action,
+    ActionParams,
+)
+from state_codec import (
+    decode,
+    encode,
+    get_layout,
+    read_log,
+    StateLog,
+    StateView,
+    EMPTY,
+    VERSION,
+)
+
+
+class StateCodecTest(unittest.TestCase):
+    def test_roundtrip(self):
+        for players_cnt in (2, 3, 4):
+            game = Game(players_cnt, seed=players_cnt, max_turns=40)
+            game.play()
+            state = game.board.export_state()
+            data = encode(state)
+            self.assertEqual(len(data), get_layout().size(players_cnt))
+            self.assertEqual(decode(data), state)
+            self.assertLess(len(data), len(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)))
+
+    def test_shrunk_rows(self):
+        b = Board(2, should_shuffle=True, seed=2)
+        # run the level 3 deck out, so the takes shrink the row
+        b.cards_index[2] = len(b.decks[2])
+        b.take_card(b.cards[2][1].id)
+        b.apply(b.players[0], ActionParams.of(0, Action.RESERVE_CARD, None, b.cards[2][0].id))
+        state = b.export_state()
+        self.assertEqual(len(state.cards[2]), 2)
+        self.assertEqual(decode(encode(state)), state)
+        self.assertEqual(Board.restore(decode(encode(state))).export_state(), state)
+
+    def test_view(self):
+        game = Game(3, seed=5, max_turns=30)
+        game.play()
+        board = game.board
+        data = bytearray(encode(board.export_state()))
+        view = StateView(data)
+        self.assertEqual(list(view.gems), list(board.gem_vector))
+        self.assertEqual(list(view.visible(0)), [c.id for c in board.cards[0]])
+        for player in board.players:
+            self.assertEqual(view.rep(player.id), player.rep)
+            self.assertEqual(list(view.hand(player.id)), list(player.hand_vector))
+        # the view reads the buffer in place
+        data[get_layout().gems] = 9
+        self.assertEqual(view.gems[0], 9)
+        self.assertEqual(set(view.nobles[len(board.nobles):].tolist()), {EMPTY})
+
+    def test_bad_buffers(self):
+        data = encode(Board(2, should_shuffle=True, seed=1).export_state())
+        with self.assertRaises(ValueError):
+            StateView(data[:-1])
+        with self.assertRaises(ValueError):
+            StateView(b'XXXX' + data[4:])
+        newer = bytearray(data)
+        newer[4] = VERSION + 1
+        with self.assertRaisesRegex(ValueError, 'version'):
+            StateView(newer)
+
+    def test_log_and_resume(self):
+        with tempfile.TemporaryDirectory() as log_dir:
+            run_tournament(2, 2, seed=7, max_turns=60, state_log_dir=log_dir)
+            records = read_log(state_log_path(log_dir, 7))
+            # a record per round
+            self.assertEqual([turns for turns, _, _ in records], list(range(2, 2 * len(records) + 1, 2)))
+
+            game = Game(2, seed=7, max_turns=60)
+            game.play()
+            turns, idle_turns, view = records[-1]
+            self.assertEqual(turns, game.turns)
+            self.assertEqual(view.state(), game.board.export_state())
+
+            # resume from the middle, the naive strategies replay the game
+            path = os.path.join(log_dir, 'resumed.states')
+            turns, idle_turns, view = records[len(records) // 2]
+            with StateLog(path) as state_log:
+                resumed = Game.from_checkpoint(turns, idle_turns, view, max_turns=60, state_log=state_log)
+                resumed.play()
+            self.assertEqual(resumed.turns, game.turns)
+            self.assertEqual(read_log(path)[-1][2].state(), game.board.export_state())
+
+    def test_log_again(self):
+        with tempfile.TemporaryDirectory() as log_dir:
+            run_tournament(3, 1, 5, state_log_dir=log_dir)
+            records = read_log(state_log_path(log_dir, 5))
+            # the same game logged again replaces the first log
+            run_tournament(3, 1, 5, state_log_dir=log_dir)
+            again = read_log(state_log_path(log_dir, 5))
+            self.assertEqual(len(again), len(records))
+            self.assertEqual([turns for turns, _, _ in again], [turns for turns, _, _ in records])
+            self.assertEqual(again[-1][2].state(), records[-1][2].state())
+
+
+if __name__ == '__main__':
+    unittest.main()
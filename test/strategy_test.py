@@ -1,13 +1,32 @@
+import functools
+import math
 import unittest
 
+from affordability import assess
 from board import Board
+from catalog import get_catalog
 from player import Player
 from model import (
     Gem,
+    GEM_INDEX,
     Card,
 ) 
 
+from game import (
+    Game,
+    WIN,
+)
+from moves import legal_moves
 from strategies.naive_strategy import NaiveStrategy
+from strategies.aggressive_strategy import (
+    AggressiveStrategy,
+    CARD_VALUES,
+    DIST_SCORES,
+    REP_SCORES,
+)
+from strategies.smart_strategy import SmartStrategy
+from strategies.mcts_strategy import MCTSStrategy
+from strategies.ismcts_strategy import ISMCTSStrategy
 
 
 class NaiveStrategyTest(unittest.TestCase):
@@ -53,6 +72,122 @@ class NaiveStrategyTest(unittest.TestCase):
         self.assertEqual(gems_to_pick[Gem.RED], 1)
         self.assertEqual(gems_to_pick[Gem.BLACK], 1)
 
+
+
+class AggressiveStrategyTest(unittest.TestCase):
+    def _card_value(self, card, can_afford, dist, card_vector):
+        # the value of a card as computed before the tables
+        sum_c = 0
+        n_c = 0
+        for c in card_vector:
+            if c > 0:
+                n_c += 1
+                sum_c += c
+        mean_c = 0 if n_c == 0 else 1.0 * sum_c / n_c
+        var_old = 0
+        var_new = 0
+        for g, c in enumerate(card_vector):
+            if c > 0:
+                var_old += abs(c - mean_c) ** 2
+                var_new += abs((c + 1 if g == GEM_INDEX[card.gem] else c) - mean_c) ** 2
+        card_gem_score = 1 if var_old > var_new else 0
+        aff_score = 2 if can_afford else 0
+        return round(aff_score + math.exp(-1 * dist) + card_gem_score + math.log(1 + card.reputation), 2)
+
+    def test_tables(self):
+        for card in get_catalog().cards:
+            self.assertEqual(REP_SCORES[card.id], math.log(1 + card.reputation))
+            # the cost is as far as a card gets
+            self.assertEqual(len(CARD_VALUES[card.id][0]), len(DIST_SCORES))
+            self.assertGreaterEqual(len(DIST_SCORES), card.cost_total + 1)
+        for dist, dist_score in enumerate(DIST_SCORES):
+            self.assertEqual(dist_score, math.exp(-1 * dist))
+
+    def test_card_values(self):
+        for seed in range(3):
+            for max_turns in range(0, 90, 9):
+                game = Game(3, seed=seed, max_turns=max_turns, strategies=(AggressiveStrategy,) * 3)
+                game.play()
+                for player in game.board.players:
+                    stgy = player.strategy
+                    cards = game.board.visible_cards()
+                    affordability = assess(player.effective_gems(), [card.cost_vector for card in cards])
+                    card_values = stgy.get_current_cards_summary(cards)
+                    for card, card_value, dist, diff in zip(cards, card_values, affordability.distances, affordability.deficits):
+                        self.assertEqual((card_value.dist, card_value.req_gems), (dist, diff))
+                        self.assertEqual(card_value.can_afford, dist == 0)
+                        self.assertEqual(card_value.value, self._card_value(card, dist == 0, dist, player.card_vector))
+
+
+class MCTSStrategyTest(unittest.TestCase):
+    def _snapshot(self, board):
+        return (
+            list(board.gem_vector), dict(board.visible), list(board.cards_index), [n.id for n in board.nobles],
+            [(p.rep, list(p.hand_vector), len(p.cards), len(p.rev_cards), p.reserve_count) for p in board.players],
+        )
+
+    def test_search_leaves_the_board_untouched(self):
+        game = Game(3, seed=2, max_turns=30)
+        game.play()
+        board = game.board
+        stgy = MCTSStrategy(board, board.players[0], iterations=50, seed=0)
+        before = self._snapshot(board)
+        action_params = stgy.next_step()
+        self.assertEqual(self._snapshot(board), before)
+        self.assertIn(action_params, legal_moves(board, board.players[0]))
+        self.assertEqual(stgy.playouts, 50)
+
+    def test_root_parallel(self):
+        game = Game(3, seed=2, max_turns=30)
+        game.play()
+        board = game.board
+        stgy = MCTSStrategy(board, board.players[1], iterations=20, seed=0, workers=2)
+        before = self._snapshot(board)
+        action_params = stgy.next_step()
+        self.assertEqual(self._snapshot(board), before)
+        self.assertIn(action_params, legal_moves(board, board.players[1]))
+        self.assertEqual(stgy.playouts, 40)
+
+    def test_time_budget(self):
+        board = Board(3, should_shuffle=True, seed=2)
+        stgy = MCTSStrategy(board, board.players[0], iterations=10 ** 6, time_budget=0.05, seed=0)
+        stgy.next_step()
+        self.assertGreater(stgy.playouts, 0)
+        self.assertLess(stgy.playouts, 10 ** 6)
+
+    def test_plays_full_games(self):
+        mcts = functools.partial(MCTSStrategy, iterations=10)
+        for seed in range(2):
+            game = Game(3, seed=seed, strategies=(mcts, AggressiveStrategy, SmartStrategy))
+            game.play()
+            self.assertEqual(game.status, WIN)
+            self.assertGreater(game.board.players[0].strategy.playouts_per_second(), 0)
+
+
+class ISMCTSStrategyTest(unittest.TestCase):
+    def test_does_not_read_the_deck_order(self):
+        game = Game(3, seed=2, max_turns=30)
+        game.play()
+        board = game.board
+        decks = [list(deck) for deck in board.decks]
+        action_params = ISMCTSStrategy(board, board.players[0], iterations=60, seed=0).next_step()
+        self.assertEqual(board.decks, decks)
+        self.assertIn(action_params, legal_moves(board, board.players[0]))
+
+        # the same search on another order of the unseen cards
+        for level, deck in enumerate(board.decks):
+            cursor = board.cards_index[level]
+            deck[cursor:] = reversed(deck[cursor:])
+        self.assertIs(ISMCTSStrategy(board, board.players[0], iterations=60, seed=0).next_step(), action_params)
+
+    def test_plays_full_games(self):
+        ismcts = functools.partial(ISMCTSStrategy, iterations=10)
+        game = Game(3, seed=0, strategies=(ismcts, AggressiveStrategy, SmartStrategy))
+        game.play()
+        self.assertEqual(game.status, WIN)
+        self.assertEqual(game.board.players[0].strategy.playouts, 10 * game.board.players[0].strategy.steps)
+
+
 if __name__ == "__main__":
     unittest.main()
     print("Everything passed for strategies!")
\ No newline at end of file
@@ -0,0 +1,37 @@
+'''
+Random walks over the legal moves, for the tests of Board.apply / Board.undo
+and of the state kept up to date by them.
+'''
+
+import random
+
+from board import Board
+from moves import legal_moves
+from player import Action
+
+BUYS = (Action.BUY_CARD, Action.BUY_RESERVE_CARD)
+
+
+def short_deck_board(players_cnt=2, seed=2):
+    '''A shuffled board with an empty level 3 deck, so some takes shrink the row'''
+    b = Board(players_cnt, should_shuffle=True, seed=seed)
+    del b.decks[2][b.cards_index[2] + 1:]
+    return b
+
+
+def random_walk(board, seed, turns, buy_first=False):
+    '''
+    Applies a random legal move of each player in turn, for turns turns or
+    until a player has none, and yields (turn, player, undo record) after each.
+    With buy_first a player buys a card whenever it can.
+    '''
+    rng = random.Random(seed)
+    players = board.players
+    for turn in range(turns):
+        player = players[turn % len(players)]
+        moves = legal_moves(board, player)
+        if not moves:
+            return
+        if buy_first:
+            moves = [m for m in moves if m.action in BUYS] or moves
+        yield turn, player, board.apply(player, rng.choice(moves))
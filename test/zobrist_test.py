@@ -0,0 +1,95 @@
+#! /usr/local/bin/python3
+
+import functools
+import unittest
+
+from board import Board
+from game import Game
+from model import Gem
+from strategies.mcts_strategy import MCTSStrategy
+from test.walk import (
+    random_walk,
+    short_deck_board,
+)
+from zobrist import (
+    full_hash,
+    MAX_COUNT,
+    MAX_REP,
+    TranspositionTable,
+)
+
+
+class ZobristTest(unittest.TestCase):
+    def test_incremental_matches_full_hash(self):
+        for seed in range(3):
+            game = Game(3, seed=seed)
+            game.play()
+            self.assertEqual(game.board.state_hash(0), full_hash(game.board, 0))
+
+    def test_apply_undo(self):
+        b = short_deck_board()
+        # the hash of the state before each move, with the player to move
+        hashes = [b.state_hash(0)]
+        records = []
+        for turn, _, record in random_walk(b, 0, 80):
+            records.append(record)
+            hashes.append(b.state_hash((turn + 1) % 2))
+            self.assertEqual(hashes[-1], full_hash(b, (turn + 1) % 2))
+        while records:
+            b.undo(records.pop())
+            hashes.pop()
+            self.assertEqual(b.state_hash(len(records) % 2), hashes[-1])
+
+    def test_bounds(self):
+        # past the points to win of a regular game, buying whatever it can
+        b = Board(2, should_shuffle=True, seed=1, points_to_win=1000)
+        for turn, player, _ in random_walk(b, 0, 600, buy_first=True):
+            b._check_and_update_nobles(player)
+            self.assertEqual(b.state_hash(turn % 2), full_hash(b, turn % 2))
+        self.assertGreater(max(p.rep for p in b.players), 64)
+
+        # counts and reputations set past the tables hash like their top value
+        player = b.players[0]
+        player.rep = MAX_REP + 5
+        player.set_gems({Gem.RED: MAX_COUNT + 3})
+        key = b.state_hash(0)
+        self.assertEqual(key, full_hash(b, 0))
+        player.rep = MAX_REP
+        player.set_gems({Gem.RED: MAX_COUNT - 1})
+        self.assertEqual(b.state_hash(0), key)
+
+    def test_state_identity(self):
+        b = Board(3, should_shuffle=True, seed=5)
+        restored = Board.restore(b.export_state())
+        self.assertEqual(restored.state_hash(1), b.state_hash(1))
+        self.assertNotEqual(b.state_hash(0), b.state_hash(1))
+        self.assertNotEqual(Board(3, should_shuffle=True, seed=6).state_hash(0), b.state_hash(0))
+
+    def test_transposition_table(self):
+        table = TranspositionTable(size=4)
+        self.assertEqual(len(table.keys), 4)
+        self.assertTrue(table.put(1, 'a', depth=5))
+        self.assertEqual(table.get(1), 'a')
+        self.assertIsNone(table.get(2))
+        # same slot, shallower entry of the same generation
+        self.assertFalse(table.put(5, 'b', depth=1))
+        self.assertEqual(table.get(1), 'a')
+        self.assertTrue(table.put(5, 'c', depth=5))
+        self.assertIsNone(table.get(1))
+        # an older generation is always replaced
+        table.new_generation()
+        self.assertTrue(table.put(9, 'd', depth=0))
+        self.assertEqual(table.get(9), 'd')
+        self.assertEqual(len(table), 1)
+
+    def test_mcts_players_share_subtrees(self):
+        table = TranspositionTable()
+        mcts = functools.partial(MCTSStrategy, iterations=30, table=table)
+        game = Game(3, seed=1, max_turns=30, strategies=(mcts,))
+        game.play()
+        self.assertGreater(sum(p.strategy.reused_roots for p in game.board.players), 0)
+        self.assertGreater(table.hits, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
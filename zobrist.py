@@ -0,0 +1,190 @@
+'''
+Zobrist hashing of the game state.
+
+Board.zobrist covers the gems, visible cards, deck cursors and nobles of the
+board, Player.zobrist the hand, cards, reserved cards and nobles of a player.
+Their mutators keep both up to date with a few xors; Board.state_hash adds
+the reputations and the side to move. full_hash recomputes it from scratch.
+'''
+
+import random
+
+from catalog import (
+    get_catalog,
+    LEVELS,
+)
+from model import N_GEMS
+
+ZOBRIST_SEED = 0x5A17E
+MAX_PLAYERS = 4
+SLOTS = 4
+# gem counts are hashed up to MAX_COUNT - 1, well over the gems of a color
+# on the board; a larger count (only a hand set directly gets one) hashes
+# like MAX_COUNT - 1
+MAX_COUNT = 16
+_TOP = MAX_COUNT - 1
+
+DEFAULT_TABLE_SIZE = 1 << 16
+
+_rng = random.Random(ZOBRIST_SEED)
+
+
+def _keys(*shape):
+    if len(shape) == 1:
+        return [_rng.getrandbits(64) for _ in range(shape[0])]
+    return [_keys(*shape[1:]) for _ in range(shape[0])]
+
+
+def _count_keys(*shape):
+    '''Keys of counts, a count of zero hashes to 0 so empty vectors hash to 0'''
+    keys = _keys(*shape, MAX_COUNT)
+    rows = [keys]
+    while rows:
+        row = rows.pop()
+        if isinstance(row[0], list):
+            rows.extend(row)
+        else:
+            row[0] = 0
+    return keys
+
+
+_catalog = get_catalog()
+_n_cards = len(_catalog.cards)
+_n_nobles = len(_catalog.nobles)
+# no player gets more reputation than all the cards and nobles give, a larger
+# one (only reachable by setting it directly) hashes like MAX_REP
+MAX_REP = sum(card.reputation for card in _catalog.cards) + sum(noble.reputation for noble in _catalog.nobles)
+
+BOARD_GEMS = _count_keys(N_GEMS)
+# card id -> slot in its row
+VISIBLE = _keys(_n_cards, SLOTS)
+CURSOR = _keys(LEVELS, max(len(ids) for ids in _catalog.level_ids) + 1)
+BOARD_NOBLES = _keys(_n_nobles)
+
+# indexed by player id first
+HAND = _count_keys(MAX_PLAYERS, N_GEMS)
+OWNED = _keys(MAX_PLAYERS, _n_cards)
+RESERVED = _keys(MAX_PLAYERS, _n_cards)
+PLAYER_NOBLES = _keys(MAX_PLAYERS, _n_nobles)
+REP = _keys(MAX_PLAYERS, MAX_REP + 1)
+TO_MOVE = _keys(MAX_PLAYERS)
+
+
+def add_counts(keys, vector, delta):
+    '''Adds delta to the vector in place, returns the xor of the keys that changed'''
+    key = 0
+    for g, d in enumerate(delta):
+        if d:
+            c = vector[g]
+            vector[g] = n = c + d
+            key ^= keys[g][c if c < _TOP else _TOP] ^ keys[g][n if n < _TOP else _TOP]
+    return key
+
+
+def sub_counts(keys, vector, delta):
+    '''Substracts delta from the vector in place, returns the xor of the keys that changed'''
+    key = 0
+    for g, d in enumerate(delta):
+        if d:
+            c = vector[g]
+            vector[g] = n = c - d
+            key ^= keys[g][c if c < _TOP else _TOP] ^ keys[g][n if n < _TOP else _TOP]
+    return key
+
+
+def gems_key(keys, vector):
+    key = 0
+    for g, c in enumerate(vector):
+        key ^= keys[g][c if c < _TOP else _TOP]
+    return key
+
+
+def rep_key(player_id, rep):
+    '''The key of the reputation of a player'''
+    return REP[player_id][rep if rep < MAX_REP else MAX_REP]
+
+
+def board_key(board):
+    '''The board part of the hash, computed from scratch'''
+    key = gems_key(BOARD_GEMS, board.gem_vector)
+    for row in board.cards:
+        for slot, card in enumerate(row):
+            key ^= VISIBLE[card.id][slot]
+    for level, cursor in enumerate(board.cards_index):
+        key ^= CURSOR[level][cursor]
+    for noble in board.nobles:
+        key ^= BOARD_NOBLES[noble.id]
+    return key
+
+
+def player_key(player):
+    '''The player part of the hash, computed from scratch'''
+    id = player.id
+    key = gems_key(HAND[id], player.hand_vector)
+    for card in player.cards:
+        key ^= OWNED[id][card.id]
+    for card in player.rev_cards:
+        key ^= RESERVED[id][card.id]
+    for noble in player.nobles:
+        key ^= PLAYER_NOBLES[id][noble.id]
+    return key
+
+
+def full_hash(board, to_move):
+    '''Board.state_hash without the incremental parts, to check them'''
+    key = board_key(board) ^ TO_MOVE[to_move]
+    for player in board.players:
+        key ^= player_key(player) ^ rep_key(player.id, player.rep)
+    return key
+
+
+class TranspositionTable(object):
+    '''
+    Bounded table of search results keyed by Board.state_hash, shared by the
+    search strategies. Each hash maps to one slot; a new entry replaces the
+    one in its slot when the slot is from an older search generation, or
+    when the new entry is at least as deep (depth is up to the caller, like
+    the visits behind a result).
+    '''
+    def __init__(self, size=DEFAULT_TABLE_SIZE):
+        # a power of two, so the slot is a mask of the hash
+        size = 1 << max(0, size - 1).bit_length()
+        self.mask = size - 1
+        self.keys = [0] * size
+        self.depths = [0] * size
+        self.generations = [0] * size
+        self.values = [None] * size
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.rejects = 0
+
+    def __len__(self):
+        return len(self.keys) - self.values.count(None)
+
+    def new_generation(self):
+        '''Ages the entries, called once per search so stale results get replaced first'''
+        self.generation += 1
+
+    def get(self, key):
+        i = key & self.mask
+        if self.keys[i] == key and self.values[i] is not None:
+            self.hits += 1
+            return self.values[i]
+        self.misses += 1
+        return None
+
+    def put(self, key, value, depth=0):
+        '''Stores the value unless its slot holds a deeper entry of the current generation'''
+        i = key & self.mask
+        if (self.values[i] is not None and self.keys[i] != key
+                and self.generations[i] == self.generation and self.depths[i] > depth):
+            self.rejects += 1
+            return False
+        self.keys[i] = key
+        self.depths[i] = depth
+        self.generations[i] = self.generation
+        self.values[i] = value
+        self.stores += 1
+        return True